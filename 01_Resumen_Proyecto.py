@@ -1,8 +1,33 @@
 import streamlit as st
-import plotly.express as px
+
+from calculos.escenarios import AlmacenEscenarios
+from calculos.grafo import GRAFO_PROYECTO
+from calculos.objetivo import METRICAS, VARIABLES_LIBRES, buscar_objetivo, variables_libres
+from calculos.memoria import controlar_memoria
+from calculos.perfil import Perfilador, perfilado_activo, resumen_registro
 
 st.set_page_config(page_title="Resumen del Proyecto", page_icon="📊", layout="wide")
+perfil = Perfilador("01_Resumen_Proyecto", perfilado_activo(st.session_state))
+perfil.marca("entradas")
 st.title("📊 Resumen General del Proyecto Inmobiliario")
+
+
+@st.cache_resource
+def almacen_escenarios():
+    return AlmacenEscenarios()
+
+
+# Al abrir un escenario se vuelcan sus entradas antes de dibujar los widgets
+if 'escenario_por_abrir' in st.session_state:
+    st.session_state.update(st.session_state.pop('escenario_por_abrir'))
+    # Los editores de tablas guardan sus propias ediciones; se descartan para mostrar las del escenario
+    for clave in ('editor_urbanizacion', 'editor_construccion', 'editor_admin', 'editor_activos', 'editor_permisos'):
+        st.session_state.pop(clave, None)
+    # Un presupuesto importado reemplazaría las tablas del escenario: se descarta
+    for clave in ('costos_urbanizacion_df', 'costos_construccion_df'):
+        st.session_state.pop(f'presupuesto_{clave}', None)
+        st.session_state.pop(f'editor_dibujado_{clave}', None)
+
 # --- Barra lateral para la entrada de datos ---
 st.sidebar.header("Parámetros Generales")
 # Usamos st.session_state para recordar los valores entre páginas
@@ -28,18 +53,48 @@ monto_prestamo = st.session_state.monto_prestamo
 tasa_interes_anual = st.session_state.tasa_interes_anual
 plazo_prestamo_anios = st.session_state.plazo_prestamo_anios
 
-# --- Obtener totales de las otras páginas usando st.session_state ---
-costo_urbanizacion = st.session_state.get('total_urbanizacion', 0.0)
-costo_construccion_unitario = st.session_state.get('total_construccion_unitaria', 0.0)
-gastos_admin_permisos = st.session_state.get('total_gastos_admin_permisos', 0.0)
+# --- Escenarios Guardados ---
+st.sidebar.subheader("💾 Escenarios")
+almacen = almacen_escenarios()
+nombre_escenario = st.sidebar.text_input("Nombre del escenario")
+if st.sidebar.button("Guardar escenario", disabled=not nombre_escenario.strip()):
+    _, contenido_nuevo = almacen.guardar(nombre_escenario.strip(), st.session_state)
+    if contenido_nuevo:
+        st.sidebar.success(f"Escenario '{nombre_escenario.strip()}' guardado.")
+    else:
+        st.sidebar.info(f"Escenario '{nombre_escenario.strip()}' guardado; sus entradas son idénticas a otro ya guardado y comparten resultados.")
+escenarios_guardados = almacen.nombres()
+if escenarios_guardados:
+    escenario_elegido = st.sidebar.selectbox("Escenarios guardados", escenarios_guardados)
+    abrir, eliminar = st.sidebar.columns(2)
+    if abrir.button("Abrir"):
+        st.session_state.escenario_por_abrir = almacen.cargar(escenario_elegido)
+        st.rerun()
+    if eliminar.button("Eliminar"):
+        almacen.eliminar(escenario_elegido)
+        st.rerun()
 
-# --- Cálculos Financieros ---
-costo_total_construccion = costo_construccion_unitario * cantidad_viviendas
-costo_total_inversion = costo_terreno + costo_urbanizacion + costo_total_construccion + gastos_admin_permisos + otros_gastos
-ingresos_totales = precio_venta_unitario * cantidad_viviendas
-utilidad_bruta = ingresos_totales - costo_total_inversion
-capital_propio = costo_total_inversion - monto_prestamo
+st.sidebar.subheader("⚙️ Opciones")
+st.session_state.solo_indicadores = st.sidebar.toggle("Modo solo indicadores", value=st.session_state.get('solo_indicadores', False), help="Muestra solo los indicadores en las páginas de resultados (Resumen, Préstamo, Flujo de Caja, Riesgo, Dashboard y Cartera), sin gráficos ni tablas: cargan y se ejecutan más rápido. Las tablas de costos y gastos se siguen mostrando porque son entradas.")
+solo_indicadores = st.session_state.solo_indicadores
+st.session_state.centavos_exactos = st.sidebar.toggle("Aritmética exacta en centavos", value=st.session_state.get('centavos_exactos', False), help="Suma los costos y el flujo de caja en centavos enteros: cada cifra tiene dos decimales exactos y el flujo mensual cuadra al centavo con los totales. Es algo más lento.")
+st.session_state.perfilado = st.sidebar.toggle("Perfilar ejecuciones", value=st.session_state.get('perfilado', False), help="Mide cada fase de las páginas y la registra en perfil.jsonl (p50/p95 por página).")
 
+perfil.marca("calculo")
+# --- Cálculos Financieros (modelo compartido por todas las páginas) ---
+# Solo se recalcula lo que depende de las entradas que cambiaron desde la ejecución anterior
+recalculo = GRAFO_PROYECTO.actualizar(st.session_state)
+datos = recalculo.valores['datos']
+resultados = recalculo.valores['resultados']
+st.sidebar.caption(f"Valores derivados recalculados en esta ejecución: {len(recalculo.recalculados)} de {recalculo.total_nodos}.")
+costo_urbanizacion = datos.total_urbanizacion
+costo_total_construccion = resultados.costo_total_construccion
+gastos_admin_permisos = datos.total_gastos_admin_permisos
+costo_total_inversion = resultados.costo_total_inversion
+ingresos_totales = resultados.ingresos_totales
+utilidad_bruta = resultados.utilidad_bruta
+
+perfil.marca("metricas")
 # --- Visualización en la página principal ---
 st.header("Resumen Financiero")
 
@@ -48,14 +103,88 @@ col1.metric("Ingresos Totales por Ventas", f"${ingresos_totales:,.2f}")
 col2.metric("Costo Total de Inversión", f"${costo_total_inversion:,.2f}")
 col3.metric("Utilidad Bruta Estimada", f"${utilidad_bruta:,.2f}", delta_color="normal")
 
-st.header("Desglose de la Inversión")
+if solo_indicadores:
+    st.caption("Modo solo indicadores: los gráficos, la búsqueda de objetivo y la comparación de escenarios están ocultos. Se desactiva en la barra lateral.")
+else:
+    # Plotly solo se importa cuando se dibuja el gráfico
+    import plotly.express as px
+
+    perfil.marca("grafico_inversion")
+    st.header("Desglose de la Inversión")
+
+    inversion_data = {
+        'Categoría': ['Terreno', 'Urbanización', 'Construcción Total', 'Gastos Admin/Permisos', 'Otros/Imprevistos'],
+        'Monto': [costo_terreno, costo_urbanizacion, costo_total_construccion, gastos_admin_permisos, otros_gastos]
+    }
+
+    fig = px.pie(inversion_data, values='Monto', names='Categoría', title='Distribución de Costos de Inversión', hole=.3)
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.info("Navega a las otras páginas en el menú de la izquierda para detallar cada sección y ver el análisis completo.")
+
+
+    perfil.marca("busqueda_objetivo")
+    # --- Búsqueda de Objetivo ---
+    st.header("🎯 Buscar Objetivo")
+    st.markdown("En lugar de mover los parámetros a prueba y error, indica la meta y deja que el simulador encuentre el valor de la entrada que la cumple.")
+
+    # La métrica va fuera del formulario: al cambiarla se actualizan las entradas que la afectan
+    metrica = st.selectbox("Métrica", list(METRICAS), format_func=METRICAS.get,
+                           help="Las tasas de interés y de descuento no cambian la utilidad, el ROI ni el ROC: para ellas usa el VAN, la TIR o la máxima necesidad de capital.")
+    with st.form("buscar_objetivo"):
+        obj1, obj2 = st.columns(2)
+        objetivo = obj1.number_input("Valor objetivo", value=0.0, step=1000.0)
+        cual = obj2.radio("Si hay varias soluciones", ["menor", "mayor"], format_func=lambda c: f"Usar el {c} valor", horizontal=True)
+        var1, var2, var3 = st.columns(3)
+        variable = var1.selectbox("Entrada a ajustar", list(variables_libres(metrica)), format_func=VARIABLES_LIBRES.get)
+        valor_actual = float(getattr(datos, variable))
+        minimo = var2.number_input("Buscar desde", value=0.0)
+        maximo = var3.number_input("Buscar hasta", value=max(valor_actual * 3, 100.0))
+        resolver = st.form_submit_button("Resolver")
+
+    if resolver:
+        try:
+            busqueda = buscar_objetivo(datos, metrica, objetivo, variable, minimo, maximo, cual=cual)
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            res1, res2, res3 = st.columns(3)
+            if busqueda.convergio:
+                res1.metric(VARIABLES_LIBRES[variable], f"{busqueda.valor:,.4f}", delta=f"{busqueda.valor - valor_actual:,.4f} vs. actual")
+            else:
+                res1.metric(VARIABLES_LIBRES[variable], "Sin solución")
+            res2.metric(METRICAS[metrica], f"{busqueda.valor_metrica:,.2f}")
+            res3.metric("Evaluaciones del Modelo", busqueda.evaluaciones)
+            (st.success if busqueda.convergio else st.warning)(busqueda.mensaje)
+
 
-inversion_data = {
-    'Categoría': ['Terreno', 'Urbanización', 'Construcción Total', 'Gastos Admin/Permisos', 'Otros/Imprevistos'],
-    'Monto': [costo_terreno, costo_urbanizacion, costo_total_construccion, gastos_admin_permisos, otros_gastos]
-}
+    perfil.marca("comparacion_escenarios")
+    # --- Comparación de Escenarios ---
+    if escenarios_guardados:
+        st.header("🗂️ Comparar Escenarios Guardados")
+        st.markdown("Los resultados de cada escenario se guardan junto a él: comparar escenarios ya calculados no vuelve a evaluar el modelo.")
+        seleccion = st.multiselect("Escenarios", escenarios_guardados, default=escenarios_guardados[:5])
+        if seleccion:
+            comparacion = almacen.comparar(seleccion, kpis=(
+                'ingresos_totales', 'costo_total_inversion', 'utilidad_neta', 'roi', 'maxima_necesidad_capital', 'tir_anual', 'van'
+            ))
+            st.dataframe(comparacion, use_container_width=True, column_config={
+                'ingresos_totales': st.column_config.NumberColumn("Ingresos", format="dollar"),
+                'costo_total_inversion': st.column_config.NumberColumn("Inversión", format="dollar"),
+                'utilidad_neta': st.column_config.NumberColumn("Utilidad Neta", format="dollar"),
+                'roi': st.column_config.NumberColumn("ROI (%)", format="%.2f"),
+                'maxima_necesidad_capital': st.column_config.NumberColumn("Máx. Necesidad de Capital", format="dollar"),
+                'tir_anual': st.column_config.NumberColumn("TIR Anual (%)", format="%.2f"),
+                'van': st.column_config.NumberColumn("VAN", format="dollar"),
+            })
 
-fig = px.pie(inversion_data, values='Monto', names='Categoría', title='Distribución de Costos de Inversión', hole=.3)
-st.plotly_chart(fig, use_container_width=True)
+# --- Perfil de la Ejecución (solo con el perfilado activo) ---
+registro_perfil = perfil.finalizar()
+if registro_perfil:
+    with st.expander(f"⏱️ Perfil de la ejecución: {registro_perfil['total_ms']:,.1f} ms"):
+        st.dataframe(perfil.tabla().style.format("{:,.2f}"), use_container_width=True)
+        st.caption("Percentiles de las últimas ejecuciones de esta página:")
+        st.dataframe(resumen_registro(pagina=perfil.pagina), hide_index=True, use_container_width=True)
 
-st.info("Navega a las otras páginas en el menú de la izquierda para detallar cada sección y ver el análisis completo.")
+# --- Memoria de la Sesión: se mide y, si pasa del límite, se liberan los resultados recalculables ---
+controlar_memoria(st.session_state, perfil.pagina)
@@ -0,0 +1,5 @@
+"""Cálculos financieros del simulador, independientes de Streamlit.
+
+Las páginas de la aplicación son clientes delgados de estos módulos, que
+también pueden usarse desde scripts o procesos por lotes.
+"""
@@ -0,0 +1,237 @@
+"""Motor de amortización de préstamos con cuota fija (sistema francés).
+
+Todas las funciones aceptan escalares o arreglos de montos, tasas y plazos
+(con broadcasting de NumPy) y calculan la tabla completa en forma cerrada,
+sin recorrer los meses uno por uno.
+
+`cronograma_lote` generaliza el cálculo a tasas que cambian mes a mes,
+meses de gracia (con pago de intereses o con intereses capitalizados) y
+prepagos parciales. Cada mes el saldo se multiplica por un factor que solo
+depende de la tasa y de los pagos restantes, así que el cronograma completo
+sale de un producto acumulado y una suma acumulada por préstamo.
+"""
+import numpy as np
+
+COLUMNAS_TABLA = ["Mes", "Cuota Mensual", "Capital Pagado", "Interés Pagado", "Saldo Restante"]
+COLUMNAS_CRONOGRAMA = ["Mes", "Tasa Anual (%)", "Cuota Mensual", "Prepago", "Capital Pagado", "Interés Pagado",
+                       "Interés Capitalizado", "Saldo Restante"]
+
+
+def _preparar(montos, tasas_anuales, anios):
+    montos, tasas_anuales, anios = np.broadcast_arrays(
+        np.asarray(montos, dtype=float),
+        np.asarray(tasas_anuales, dtype=float),
+        np.asarray(anios, dtype=np.int64),
+    )
+    tasa_mensual = (tasas_anuales / 100) / 12
+    n_pagos = anios * 12
+    return montos, tasa_mensual, n_pagos
+
+
+def _fraccion_amortizada(tasa_mensual, meses, n_pagos):
+    # Fracción del capital ya devuelta tras `meses` pagos: ((1+r)^k - 1) / ((1+r)^n - 1).
+    # Con expm1/log1p se evita la cancelación numérica para tasas muy pequeñas,
+    # y con tasa 0 el límite es simplemente k / n.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_g = np.log1p(tasa_mensual)
+        fraccion = np.expm1(meses * log_g) / np.expm1(n_pagos * log_g)
+        lineal = meses / n_pagos
+    fraccion = np.where(tasa_mensual > 0, fraccion, lineal)
+    return np.where(n_pagos > 0, fraccion, 1.0)
+
+
+def _cuota(montos, tasa_mensual, n_pagos):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        g_n = np.expm1(n_pagos * np.log1p(tasa_mensual))
+        cuota = montos * tasa_mensual * (g_n + 1) / g_n
+        cuota_sin_interes = montos / n_pagos
+    cuota = np.where(tasa_mensual > 0, cuota, cuota_sin_interes)
+    return np.where(n_pagos > 0, cuota, 0.0)
+
+
+def cuota_mensual(montos, tasas_anuales, anios):
+    """Cuota mensual fija; equivale a `-npf.pmt(tasa / 12, anios * 12, monto)`."""
+    return _cuota(*_preparar(montos, tasas_anuales, anios))
+
+
+def resumen_amortizacion(montos, tasas_anuales, anios):
+    """Totales de uno o muchos préstamos sin construir sus tablas.
+
+    Devuelve un diccionario con arreglos `cuota_mensual`, `total_pagado` y
+    `total_intereses`, con la forma de los argumentos tras el broadcasting.
+    """
+    montos, tasa_mensual, n_pagos = _preparar(montos, tasas_anuales, anios)
+    cuota = _cuota(montos, tasa_mensual, n_pagos)
+    total_pagado = cuota * n_pagos
+    return {
+        "cuota_mensual": cuota,
+        "total_pagado": total_pagado,
+        "total_intereses": np.where(n_pagos > 0, total_pagado - montos, 0.0),
+    }
+
+
+def calcular_amortizacion_lote(montos, tasas_anuales, anios):
+    """Tablas de amortización de un lote de préstamos.
+
+    Los argumentos se aplanan a un vector de préstamos. El resultado es un
+    diccionario de matrices (préstamo x mes) con las claves `cuota`,
+    `capital`, `interes` y `saldo`, más el vector `mes` y la máscara
+    `activo`; los meses posteriores al plazo de cada préstamo quedan en cero.
+    """
+    montos, tasa_mensual, n_pagos = _preparar(montos, tasas_anuales, anios)
+    montos, tasa_mensual, n_pagos = montos.ravel(), tasa_mensual.ravel(), n_pagos.ravel()
+    cuota = _cuota(montos, tasa_mensual, n_pagos)
+
+    max_meses = int(n_pagos.max(initial=0))
+    mes = np.arange(1, max_meses + 1)
+    meses = np.minimum(mes[None, :], n_pagos[:, None])
+    activo = mes[None, :] <= n_pagos[:, None]
+
+    # El saldo sale de la fórmula cerrada; en el último mes la fracción
+    # amortizada es exactamente 1 y el saldo queda en cero sin ajustes.
+    fraccion = _fraccion_amortizada(tasa_mensual[:, None], meses, n_pagos[:, None])
+    saldo = montos[:, None] * (1.0 - fraccion)
+    saldo_anterior = np.concatenate([montos[:, None], saldo[:, :-1]], axis=1)
+    saldo_anterior[~activo] = 0.0
+
+    interes = saldo_anterior * tasa_mensual[:, None]
+    capital = saldo_anterior - np.where(activo, saldo, 0.0)
+    return {
+        "mes": mes,
+        "activo": activo,
+        "cuota": np.where(activo, cuota[:, None], 0.0),
+        "capital": capital,
+        "interes": interes,
+        "saldo": np.where(activo, saldo, 0.0),
+    }
+
+
+def _factor_saldo(tasa_mensual, restantes):
+    # Con la cuota recalculada cada mes sobre el saldo, la tasa vigente y los
+    # pagos restantes m, el saldo tras pagar es saldo * (1 - r / ((1+r)^m - 1)).
+    # Con tasa 0 el límite es (m - 1) / m; en el último pago el factor es 0.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = 1.0 - tasa_mensual / np.expm1(restantes * np.log1p(tasa_mensual))
+        lineal = (restantes - 1) / restantes
+    return np.where(tasa_mensual != 0, factor, lineal)
+
+
+def _a_meses(valores, meses, modo):
+    # Un escalar se expande solo; una fila es una trayectoria (1 x mes) que se recorta o se extiende
+    valores = np.asarray(valores, dtype=float)
+    if valores.ndim == 0:
+        return valores
+    if valores.ndim == 1:
+        valores = valores[None, :]
+    if valores.shape[1] >= meses:
+        return valores[:, :meses]
+    return np.pad(valores, ((0, 0), (0, meses - valores.shape[1])), mode=modo)
+
+
+def cronograma_lote(montos, tasas_anuales, anios, meses_gracia=0, capitalizar=False, prepagos=0.0, meses=None):
+    """Cronogramas de un lote de préstamos con tasa variable, gracia y prepagos.
+
+    `tasas_anuales` (%) es un arreglo (préstamo x mes) o cualquier forma que
+    se expanda a él: un escalar es tasa fija y una fila es la misma
+    trayectoria para todos. Durante los `meses_gracia` primeros meses solo se
+    pagan intereses o, con `capitalizar`, los intereses se suman al saldo;
+    después la cuota se recalcula cada mes para terminar en `anios * 12`
+    pagos. `prepagos` (préstamo x mes) abona capital extra después de la
+    cuota, sin pasar del saldo. Con `meses` se calculan solo los primeros
+    meses. Devuelve matrices (préstamo x mes) `tasa`, `cuota`, `prepago`,
+    `capital`, `interes` (pagado), `interes_capitalizado` y `saldo`, más el
+    vector `mes`. Con tasa fija, sin gracia ni prepagos, coincide con
+    `calcular_amortizacion_lote`.
+    """
+    montos, n_pagos, gracia, capitalizar = np.broadcast_arrays(
+        np.asarray(montos, dtype=float),
+        np.asarray(anios, dtype=np.int64) * 12,
+        np.asarray(meses_gracia, dtype=np.int64),
+        np.asarray(capitalizar, dtype=bool),
+    )
+    montos, n_pagos, gracia, capitalizar = (a.ravel()[:, None] for a in (montos, n_pagos, gracia, capitalizar))
+    total_meses = int((gracia + n_pagos).max(initial=0))
+    total_meses = total_meses if meses is None else min(int(meses), total_meses)
+    mes = np.arange(1, total_meses + 1)
+
+    # Una trayectoria de tasas más corta que el préstamo mantiene su última
+    # tasa; los prepagos que faltan son cero
+    tasas = _a_meses(tasas_anuales, total_meses, "edge")
+    prepagos = _a_meses(prepagos, total_meses, "constant")
+    n_prestamos = max([montos.shape[0], *(a.shape[0] for a in (tasas, prepagos) if a.ndim == 2)])
+    tasa = np.broadcast_to(tasas / 1200, (n_prestamos, total_meses))
+    prepagos = np.broadcast_to(prepagos, tasa.shape)
+
+    en_gracia = mes[None, :] <= gracia
+    capitaliza = en_gracia & capitalizar
+    restantes = gracia + n_pagos - mes[None, :] + 1
+    factor = np.where(capitaliza, 1.0 + tasa, 1.0)
+    amortiza = ~en_gracia & (restantes > 0)
+    factor = np.where(amortiza, _factor_saldo(tasa, np.maximum(restantes, 1)), factor)
+    factor = np.where(restantes > 0, factor, 0.0)
+
+    # saldo_t = factor_t * saldo_{t-1} - prepago_t se resuelve dividiendo por
+    # el producto acumulado F_t: saldo_t = F_t * (monto - sum(prepago_s / F_s)).
+    # Cuando el saldo normalizado llega a cero el préstamo ya se pagó y
+    # queda en cero, así que recortarlo en cero es exacto.
+    acumulado = np.cumprod(factor, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        descontados = np.where(acumulado > 0, prepagos / acumulado, 0.0)
+    saldo = acumulado * np.maximum(montos - np.cumsum(descontados, axis=1), 0.0)
+    saldo = np.where(acumulado > 0, saldo, 0.0)
+    saldo_anterior = np.concatenate([np.broadcast_to(montos, (n_prestamos, 1)), saldo[:, :-1]], axis=1)
+
+    antes_del_prepago = saldo_anterior * factor
+    interes = saldo_anterior * tasa
+    interes_capitalizado = np.where(capitaliza, interes, 0.0)
+    cuota = saldo_anterior * (1.0 + tasa) - antes_del_prepago
+    interes_pagado = interes - interes_capitalizado
+    return {
+        "mes": mes,
+        "tasa": tasa * 1200,
+        "cuota": cuota,
+        "prepago": np.where(prepagos > 0, antes_del_prepago - saldo, 0.0),
+        "capital": cuota - interes_pagado,
+        "interes": interes_pagado,
+        "interes_capitalizado": interes_capitalizado,
+        "saldo": saldo,
+    }
+
+
+def resumen_cronograma(cronograma):
+    """Totales por préstamo de un cronograma de `cronograma_lote`.
+
+    `total_intereses` incluye los intereses capitalizados, que se terminan
+    pagando con el capital.
+    """
+    total_pagado = (cronograma["cuota"] + cronograma["prepago"]).sum(axis=1)
+    return {
+        "total_pagado": total_pagado,
+        "total_prepagos": cronograma["prepago"].sum(axis=1),
+        "total_intereses": cronograma["interes"].sum(axis=1) + cronograma["interes_capitalizado"].sum(axis=1),
+    }
+
+
+def tabla_cronograma(cronograma, fila=0):
+    """Cronograma de un préstamo del lote como DataFrame, con las columnas de `COLUMNAS_CRONOGRAMA`."""
+    import pandas as pd
+    claves = ["tasa", "cuota", "prepago", "capital", "interes", "interes_capitalizado", "saldo"]
+    return pd.DataFrame(
+        {"Mes": cronograma["mes"], **{c: np.asarray(cronograma[k][fila]) for c, k in zip(COLUMNAS_CRONOGRAMA[1:], claves)}},
+        columns=COLUMNAS_CRONOGRAMA,
+    )
+
+
+def calcular_amortizacion(monto, tasa_anual, anios):
+    """Tabla de amortización de un solo préstamo como DataFrame, y su cuota."""
+    lote = calcular_amortizacion_lote(monto, tasa_anual, anios)
+    pago_mensual = float(lote["cuota"][0, 0]) if lote["mes"].size else 0.0
+    import pandas as pd  # solo quien muestra la tabla paga la importación de pandas
+    tabla = pd.DataFrame({
+        "Mes": lote["mes"],
+        "Cuota Mensual": lote["cuota"][0],
+        "Capital Pagado": lote["capital"][0],
+        "Interés Pagado": lote["interes"][0],
+        "Saldo Restante": lote["saldo"][0],
+    }, columns=COLUMNAS_TABLA)
+    return tabla, pago_mensual
@@ -0,0 +1,142 @@
+"""Generador de carga local para el servicio de evaluación (`calculos.servicio`).
+
+Varios hilos envían solicitudes POST /evaluar por conexiones persistentes y
+se mide el rendimiento (solicitudes y proyectos por segundo) y la latencia
+(p50, p95 y p99). Los proyectos varían el precio de venta sobre los valores
+por defecto; con `--distintos` menor que el total de proyectos se repiten
+entradas y se ejercita la caché del servicio.
+
+Uso:
+    python -m calculos.servicio --procesos 4 &
+    python -m calculos.carga --solicitudes 2000 --concurrencia 16
+    python -m calculos.carga --lote 100 --distintos 500 --json carga.json
+"""
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from calculos.modelo import DatosProyecto
+
+PERCENTILES_LATENCIA = (50, 95, 99)
+
+
+def _proyecto(i, distintos):
+    # Variaciones de ±5% del precio de venta; `i % distintos` fija cuántas entradas distintas hay
+    paso = i % distintos
+    return {"precio_venta_unitario": DatosProyecto.precio_venta_unitario * (0.95 + 0.1 * paso / max(distintos, 1))}
+
+
+def _cuerpos(solicitudes, lote, distintos):
+    for i in range(solicitudes):
+        proyectos = [_proyecto(i * lote + j, distintos) for j in range(lote)]
+        solicitud = {"proyectos": proyectos} if lote > 1 else {"datos": proyectos[0]}
+        yield json.dumps(solicitud).encode()
+
+
+def ejecutar_carga(url, solicitudes=1_000, concurrencia=8, lote=1, distintos=100):
+    """Envía las solicitudes desde `concurrencia` hilos y resume rendimiento y latencias."""
+    partes = urlsplit(url)
+    cuerpos = list(_cuerpos(solicitudes, lote, distintos))
+    latencias = np.zeros(solicitudes)
+    errores = []
+    siguiente = iter(range(solicitudes))
+    candado = threading.Lock()
+
+    def trabajador():
+        conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=60)
+        try:
+            while True:
+                with candado:
+                    i = next(siguiente, None)
+                if i is None:
+                    return
+                inicio = time.perf_counter()
+                try:
+                    conexion.request("POST", "/evaluar", body=cuerpos[i], headers={"Content-Type": "application/json"})
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    if respuesta.status != 200:
+                        errores.append(respuesta.status)
+                except (OSError, http.client.HTTPException) as error:
+                    # Una conexión caída cuenta como error; la siguiente solicitud abre otra
+                    errores.append(type(error).__name__)
+                    conexion.close()
+                latencias[i] = time.perf_counter() - inicio
+        finally:
+            conexion.close()
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(concurrencia)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    return {
+        "solicitudes": solicitudes,
+        "proyectos": solicitudes * lote,
+        "concurrencia": concurrencia,
+        "errores": len(errores),
+        "segundos": duracion,
+        "solicitudes_por_segundo": solicitudes / duracion,
+        "proyectos_por_segundo": solicitudes * lote / duracion,
+        "latencia_ms": {f"p{p}": float(v) * 1e3 for p, v in zip(PERCENTILES_LATENCIA, np.percentile(latencias, PERCENTILES_LATENCIA))},
+    }
+
+
+def _estado(url):
+    partes = urlsplit(url)
+    conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=10)
+    try:
+        conexion.request("GET", "/salud")
+        return json.loads(conexion.getresponse().read())
+    finally:
+        conexion.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m calculos.carga",
+        description="Mide rendimiento y latencia del servicio de evaluación local.",
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8765", help="Dirección del servicio.")
+    parser.add_argument("--solicitudes", type=int, default=1_000, help="Solicitudes a enviar (por defecto: 1000).")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Hilos cliente simultáneos (por defecto: 8).")
+    parser.add_argument("--lote", type=int, default=1, help="Proyectos por solicitud (por defecto: 1).")
+    parser.add_argument("--distintos", type=int, default=100, help="Entradas distintas entre todos los proyectos.")
+    parser.add_argument("--json", help="Guarda el resultado en este archivo JSON.")
+    args = parser.parse_args(argv)
+
+    try:
+        antes = _estado(args.url)["cache"]
+        resultado = ejecutar_carga(args.url, args.solicitudes, args.concurrencia, args.lote, args.distintos)
+        despues = _estado(args.url)["cache"]
+    except OSError as error:
+        print(f"No se pudo conectar con {args.url}: {error}", file=sys.stderr)
+        return 1
+    consultas = (despues["aciertos"] - antes["aciertos"]) + (despues["fallos"] - antes["fallos"])
+    resultado["aciertos_cache_pct"] = 100 * (despues["aciertos"] - antes["aciertos"]) / max(consultas, 1)
+
+    latencia = resultado["latencia_ms"]
+    print(f"{resultado['solicitudes']:,} solicitudes ({resultado['proyectos']:,} proyectos) "
+          f"en {resultado['segundos']:.2f} s con {resultado['concurrencia']} hilos", file=sys.stderr)
+    print(f"  {resultado['solicitudes_por_segundo']:,.0f} solicitudes/s, {resultado['proyectos_por_segundo']:,.0f} proyectos/s",
+          file=sys.stderr)
+    print(f"  latencia p50 {latencia['p50']:.2f} ms, p95 {latencia['p95']:.2f} ms, p99 {latencia['p99']:.2f} ms",
+          file=sys.stderr)
+    print(f"  aciertos de caché {resultado['aciertos_cache_pct']:.1f}%, errores {resultado['errores']}", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2)
+    return 1 if resultado["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
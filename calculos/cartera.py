@@ -0,0 +1,132 @@
+"""Evaluación por lotes de una cartera de proyectos desde la línea de comandos.
+
+Lee un archivo CSV o Parquet con un proyecto por fila (columnas con los
+nombres de los campos de `DatosProyecto`; las ausentes toman el valor por
+defecto) y escribe una tabla de KPIs en Parquet, o en CSV si la salida
+termina en `.csv`. El archivo se procesa por bloques, opcionalmente en varios
+procesos, con un número acotado de bloques en memoria a la vez.
+
+Uso:
+    python -m calculos.cartera proyectos.csv kpis.parquet --procesos 4
+"""
+import argparse
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from calculos.modelo import KPIS_FLUJO, DatosProyecto, evaluar_lote
+
+COLUMNA_ID = "proyecto"
+COLUMNAS_KPI = (
+    "ingresos_totales",
+    "costo_total_inversion",
+    "utilidad_neta",
+    "roi",
+    "roc",
+    "maxima_necesidad_capital",
+    "cuota_mensual",
+)
+
+
+def leer_bloques(ruta, tamano_bloque):
+    """Itera el archivo de entrada en DataFrames de a lo sumo `tamano_bloque` filas."""
+    ruta = Path(ruta)
+    if ruta.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(ruta).iter_batches(batch_size=tamano_bloque):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(ruta, chunksize=tamano_bloque)
+
+
+def variaciones_bloque(bloque):
+    """Columnas del bloque que son campos de `DatosProyecto`, como variaciones de `evaluar_lote`."""
+    defecto = DatosProyecto()
+    variaciones = {}
+    for campo in fields(DatosProyecto):
+        if campo.name in bloque:
+            columna = bloque[campo.name].fillna(getattr(defecto, campo.name)).to_numpy()
+            variaciones[campo.name] = columna.astype(np.int64 if campo.type is int else float)
+    return variaciones
+
+
+def evaluar_bloque(bloque, metricas_flujo=False):
+    """KPIs de un bloque de proyectos, en el mismo orden de las filas."""
+    kpis = evaluar_lote(DatosProyecto(), metricas_flujo=metricas_flujo, **variaciones_bloque(bloque))
+
+    n_filas = len(bloque)
+    columnas = COLUMNAS_KPI + (KPIS_FLUJO if metricas_flujo else ())
+    resultado = pd.DataFrame({nombre: np.broadcast_to(kpis[nombre], n_filas) for nombre in columnas})
+    if COLUMNA_ID in bloque:
+        resultado.insert(0, COLUMNA_ID, bloque[COLUMNA_ID].to_numpy())
+    return resultado
+
+
+def _resultados(bloques, procesos, metricas_flujo):
+    if procesos <= 1:
+        for bloque in bloques:
+            yield evaluar_bloque(bloque, metricas_flujo)
+        return
+    # Como máximo dos bloques pendientes por proceso: la memoria no crece con el archivo.
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        for bloque in bloques:
+            pendientes.append(pool.submit(evaluar_bloque, bloque, metricas_flujo))
+            if len(pendientes) >= 2 * procesos:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+
+def evaluar_cartera(entrada, salida, tamano_bloque=50_000, procesos=1, metricas_flujo=False):
+    """Evalúa todos los proyectos de `entrada` y escribe sus KPIs en `salida`.
+
+    Con `metricas_flujo` se agregan TIR, VAN y mes de recuperación. Devuelve
+    el número de proyectos evaluados.
+    """
+    salida = Path(salida)
+    total = 0
+    escritor = None
+    try:
+        for resultado in _resultados(leer_bloques(entrada, tamano_bloque), procesos, metricas_flujo):
+            if salida.suffix.lower() == ".csv":
+                resultado.to_csv(salida, mode="a" if total else "w", header=not total, index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                tabla = pa.Table.from_pandas(resultado, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(salida, tabla.schema)
+                escritor.write_table(tabla)
+            total += len(resultado)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m calculos.cartera",
+        description="Evalúa una cartera de proyectos inmobiliarios desde un archivo CSV o Parquet.",
+    )
+    parser.add_argument("entrada", help="Archivo .csv o .parquet con un proyecto por fila.")
+    parser.add_argument("salida", help="Archivo de KPIs (.parquet, o .csv).")
+    parser.add_argument("--bloque", type=int, default=50_000, help="Filas por bloque (por defecto: 50000).")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos de trabajo (por defecto: 1).")
+    parser.add_argument("--metricas-flujo", action="store_true", help="Agrega TIR, VAN y mes de recuperación.")
+    args = parser.parse_args(argv)
+
+    total = evaluar_cartera(args.entrada, args.salida, tamano_bloque=args.bloque, procesos=args.procesos,
+                            metricas_flujo=args.metricas_flujo)
+    print(f"{total:,} proyectos evaluados -> {args.salida}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
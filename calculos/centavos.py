@@ -0,0 +1,94 @@
+"""Aritmética exacta en centavos para los totales de costos y el flujo de caja.
+
+Con `DatosProyecto.centavos_exactos` los importes se redondean una sola vez a
+centavos enteros (int64) y a partir de ahí todas las sumas son exactas. Un
+total que se reparte entre varios meses se divide con enteros y los centavos
+que sobran se asignan de manera determinista: el mes k recibe
+round(total * k / n) - round(total * (k - 1) / n), así que los restos quedan
+espaciados a lo largo del intervalo y los meses siempre suman el total. Las
+series de montos en punto flotante (cobros por ventas, pagos del préstamo)
+se convierten con el mismo criterio, redondeando la suma acumulada.
+
+Todo trabaja sobre matrices (escenario x mes) con operaciones de NumPy, como
+el cálculo en punto flotante.
+"""
+import numpy as np
+
+# Claves con importes en los cronogramas de `calculos.amortizacion.cronograma_lote`
+IMPORTES_CRONOGRAMA = ("cuota", "prepago", "capital", "interes", "interes_capitalizado", "saldo")
+
+
+def redondear(valores):
+    """Entero más cercano, con las mitades lejos del cero (como se redondea al facturar)."""
+    valores = np.asarray(valores, dtype=float)
+    return np.trunc(valores + np.copysign(0.5, valores)).astype(np.int64)
+
+
+def a_centavos(montos):
+    """Montos en moneda a centavos enteros (int64)."""
+    return redondear(np.asarray(montos, dtype=float) * 100)
+
+
+def a_moneda(centavos):
+    """Centavos enteros a moneda: el double más cercano a cada importe con dos decimales."""
+    return np.asarray(centavos) / 100
+
+
+def _dividir(dividendo, divisor):
+    # round(dividendo / divisor) con enteros, mitades lejos del cero; divisor > 0
+    return np.sign(dividendo) * ((np.abs(dividendo) * 2 + divisor) // (divisor * 2))
+
+
+def partes_iguales(total, n_partes, k):
+    """Parte k (desde 0) de `total` centavos dividido en `n_partes`; las partes suman exactamente el total."""
+    total, n_partes, k = np.asarray(total, dtype=np.int64), np.maximum(np.asarray(n_partes, dtype=np.int64), 1), np.asarray(k)
+    return np.where(k < n_partes, _dividir(total * (k + 1), n_partes) - _dividir(total * k, n_partes), 0)
+
+
+def repartido_acumulado(total, inicio, fin, horizonte):
+    """Lo ya pagado de `total` centavos repartidos entre inicio..fin, al final de cada periodo 0..horizonte."""
+    total, inicio, fin = (np.asarray(a, dtype=np.int64).reshape(-1, 1) for a in (total, inicio, fin))
+    duracion = np.maximum(fin - inicio + 1, 1)
+    transcurrido = np.clip(np.arange(horizonte + 1)[None, :] - inicio + 1, 0, duracion)  # periodos ya pagados
+    return np.where(fin >= inicio, _dividir(total * transcurrido, duracion), 0)
+
+
+def repartir(total, inicio, fin, horizonte):
+    """Reparte `total` centavos entre los periodos inicio..fin (escenario x periodo 1..horizonte).
+
+    Igual que `ConstructorFlujo.repartir`, lo que cae fuera del horizonte se descarta.
+    """
+    return np.diff(repartido_acumulado(total, inicio, fin, horizonte), axis=1)
+
+
+def redondear_serie(montos):
+    """Serie en moneda (escenario x periodo) a centavos, redondeando la suma acumulada.
+
+    Cada fila suma exactamente su total redondeado: los restos de cada periodo
+    pasan al siguiente en lugar de acumularse.
+    """
+    montos = np.asarray(montos, dtype=float)
+    acumulado = a_centavos(np.cumsum(montos, axis=-1))
+    return np.diff(acumulado, axis=-1, prepend=0)
+
+
+def cronograma_centavos(cronograma, montos):
+    """Cronograma de `cronograma_lote` en centavos, con cada fila cuadrada al centavo.
+
+    El saldo de cada mes, la cuota y los prepagos se redondean; el capital sale
+    de la variación del saldo y el interés es la cuota menos el capital, así
+    que el centavo de redondeo de cada mes queda en el interés, la cuota fija
+    sigue fija y el saldo termina exactamente en cero.
+    """
+    montos = np.broadcast_to(a_centavos(montos).reshape(-1), (cronograma["saldo"].shape[0],))
+    saldo = a_centavos(cronograma["saldo"])
+    cuota = a_centavos(cronograma["cuota"])
+    prepago = a_centavos(cronograma["prepago"])
+    saldo_anterior = np.concatenate([montos[:, None], saldo[:, :-1]], axis=1)
+    # En los meses sin cuota (gracia capitalizada) todo el cambio del saldo es interés capitalizado
+    capitalizado = np.where(cuota > 0, a_centavos(cronograma["interes_capitalizado"]), saldo + prepago - saldo_anterior)
+    capital = np.where(cuota > 0, saldo_anterior + capitalizado - prepago - saldo, 0)
+    resultado = dict(cronograma)
+    resultado.update(cuota=cuota, prepago=prepago, capital=capital, interes=cuota - capital,
+                     interes_capitalizado=capitalizado, saldo=saldo)
+    return resultado
@@ -0,0 +1,81 @@
+"""Tablas de detalle de costos y gastos, y sus totales.
+
+Las páginas de Costos Detallados y Gastos Admin editan estas tablas; los
+totales alimentan los campos `total_*` de `DatosProyecto`. Con `exacto`
+cada fila se redondea a centavos y la suma se hace con enteros, sin el
+error acumulado del punto flotante.
+"""
+import numpy as np
+
+from calculos import centavos
+
+DURACION_GASTOS_ADMIN_MESES = 18
+
+# Columnas de las tablas iniciales de las páginas 02 y 03
+COLUMNAS_POR_DEFECTO = {
+    'costos_urbanizacion_df': {
+        'Concepto': ['Movimiento de tierras', 'Red de alcantarillado', 'Red eléctrica', 'Pavimentación', 'Estudios y diseños'],
+        'Valor Estimado': [15000.0, 25000.0, 18500.0, 22000.0, 4150.0]
+    },
+    'costos_construccion_df': {
+        'Componente': ['Cimentación', 'Estructura', 'Mampostería', 'Acabados', 'Instalaciones (agua, luz)'],
+        'Costo por Vivienda': [5500.0, 7000.0, 4200.0, 6500.0, 2650.0]
+    },
+    'gastos_admin_df': {
+        'Concepto': ['Alquiler de oficina', 'Servicios públicos (luz, agua)', 'Sueldos y Salarios', 'Publicidad', 'Contabilidad externa'],
+        'Valor Mensual': [500.0, 150.0, 3000.0, 200.0, 250.0]
+    },
+    'activos_df': {
+        'Activo Fijo': ['Laptop', 'Escritorio', 'Silla de oficina', 'Impresora'],
+        'Cantidad': [2, 2, 2, 1],
+        'Valor Unitario': [1200.0, 150.0, 75.0, 300.0],
+        'Valor Total': [2400.0, 300.0, 150.0, 300.0]  # la página 03 la recalcula como Cantidad x Valor Unitario
+    },
+    'permisos_df': {
+        'Permiso o Impuesto': ['Licencia ambiental', 'Permiso de urbanización', 'Permisos de construcción', 'Apertura de empresa'],
+        'Valor Estimado': [3000.0, 5000.0, 4500.0, 1000.0]
+    },
+}
+
+
+def tablas_por_defecto():
+    """Tablas iniciales de las páginas 02 y 03 como DataFrames (copias nuevas en cada llamada)."""
+    import pandas as pd
+    return {clave: pd.DataFrame(columnas) for clave, columnas in COLUMNAS_POR_DEFECTO.items()}
+
+
+def _columna(tabla, nombre):
+    # Sirve para un DataFrame editado, una tabla compacta o las columnas por defecto;
+    # las filas nuevas del editor llegan vacías y cuentan como cero
+    valores = tabla[nombre]
+    if hasattr(valores, 'to_numpy') or np.asarray(valores).dtype == object:
+        import pandas as pd
+        valores = pd.to_numeric(pd.Series(valores), errors='coerce').to_numpy(dtype=float)
+    return np.nan_to_num(np.asarray(valores, dtype=float))
+
+
+def _sumar(valores, exacto):
+    return float(centavos.a_moneda(centavos.a_centavos(valores).sum())) if exacto else float(valores.sum())
+
+
+def total_urbanizacion(costos_urbanizacion_df, exacto=False):
+    return _sumar(_columna(costos_urbanizacion_df, 'Valor Estimado'), exacto)
+
+
+def total_construccion_unitaria(costos_construccion_df, exacto=False):
+    return _sumar(_columna(costos_construccion_df, 'Costo por Vivienda'), exacto)
+
+
+def total_admin_periodo(gastos_admin_df, duracion_meses, exacto=False):
+    mensual = _columna(gastos_admin_df, 'Valor Mensual')
+    if exacto:
+        return float(centavos.a_moneda(centavos.a_centavos(mensual).sum() * duracion_meses))
+    return float(mensual.sum()) * duracion_meses
+
+
+def total_activos(activos_df, exacto=False):
+    return _sumar(_columna(activos_df, 'Cantidad') * _columna(activos_df, 'Valor Unitario'), exacto)
+
+
+def total_permisos(permisos_df, exacto=False):
+    return _sumar(_columna(permisos_df, 'Valor Estimado'), exacto)
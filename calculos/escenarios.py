@@ -0,0 +1,217 @@
+"""Almacén local de escenarios en SQLite.
+
+Un escenario es la foto de las entradas del simulador: los campos de
+`DatosProyecto` y las tablas de detalle de las páginas de costos y gastos.
+Las entradas se normalizan y se identifican por el hash SHA-256 de su forma
+canónica, así dos escenarios con el mismo contenido comparten una sola fila
+y un solo resultado calculado. Los resultados se guardan por hash y por
+versión del modelo, de modo que abrir o comparar escenarios ya calculados no
+vuelve a evaluar nada.
+"""
+import hashlib
+import io
+import json
+import math
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import asdict, fields
+from pathlib import Path
+
+import numpy as np
+
+from calculos.memoria import como_dataframe
+from calculos.modelo import DatosProyecto, ResultadosProyecto, evaluar_proyecto
+
+RUTA_POR_DEFECTO = Path(os.environ.get("SIMULADOR_ESCENARIOS", "escenarios.sqlite3"))
+# Cambiarla invalida los resultados guardados cuando cambian las fórmulas del modelo:
+# 2, préstamo con gracia, prepagos y tasa variable; 3, ventas con curva de absorción,
+# plan de pagos y entregas por fases; 4, aritmética exacta en centavos; 5, una construcción
+# sin meses (fin antes del inicio) no tiene costo; 6, TIR, VAN y recuperación desde el
+# mismo acumulado que evaluar_lote
+VERSION_MODELO = 6
+TABLAS = ("costos_urbanizacion_df", "costos_construccion_df", "gastos_admin_df", "activos_df", "permisos_df")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS contenidos (
+    hash TEXT PRIMARY KEY,
+    entradas TEXT NOT NULL,
+    creado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS escenarios (
+    nombre TEXT PRIMARY KEY,
+    hash TEXT NOT NULL REFERENCES contenidos(hash),
+    guardado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    hash TEXT NOT NULL REFERENCES contenidos(hash),
+    version INTEGER NOT NULL,
+    kpis TEXT NOT NULL,
+    flujo BLOB NOT NULL,
+    PRIMARY KEY (hash, version)
+);
+"""
+_KPIS = tuple(campo.name for campo in fields(ResultadosProyecto) if campo.name not in ("meses", "flujo"))
+
+
+def _valor(v):
+    if isinstance(v, (bool, np.bool_)):
+        return bool(v)
+    if isinstance(v, (int, float, np.integer, np.floating)):
+        return None if math.isnan(v) else float(v)
+    return None if v is None else str(v)
+
+
+def _tabla(df):
+    import pandas as pd
+    df = pd.DataFrame(como_dataframe(df)).reset_index(drop=True)
+    tipos = [str(t) for t in df.dtypes]
+    df = df.astype(object).where(df.notna(), None)  # pd.NA y NaN se guardan como null
+    return {
+        "columnas": [str(c) for c in df.columns],
+        "tipos": tipos,
+        "filas": [[_valor(v) for v in fila] for fila in df.itertuples(index=False, name=None)],
+    }
+
+
+def normalizar(estado):
+    """Entradas de un escenario en forma canónica, a partir de `st.session_state` o cualquier mapeo."""
+    return {
+        "datos": asdict(DatosProyecto.desde_estado(estado)),
+        "tablas": {clave: _tabla(estado[clave]) for clave in TABLAS if clave in estado},
+    }
+
+
+def hash_entradas(entradas):
+    """Hash del contenido; los tipos de columna no cuentan (10 y 10.0 son la misma entrada)."""
+    canonico = {
+        "datos": {k: _valor(v) for k, v in entradas["datos"].items()},
+        "tablas": {k: [t["columnas"], t["filas"]] for k, t in entradas["tablas"].items()},
+    }
+    texto = json.dumps(canonico, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def estado_desde_entradas(entradas):
+    """Valores listos para volcar en `st.session_state`: campos escalares y DataFrames."""
+    estado = dict(entradas["datos"])
+    if entradas["tablas"]:
+        import pandas as pd
+    for clave, tabla in entradas["tablas"].items():
+        df = pd.DataFrame(tabla["filas"], columns=tabla["columnas"])
+        estado[clave] = df.astype(dict(zip(tabla["columnas"], tabla["tipos"])), errors="ignore")
+    return estado
+
+
+def _serializar_flujo(resultados):
+    destino = io.BytesIO()
+    np.savez(destino, meses=resultados.meses, flujo=resultados.flujo)
+    return destino.getvalue()
+
+
+def _resultados_desde_fila(kpis, flujo):
+    arreglos = np.load(io.BytesIO(flujo))
+    meses, matriz = arreglos["meses"], arreglos["flujo"]
+    meses.flags.writeable = False
+    matriz.flags.writeable = False
+    return ResultadosProyecto(**json.loads(kpis), meses=meses, flujo=matriz)
+
+
+class AlmacenEscenarios:
+    """Escenarios con nombre y resultados calculados en un archivo SQLite.
+
+    Cada operación abre su propia conexión, así el almacén se puede usar
+    desde los hilos de distintas sesiones de Streamlit.
+    """
+
+    def __init__(self, ruta=RUTA_POR_DEFECTO):
+        self.ruta = Path(ruta)
+        with closing(self._conectar()) as conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.executescript(_ESQUEMA)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def guardar(self, nombre, estado):
+        """Guarda (o reemplaza) el escenario `nombre`. Devuelve `(hash, contenido_nuevo)`."""
+        entradas = normalizar(estado)
+        clave = hash_entradas(entradas)
+        ahora = time.time()
+        with closing(self._conectar()) as conexion, conexion:
+            nuevo = conexion.execute(
+                "INSERT OR IGNORE INTO contenidos VALUES (?, ?, ?)",
+                (clave, json.dumps(entradas, ensure_ascii=False), ahora),
+            ).rowcount == 1
+            conexion.execute("INSERT OR REPLACE INTO escenarios VALUES (?, ?, ?)", (nombre, clave, ahora))
+        return clave, nuevo
+
+    def hash_de(self, nombre):
+        with closing(self._conectar()) as conexion:
+            fila = conexion.execute("SELECT hash FROM escenarios WHERE nombre = ?", (nombre,)).fetchone()
+        if fila is None:
+            raise KeyError(f"No existe el escenario: {nombre}")
+        return fila[0]
+
+    def cargar(self, nombre):
+        """Entradas del escenario como valores para `st.session_state`."""
+        clave = self.hash_de(nombre)
+        with closing(self._conectar()) as conexion:
+            (entradas,) = conexion.execute("SELECT entradas FROM contenidos WHERE hash = ?", (clave,)).fetchone()
+        return estado_desde_entradas(json.loads(entradas))
+
+    def eliminar(self, nombre):
+        """Borra el nombre y, si ya nadie lo usa, el contenido y sus resultados."""
+        clave = self.hash_de(nombre)
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute("DELETE FROM escenarios WHERE nombre = ?", (nombre,))
+            if conexion.execute("SELECT 1 FROM escenarios WHERE hash = ?", (clave,)).fetchone() is None:
+                conexion.execute("DELETE FROM resultados WHERE hash = ?", (clave,))
+                conexion.execute("DELETE FROM contenidos WHERE hash = ?", (clave,))
+
+    def nombres(self):
+        """Nombres de los escenarios guardados, del más reciente al más antiguo (sin cargar pandas)."""
+        with closing(self._conectar()) as conexion:
+            return [fila[0] for fila in conexion.execute("SELECT nombre FROM escenarios ORDER BY guardado DESC")]
+
+    def listar(self):
+        """Escenarios guardados, del más reciente al más antiguo."""
+        import pandas as pd
+        with closing(self._conectar()) as conexion:
+            return pd.read_sql_query(
+                "SELECT e.nombre, e.hash, e.guardado, r.hash IS NOT NULL AS calculado "
+                "FROM escenarios e LEFT JOIN resultados r ON r.hash = e.hash AND r.version = ? "
+                "ORDER BY e.guardado DESC",
+                conexion, params=(VERSION_MODELO,),
+            ).assign(
+                guardado=lambda df: pd.to_datetime(df["guardado"], unit="s"),
+                calculado=lambda df: df["calculado"].astype(bool),
+            )
+
+    def resultados(self, clave):
+        """Resultados del contenido `clave`: del disco si ya están, si no se calculan y se guardan."""
+        with closing(self._conectar()) as conexion:
+            fila = conexion.execute(
+                "SELECT kpis, flujo FROM resultados WHERE hash = ? AND version = ?", (clave, VERSION_MODELO)
+            ).fetchone()
+            if fila is not None:
+                return _resultados_desde_fila(*fila)
+            (entradas,) = conexion.execute("SELECT entradas FROM contenidos WHERE hash = ?", (clave,)).fetchone()
+        resultados = evaluar_proyecto(DatosProyecto.desde_estado(json.loads(entradas)["datos"]))
+        kpis = json.dumps({nombre: getattr(resultados, nombre) for nombre in _KPIS})
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?)",
+                (clave, VERSION_MODELO, kpis, _serializar_flujo(resultados)),
+            )
+        return resultados
+
+    def comparar(self, nombres, kpis=_KPIS):
+        """Tabla escenario x KPI; solo se calculan los contenidos que aún no tienen resultados."""
+        import pandas as pd
+        filas = {nombre: self.resultados(self.hash_de(nombre)) for nombre in nombres}
+        return pd.DataFrame(
+            {nombre: [getattr(resultados, kpi) for kpi in kpis] for nombre, resultados in filas.items()},
+            index=list(kpis),
+        ).T
@@ -0,0 +1,108 @@
+"""Motor de flujo de caja basado en eventos e intervalos.
+
+Cada partida del flujo (terreno, urbanización, construcción, préstamo,
+ventas, cuotas...) se describe como un intervalo repartido, un pago que se
+repite o un evento puntual. Todas se acumulan con sumas dispersas
+(`np.add.at`) en un arreglo preasignado de forma (escenario x componente x
+periodo), de modo que un lote completo de cronogramas se arma sin recorrer
+los periodos en Python. El periodo puede ser el mes o el día.
+
+Con `exacto` los montos se acumulan en centavos enteros (int64): cada
+partida se redondea a centavos una vez y los repartos dividen con enteros,
+con los restos distribuidos como en `calculos.centavos`.
+"""
+import numpy as np
+
+from calculos import centavos
+
+DIAS_POR_MES = 30  # convención comercial 30/360
+PERIODOS_POR_MES = {"mensual": 1, "diaria": DIAS_POR_MES}
+
+
+class ConstructorFlujo:
+    """Acumula partidas de un lote de flujos de caja.
+
+    Los periodos se numeran desde 1, como los meses en la página de Flujo de
+    Caja. Los argumentos de cada partida pueden ser escalares o vectores con
+    un valor por escenario; lo que cae fuera del horizonte se descarta.
+    Los montos siempre se dan en moneda; con `exacto` la matriz resultante
+    queda en centavos enteros.
+    """
+
+    def __init__(self, n_escenarios, n_componentes, horizonte, exacto=False):
+        self.n_escenarios = n_escenarios
+        self.horizonte = horizonte
+        self.exacto = exacto
+        tipo = np.int64 if exacto else float
+        # Los intervalos se registran en un arreglo de diferencias (+monto al
+        # inicio, -monto al final) que se integra con una sola suma acumulada;
+        # los pagos periódicos con paso > 1 se dispersan directamente.
+        self._diferencias = np.zeros((n_escenarios, n_componentes, horizonte + 1), dtype=tipo)
+        self._dispersos = np.zeros((n_escenarios, n_componentes, horizonte + 1), dtype=tipo)
+        self._filas = np.arange(n_escenarios)
+
+    def _vector(self, valor, dtype=float):
+        return np.broadcast_to(np.asarray(valor, dtype=dtype), self.n_escenarios)
+
+    def _montos(self, monto):
+        monto = self._vector(monto)
+        return centavos.a_centavos(monto) if self.exacto else monto
+
+    def repetir(self, componente, inicio, fin, monto, paso=1):
+        """Suma `monto` en los periodos inicio, inicio + paso, ... hasta `fin` inclusive."""
+        inicio = self._vector(inicio, np.int64)
+        fin = np.minimum(self._vector(fin, np.int64), self.horizonte)
+        monto = self._montos(monto)
+        if paso == 1:
+            desde = np.clip(inicio - 1, 0, self.horizonte)
+            hasta = np.clip(fin, 0, self.horizonte)
+            valido = desde < hasta
+            np.add.at(self._diferencias, (self._filas, componente, desde), np.where(valido, monto, 0))
+            np.add.at(self._diferencias, (self._filas, componente, hasta), np.where(valido, -monto, 0))
+            return
+        ocurrencias = int(((fin - inicio) // paso + 1).max(initial=0))
+        periodos = inicio[:, None] + paso * np.arange(ocurrencias)[None, :]
+        valido = (periodos >= 1) & (periodos <= fin[:, None])
+        filas, k = np.nonzero(valido)
+        np.add.at(self._dispersos, (filas, componente, periodos[filas, k] - 1), monto[filas])
+
+    def serie(self, componente, inicio, montos, paso=1):
+        """Suma la fila k de `montos` (escenario x k) en el periodo inicio + paso * k.
+
+        Con `exacto` cada fila se redondea sobre su suma acumulada, así que su
+        total en centavos no depende de cuántos periodos tenga.
+        """
+        inicio = self._vector(inicio, np.int64)
+        montos = np.asarray(montos, dtype=float)
+        if self.exacto:
+            montos = centavos.redondear_serie(montos)
+        montos = np.broadcast_to(montos, (self.n_escenarios, np.shape(montos)[-1]))
+        periodos = inicio[:, None] + paso * np.arange(montos.shape[1])[None, :]
+        valido = (periodos >= 1) & (periodos <= self.horizonte)
+        filas, k = np.nonzero(valido)
+        np.add.at(self._dispersos, (filas, componente, periodos[filas, k] - 1), montos[filas, k])
+
+    def repartir(self, componente, inicio, fin, total):
+        """Reparte `total` en partes iguales entre los periodos inicio..fin.
+
+        Con `exacto` las partes son centavos enteros que suman exactamente el total.
+        """
+        inicio = self._vector(inicio, np.int64)
+        fin = self._vector(fin, np.int64)
+        if self.exacto:
+            self._dispersos[:, componente, :self.horizonte] += centavos.repartir(self._montos(total), inicio, fin, self.horizonte)
+            return
+        duracion = fin - inicio + 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            por_periodo = np.where(duracion > 0, self._vector(total) / duracion, 0.0)
+        self.repetir(componente, inicio, fin, por_periodo)
+
+    def puntual(self, componente, periodo, monto):
+        """Suma `monto` en un solo periodo."""
+        self.repetir(componente, periodo, periodo, monto)
+
+    def construir(self):
+        """Matriz (escenario x componente x periodo) con el flujo de cada partida."""
+        flujo = np.cumsum(self._diferencias, axis=2)
+        flujo += self._dispersos
+        return flujo[:, :, :self.horizonte]
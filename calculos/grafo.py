@@ -0,0 +1,157 @@
+"""Grafo de dependencias entre las entradas del simulador y sus valores derivados.
+
+Cada valor derivado declara de qué entradas u otros derivados depende. En
+cada ejecución de una página se compara la huella de cada entrada con la de
+la ejecución anterior y solo se recalculan los nodos alcanzados por un
+cambio: mover la tasa de interés recalcula el préstamo y el flujo, no los
+totales de costos. Si un nodo recalculado da el mismo valor que antes, el
+cambio no se propaga más allá.
+"""
+import json
+import sys
+from dataclasses import dataclass, fields
+
+from calculos import centavos, costos
+from calculos.amortizacion import resumen_amortizacion
+from calculos.memoria import TablaCompacta, huella_dataframe, registrar_recalculable
+from calculos.modelo import DatosProyecto, evaluar_proyecto
+
+
+@dataclass(frozen=True)
+class Nodo:
+    nombre: str
+    funcion: object
+    dependencias: tuple
+
+
+@dataclass(frozen=True)
+class Recalculo:
+    valores: dict          # valor actual de cada nodo derivado
+    recalculados: tuple    # nodos recalculados en esta ejecución, en orden
+    total_nodos: int
+
+
+def _huella(valor):
+    # Si hay un DataFrame, pandas ya está importado; el grafo por sí solo no lo importa
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(valor, pd.DataFrame):
+        return huella_dataframe(valor)
+    if isinstance(valor, TablaCompacta):  # la misma huella que el DataFrame del que salió
+        return valor.huella
+    if isinstance(valor, dict):
+        return json.dumps(valor, sort_keys=True, default=str)
+    return valor
+
+
+def _iguales(a, b):
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):  # p. ej. dataclasses con arreglos de NumPy
+        return False
+
+
+class GrafoDependencias:
+    """Entradas con su valor por defecto y nodos derivados en orden topológico."""
+
+    def __init__(self, entradas, clave_memoria="_grafo_derivados"):
+        self.entradas = dict(entradas)  # nombre -> función que devuelve el valor por defecto
+        self.nodos = {}
+        self.publicados = []
+        self.clave_memoria = clave_memoria
+        # Todo lo que guarda se recalcula desde las entradas: es lo primero que se libera si falta memoria
+        registrar_recalculable(clave_memoria)
+
+    def derivado(self, nombre, dependencias, publicar=False):
+        """Decorador que registra `nombre = funcion(*dependencias)`.
+
+        Las dependencias deben estar ya registradas, así el orden de registro
+        es un orden topológico y el grafo no puede tener ciclos. Con
+        `publicar`, el valor también se escribe en el estado con su nombre.
+        """
+        desconocidas = [d for d in dependencias if d not in self.entradas and d not in self.nodos]
+        if desconocidas:
+            raise ValueError(f"Dependencias desconocidas para {nombre}: {desconocidas}")
+
+        def registrar(funcion):
+            self.nodos[nombre] = Nodo(nombre, funcion, tuple(dependencias))
+            if publicar:
+                self.publicados.append(nombre)
+            return funcion
+        return registrar
+
+    def actualizar(self, estado):
+        """Recalcula los nodos afectados por los cambios de `estado` (p. ej. `st.session_state`).
+
+        Las entradas ausentes toman su valor por defecto sin escribirse en el
+        estado. La memoria del grafo se guarda en el propio estado, una por
+        sesión, y solo cuando todos los nodos se calcularon: si uno falla, la
+        siguiente ejecución vuelve a ver el cambio y lo reintenta.
+        """
+        memoria = estado.get(self.clave_memoria) or {"huellas": {}, "valores": {}}
+        huellas = dict(memoria["huellas"])
+        entradas = {}
+        cambiados = set()
+        for nombre, defecto in self.entradas.items():
+            entradas[nombre] = estado[nombre] if nombre in estado else defecto()
+            huella = _huella(entradas[nombre])
+            if nombre not in huellas or not _iguales(huellas[nombre], huella):
+                huellas[nombre] = huella
+                cambiados.add(nombre)
+
+        valores = dict(memoria["valores"])
+        recalculados = []
+        for nodo in self.nodos.values():
+            if nodo.nombre in valores and cambiados.isdisjoint(nodo.dependencias):
+                continue
+            argumentos = [valores[d] if d in self.nodos else entradas[d] for d in nodo.dependencias]
+            valor = nodo.funcion(*argumentos)
+            recalculados.append(nodo.nombre)
+            if nodo.nombre not in valores or not _iguales(valores[nodo.nombre], valor):
+                cambiados.add(nodo.nombre)
+            valores[nodo.nombre] = valor
+
+        for nombre in self.publicados:
+            estado[nombre] = valores[nombre]
+        estado[self.clave_memoria] = {"huellas": huellas, "valores": valores}
+        return Recalculo(dict(valores), tuple(recalculados), len(self.nodos))
+
+
+# --- Grafo del proyecto ---
+_TOTALES = ("total_urbanizacion", "total_construccion_unitaria", "total_gastos_admin_permisos")
+_DEFECTO = DatosProyecto()
+_CAMPOS = tuple(campo.name for campo in fields(DatosProyecto))
+
+
+GRAFO_PROYECTO = GrafoDependencias({
+    # Sin visitar las páginas 02 y 03 los totales salen de las columnas por defecto, sin construir DataFrames
+    **{clave: (lambda clave=clave: costos.COLUMNAS_POR_DEFECTO[clave]) for clave in costos.COLUMNAS_POR_DEFECTO},
+    "duracion_gastos_admin_meses": lambda: costos.DURACION_GASTOS_ADMIN_MESES,
+    **{nombre: (lambda nombre=nombre: getattr(_DEFECTO, nombre)) for nombre in _CAMPOS if nombre not in _TOTALES},
+})
+
+GRAFO_PROYECTO.derivado("total_urbanizacion", ["costos_urbanizacion_df", "centavos_exactos"], publicar=True)(costos.total_urbanizacion)
+GRAFO_PROYECTO.derivado("total_construccion_unitaria", ["costos_construccion_df", "centavos_exactos"], publicar=True)(costos.total_construccion_unitaria)
+GRAFO_PROYECTO.derivado("total_admin_periodo", ["gastos_admin_df", "duracion_gastos_admin_meses", "centavos_exactos"])(costos.total_admin_periodo)
+GRAFO_PROYECTO.derivado("total_activos", ["activos_df", "centavos_exactos"])(costos.total_activos)
+GRAFO_PROYECTO.derivado("total_permisos", ["permisos_df", "centavos_exactos"])(costos.total_permisos)
+
+
+@GRAFO_PROYECTO.derivado("total_gastos_admin_permisos",
+                         ["total_admin_periodo", "total_activos", "total_permisos", "centavos_exactos"], publicar=True)
+def _total_gastos_admin_permisos(admin, activos, permisos, exacto):
+    if exacto:
+        return float(centavos.a_moneda(centavos.a_centavos([admin, activos, permisos]).sum()))
+    return admin + activos + permisos
+
+
+@GRAFO_PROYECTO.derivado("cuota_prestamo", ["monto_prestamo", "tasa_interes_anual", "plazo_prestamo_anios"])
+def _cuota_prestamo(monto, tasa, anios):
+    return float(resumen_amortizacion(monto, tasa, anios)["cuota_mensual"])
+
+
+@GRAFO_PROYECTO.derivado("datos", _CAMPOS)
+def _datos(*valores):
+    return DatosProyecto.desde_estado(dict(zip(_CAMPOS, valores)))
+
+
+GRAFO_PROYECTO.derivado("resultados", ["datos"])(evaluar_proyecto)
@@ -0,0 +1,256 @@
+"""Memoria por sesión: tablas compartidas, tablas compactas y presupuesto de bytes.
+
+Las tablas por defecto de las páginas 02 y 03 se construyen una sola vez por
+proceso y todas las sesiones guardan una referencia a la misma tabla, de solo
+lectura (sus arreglos no admiten escritura). Una sesión solo tiene su propia
+copia cuando edita una tabla, y la guarda como `TablaCompacta`: un arreglo de
+NumPy por columna, sin el índice ni los bloques de un DataFrame.
+
+Cada página termina con `controlar_memoria`, que mide el estado de la
+sesión. Si pasa del límite (`SIMULADOR_MEMORIA_SESION_MB`, 64 MiB por
+defecto) se descartan primero los resultados calculados que se pueden
+rehacer, registrados con `registrar_recalculable`, de mayor a menor; las
+entradas del usuario nunca se descartan. La última medición de cada sesión
+queda en un registro del proceso para el panel de administración.
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from calculos.costos import COLUMNAS_POR_DEFECTO
+
+LIMITE_SESION_POR_DEFECTO = int(float(os.environ.get("SIMULADOR_MEMORIA_SESION_MB", 64)) * 2**20)
+CLAVE_SESION = "_id_sesion_memoria"
+CADUCIDAD_SEGUNDOS = 30 * 60  # una sesión sin ejecuciones en este tiempo sale del registro
+MUESTRA_OBJETOS = 1_000       # elementos medidos de un arreglo de objetos grande para estimar su tamaño
+
+_candado = threading.Lock()
+_limite = LIMITE_SESION_POR_DEFECTO
+_recalculables = []
+_compartidas = {}       # clave -> tabla por defecto de solo lectura
+_huellas_compartidas = {}
+_ids_compartidos = set()
+_sesiones = {}          # id de sesión -> última MedicionMemoria
+
+
+# --- Tablas ---
+
+
+def huella_dataframe(df):
+    """Columnas y hash del contenido de un DataFrame (sin el índice)."""
+    import pandas as pd
+    contenido = pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+    return (tuple(map(str, df.columns)), hashlib.sha1(contenido).hexdigest())
+
+
+@dataclass(frozen=True)
+class TablaCompacta:
+    """Tabla editada por una sesión: un arreglo por columna y los tipos originales para rehacer el DataFrame."""
+    columnas: tuple
+    tipos: tuple
+    arreglos: tuple = field(repr=False)
+    huella: tuple = field(repr=False)
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        arreglos = []
+        for columna in df.columns:
+            serie = df[columna]
+            if serie.dtype.kind in "biuf":
+                arreglo = serie.to_numpy()
+            else:
+                arreglo = serie.to_numpy(dtype=object)
+                if all(isinstance(v, str) for v in arreglo):
+                    arreglo = arreglo.astype(str)  # texto de ancho fijo, sin un objeto por celda
+            arreglo = np.array(arreglo, copy=True)
+            arreglo.flags.writeable = False
+            arreglos.append(arreglo)
+        return cls(tuple(map(str, df.columns)), tuple(str(t) for t in df.dtypes), tuple(arreglos), huella_dataframe(df))
+
+    def __getitem__(self, columna):
+        return self.arreglos[self.columnas.index(columna)]
+
+    def __len__(self):
+        return len(self.arreglos[0]) if self.arreglos else 0
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arreglos)
+
+    def a_dataframe(self):
+        import pandas as pd
+        df = pd.DataFrame({columna: arreglo.astype(object) if arreglo.dtype.kind == "U" else arreglo
+                           for columna, arreglo in zip(self.columnas, self.arreglos)})
+        return df.astype(dict(zip(self.columnas, self.tipos)), errors="ignore")
+
+
+def tabla_por_defecto(clave):
+    """Tabla inicial de `clave` (ver `COLUMNAS_POR_DEFECTO`), la misma para todas las sesiones y de solo lectura."""
+    with _candado:
+        if clave not in _compartidas:
+            import pandas as pd
+            columnas = {}
+            for nombre, valores in COLUMNAS_POR_DEFECTO[clave].items():
+                arreglo = np.array(valores, dtype=object if isinstance(valores[0], str) else None)
+                arreglo.flags.writeable = False
+                columnas[nombre] = arreglo
+            tabla = _compartidas[clave] = pd.DataFrame(columnas, copy=False)
+            _huellas_compartidas[clave] = huella_dataframe(tabla)
+            _ids_compartidos.add(id(tabla))
+        return _compartidas[clave]
+
+
+def guardar_tabla(estado, clave, df):
+    """Guarda en `estado` la tabla editada: la compartida si no cambió, o una `TablaCompacta` propia."""
+    huella = huella_dataframe(df)
+    compartida = tabla_por_defecto(clave) if clave in COLUMNAS_POR_DEFECTO else None
+    if compartida is not None and huella == _huellas_compartidas[clave]:
+        estado[clave] = compartida
+    elif not (isinstance(estado.get(clave), TablaCompacta) and estado[clave].huella == huella):
+        estado[clave] = TablaCompacta.desde_dataframe(df)
+    return estado[clave]
+
+
+def como_dataframe(tabla):
+    """DataFrame de una tabla guardada en el estado (ya sea DataFrame o `TablaCompacta`)."""
+    return tabla.a_dataframe() if isinstance(tabla, TablaCompacta) else tabla
+
+
+# --- Medición ---
+
+
+def _bytes_objetos(arreglo):
+    # Tamaño de los objetos de un arreglo; en los grandes se extrapola desde una muestra
+    planos = arreglo.ravel()
+    if planos.size <= MUESTRA_OBJETOS:
+        return sum(sys.getsizeof(v) for v in planos)
+    muestra = planos[np.linspace(0, planos.size - 1, MUESTRA_OBJETOS).astype(np.int64)]
+    return int(sum(sys.getsizeof(v) for v in muestra) * planos.size / MUESTRA_OBJETOS)
+
+
+def _bytes_columnas(*columnas):
+    # `memory_usage(deep=True)` de pandas falla con los arreglos de objetos de solo lectura
+    total = 0
+    for columna in columnas:
+        arreglo = columna.to_numpy()
+        total += arreglo.nbytes + (_bytes_objetos(arreglo) if arreglo.dtype == object else 0)
+    return total
+
+
+def _bytes_dataframe(df):
+    return int(df.index.memory_usage()) + _bytes_columnas(*(serie for _, serie in df.items()))
+
+
+def tamano(valor, vistos=None):
+    """Bytes aproximados de `valor` y de lo que contiene; lo compartido entre sesiones no cuenta.
+
+    `vistos` evita contar dos veces un objeto referido desde varios lugares.
+    """
+    vistos = set() if vistos is None else vistos
+    if id(valor) in vistos or id(valor) in _ids_compartidos:
+        return 0
+    vistos.add(id(valor))
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes + (_bytes_objetos(valor) if valor.dtype == object else 0)
+    if isinstance(valor, TablaCompacta):
+        return valor.nbytes + sum(_bytes_objetos(a) for a in valor.arreglos if a.dtype == object)
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(valor, pd.DataFrame):
+        return _bytes_dataframe(valor)
+    if pd is not None and isinstance(valor, (pd.Series, pd.Index)):
+        return _bytes_columnas(valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamano(k, vistos) + tamano(v, vistos) for k, v in valor.items())
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sys.getsizeof(valor) + sum(tamano(v, vistos) for v in valor)
+    if hasattr(valor, "__dict__") and not isinstance(valor, type):
+        return sys.getsizeof(valor) + tamano(vars(valor), vistos)
+    return sys.getsizeof(valor)
+
+
+def medir(estado):
+    """Bytes de cada clave del estado de una sesión."""
+    vistos = set()
+    return {clave: tamano(valor, vistos) for clave, valor in list(estado.items())}
+
+
+def bytes_compartidos():
+    """Bytes de las tablas compartidas por todas las sesiones."""
+    with _candado:
+        tablas = list(_compartidas.values())
+    return sum(_bytes_dataframe(t) for t in tablas)
+
+
+# --- Presupuesto por sesión ---
+
+
+def registrar_recalculable(clave):
+    """Declara que la clave del estado guarda resultados que se pueden volver a calcular."""
+    with _candado:
+        if clave not in _recalculables:
+            _recalculables.append(clave)
+
+
+def limite_sesion():
+    return _limite
+
+
+def configurar_limite(limite_bytes):
+    """Cambia el límite de memoria por sesión de todo el proceso."""
+    global _limite
+    if limite_bytes <= 0:
+        raise ValueError("El límite de memoria debe ser positivo.")
+    _limite = int(limite_bytes)
+
+
+@dataclass(frozen=True)
+class MedicionMemoria:
+    sesion: str
+    pagina: str
+    bytes: int                  # después de liberar
+    limite: int
+    por_clave: dict = field(repr=False)  # clave -> bytes, de mayor a menor
+    liberados: tuple = ()       # claves descartadas en este control
+    momento: float = 0.0
+
+    @property
+    def excedido(self):
+        return self.bytes > self.limite
+
+
+def controlar_memoria(estado, pagina, limite=None):
+    """Mide la sesión, descarta resultados recalculables si pasa del límite y registra la medición."""
+    limite = _limite if limite is None else limite
+    sesion = estado.setdefault(CLAVE_SESION, uuid.uuid4().hex)
+    por_clave = medir(estado)
+    total = sum(por_clave.values())
+    liberados = []
+    with _candado:
+        recalculables = [c for c in _recalculables if c in estado]
+    for clave in sorted(recalculables, key=por_clave.get, reverse=True):
+        if total <= limite:
+            break
+        total -= por_clave.pop(clave)
+        del estado[clave]
+        liberados.append(clave)
+
+    medicion = MedicionMemoria(sesion, pagina, total, limite, dict(sorted(por_clave.items(), key=lambda c: -c[1])),
+                               tuple(liberados), time.time())
+    with _candado:
+        _sesiones[sesion] = medicion
+    return medicion
+
+
+def sesiones():
+    """Última medición de cada sesión activa, de mayor a menor uso."""
+    ahora = time.time()
+    with _candado:
+        for sesion in [s for s, m in _sesiones.items() if ahora - m.momento > CADUCIDAD_SEGUNDOS]:
+            del _sesiones[sesion]
+        return sorted(_sesiones.values(), key=lambda m: -m.bytes)
@@ -0,0 +1,120 @@
+"""Indicadores de flujo descontado: VAN, TIR y periodo de recuperación.
+
+Las funciones trabajan sobre un flujo (vector por periodo) o un lote de
+flujos (matriz escenario x periodo) a la vez. Como en `numpy_financial`, el
+primer periodo no se descuenta (t = 0).
+"""
+import numpy as np
+
+# Malla de tasas por periodo donde se buscan cambios de signo del VAN; más
+# densa cerca de cero, que es donde suelen estar las TIR de estos proyectos.
+_MALLA_TIR = np.concatenate([-np.geomspace(0.99, 1e-5, 40), [0.0], np.geomspace(1e-5, 2.0, 60)])
+
+
+def tasa_periodica(tasa_anual_pct, periodos_por_anio=12):
+    """Tasa por periodo equivalente a una tasa anual efectiva en porcentaje."""
+    return np.power(1 + np.asarray(tasa_anual_pct, dtype=float) / 100, 1 / periodos_por_anio) - 1
+
+
+def anualizar(tasa, periodos_por_anio=12):
+    """Tasa anual efectiva, en porcentaje, equivalente a una tasa por periodo."""
+    return (np.power(1 + np.asarray(tasa, dtype=float), periodos_por_anio) - 1) * 100
+
+
+def factores_descuento(tasas, n_periodos):
+    """Matriz (tasa x periodo) con (1 + r) ** -t, para t = 0 .. n_periodos - 1."""
+    t = np.arange(n_periodos)
+    return np.exp(-t[None, :] * np.log1p(np.atleast_1d(np.asarray(tasas, dtype=float)))[:, None])
+
+
+def van(flujos, tasas):
+    """Valor actual neto de cada flujo a cada tasa por periodo.
+
+    `flujos` tiene forma (..., periodo) y `tasas` cualquier forma; el
+    resultado tiene forma `flujos.shape[:-1] + tasas.shape`. Todas las
+    combinaciones se resuelven con un solo producto de matrices.
+    """
+    flujos = np.asarray(flujos, dtype=float)
+    tasas = np.asarray(tasas, dtype=float)
+    factores = factores_descuento(tasas.ravel(), flujos.shape[-1])
+    return (flujos @ factores.T).reshape(flujos.shape[:-1] + tasas.shape)
+
+
+def van_por_escenario(flujos, tasas):
+    """VAN de cada fila de `flujos` a su propia tasa por periodo."""
+    flujos = np.atleast_2d(np.asarray(flujos, dtype=float))
+    tasas = np.broadcast_to(np.asarray(tasas, dtype=float), flujos.shape[:1])
+    t = np.arange(flujos.shape[1])
+    return (flujos * np.exp(-t[None, :] * np.log1p(tasas)[:, None])).sum(axis=1)
+
+
+def tir(flujos, tolerancia=1e-12, max_iteraciones=60):
+    """Tasa interna de retorno por periodo de uno o muchos flujos.
+
+    Primero se ubica, para todas las filas a la vez, el intervalo de la malla
+    donde el VAN cambia de signo más cerca de cero; luego se refina con
+    Newton protegido por bisección, solo sobre las filas que aún no
+    convergen. Las filas sin cambio de signo (sin TIR) devuelven NaN.
+    """
+    flujos = np.asarray(flujos, dtype=float)
+    forma = flujos.shape[:-1]
+    flujos = flujos.reshape(-1, flujos.shape[-1])
+    n, n_periodos = flujos.shape
+    t = np.arange(n_periodos)
+
+    # En horizontes largos las tasas cercanas a -100% desbordan; esos puntos quedan como inf/NaN
+    with np.errstate(over="ignore", invalid="ignore"):
+        valores = flujos @ factores_descuento(_MALLA_TIR, n_periodos).T
+    signos = np.sign(valores)
+    cambio = (signos[:, :-1] * signos[:, 1:] <= 0) & ((signos[:, :-1] != 0) | (signos[:, 1:] != 0))
+    distancia = np.where(cambio, np.abs(_MALLA_TIR[:-1] + _MALLA_TIR[1:]), np.inf)
+    j = distancia.argmin(axis=1)
+    tiene_raiz = np.isfinite(distancia[np.arange(n), j])
+
+    resultado = np.full(n, np.nan)
+    filas = np.flatnonzero(tiene_raiz)
+    bajo, alto = _MALLA_TIR[j[filas]], _MALLA_TIR[j[filas] + 1]
+    v_bajo, v_alto = valores[filas, j[filas]], valores[filas, j[filas] + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tasa = np.where(v_alto != v_bajo, bajo - v_bajo * (alto - bajo) / (v_alto - v_bajo), bajo)
+
+    for _ in range(max_iteraciones):
+        if filas.size == 0:
+            break
+        descuento = np.exp(-t[None, :] * np.log1p(tasa)[:, None])
+        f = (flujos[filas] * descuento).sum(axis=1)
+        df = -(flujos[filas] * t[None, :] * descuento).sum(axis=1) / (1 + tasa)
+
+        mismo_signo = np.sign(f) == np.sign(v_bajo)
+        bajo, v_bajo = np.where(mismo_signo, tasa, bajo), np.where(mismo_signo, f, v_bajo)
+        alto = np.where(mismo_signo, alto, tasa)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = tasa - f / df
+        dentro = (newton > np.minimum(bajo, alto)) & (newton < np.maximum(bajo, alto))
+        nueva = np.where(dentro, newton, (bajo + alto) / 2)
+
+        convergio = (np.abs(nueva - tasa) <= tolerancia * (1 + np.abs(tasa))) | (f == 0)
+        resultado[filas[convergio]] = np.where(f[convergio] == 0, tasa[convergio], nueva[convergio])
+        pendientes = ~convergio
+        filas, tasa = filas[pendientes], nueva[pendientes]
+        bajo, alto, v_bajo = bajo[pendientes], alto[pendientes], v_bajo[pendientes]
+    resultado[filas] = tasa
+
+    return resultado.reshape(forma) if forma else float(resultado[0])
+
+
+def periodo_recuperacion(flujos):
+    """Primer periodo (desde 1) a partir del cual el flujo acumulado ya no vuelve a ser negativo.
+
+    Devuelve NaN si el acumulado termina en negativo y 0 si nunca fue negativo.
+    """
+    flujos = np.asarray(flujos, dtype=float)
+    forma = flujos.shape[:-1]
+    acumulado = np.cumsum(flujos.reshape(-1, flujos.shape[-1]), axis=1)
+    negativo = acumulado < 0
+    n_periodos = acumulado.shape[1]
+    ultimo_negativo = n_periodos - 1 - np.argmax(negativo[:, ::-1], axis=1)
+    periodo = np.where(negativo.any(axis=1), ultimo_negativo + 2.0, 0.0)
+    periodo = np.where(periodo > n_periodos, np.nan, periodo)
+    return periodo.reshape(forma) if forma else float(periodo[0])
@@ -0,0 +1,553 @@
+"""Modelo financiero del proyecto inmobiliario.
+
+`evaluar_proyecto` recibe un `DatosProyecto` inmutable y devuelve un
+`ResultadosProyecto` con los KPIs y el flujo de caja mensual. Los resultados
+se memorizan por el hash de los datos, así que una página que se vuelve a
+ejecutar sin cambios en las entradas no recalcula nada y todas las páginas
+muestran exactamente las mismas cifras.
+
+`evaluar_lote` calcula los mismos KPIs para muchos escenarios a la vez, con
+arreglos de NumPy, para los análisis de riesgo y de cartera, y `flujo_lote`
+arma el flujo de caja completo de un lote de cronogramas.
+
+El préstamo puede tener meses de gracia (con o sin capitalización de
+intereses) y prepagos con un porcentaje de lo cobrado por ventas;
+`cronograma_prestamo` devuelve su cronograma completo, también con
+trayectorias de tasa variables. Las ventas pueden seguir una curva de
+absorción con plan de pagos y entregas por fases (ver `calculos.ventas`);
+`calendario_ventas` devuelve las unidades vendidas y los cobros por mes.
+
+Con `centavos_exactos` los totales, el flujo y los KPIs monetarios se
+calculan en centavos enteros (ver `calculos.centavos`): cada importe queda
+con dos decimales exactos y el flujo mensual suma exactamente los totales.
+"""
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+import numpy as np
+
+from calculos import centavos
+from calculos.amortizacion import cronograma_lote, cuota_mensual
+from calculos.flujo import PERIODOS_POR_MES, ConstructorFlujo
+from calculos.metricas import anualizar, periodo_recuperacion, tasa_periodica, tir, van_por_escenario
+from calculos.ventas import cobros, entregas, ingresos_ventas, tramos_construccion, unidades_acumuladas, ventas_simples
+
+COLUMNAS_FLUJO = (
+    "Ingresos por Ventas",
+    "Ingreso Préstamo",
+    "Costo Terreno",
+    "Costo Urbanización",
+    "Costo Construcción",
+    "Gastos Admin/Permisos",
+    "Otros Gastos",
+    "Pago Préstamo",
+)
+
+
+@dataclass(frozen=True)
+class DatosProyecto:
+    # Parámetros generales (página de Resumen)
+    cantidad_viviendas: int = 10
+    costo_terreno: float = 100000.0
+    otros_gastos: float = 15000.0
+    precio_venta_unitario: float = 85000.0
+    monto_prestamo: float = 200000.0
+    tasa_interes_anual: float = 5.0
+    plazo_prestamo_anios: int = 15
+    # Totales de las páginas de Costos y Gastos
+    total_urbanizacion: float = 84650.0
+    total_construccion_unitaria: float = 25850.0
+    total_gastos_admin_permisos: float = 90100.0
+    impuesto_renta_pct: float = 25.0
+    tasa_descuento_anual: float = 12.0
+    # Cronograma (página de Flujo de Caja), en meses
+    duracion_total_meses: int = 36
+    mes_compra_terreno: int = 1
+    mes_inicio_urbanizacion: int = 2
+    mes_fin_urbanizacion: int = 6
+    mes_inicio_construccion: int = 7
+    mes_fin_construccion: int = 24
+    mes_gastos_admin: int = 3
+    mes_recibo_prestamo: int = 2
+    mes_inicio_ventas: int = 18
+    mes_fin_ventas: int = 36
+    mes_inicio_pago_prestamo: int = 3
+    # Condiciones del préstamo (página de Flujo de Caja)
+    meses_gracia_prestamo: int = 0
+    capitalizar_intereses_gracia: bool = False
+    prepago_ventas_pct: float = 0.0   # % de lo cobrado por ventas cada mes que se abona al capital
+    # Ventas por unidad y entregas (página de Flujo de Caja)
+    curva_absorcion: float = 0.0      # pendiente de la curva S de ventas; 0 las reparte por igual
+    enganche_pct: float = 100.0       # % del precio que se cobra al vender
+    mensualidades_pct: float = 0.0    # % en mensualidades hasta la entrega; el resto, contra entrega
+    fases_entrega: int = 1
+    meses_entre_fases: int = 6
+    # Aritmética exacta en centavos (barra lateral del Resumen)
+    centavos_exactos: bool = False
+
+    @classmethod
+    def desde_estado(cls, estado):
+        """Construye los datos desde `st.session_state` o cualquier mapeo.
+
+        Las claves ausentes toman el valor por defecto del campo.
+        """
+        valores = {}
+        for campo in fields(cls):
+            if campo.name in estado:
+                valores[campo.name] = campo.type(estado[campo.name])
+        return cls(**valores)
+
+
+@dataclass(frozen=True)
+class ResultadosProyecto:
+    ingresos_totales: float
+    costo_total_construccion: float
+    costo_total_inversion: float
+    capital_propio: float
+    utilidad_bruta: float
+    impuesto: float
+    utilidad_neta: float
+    roi: float
+    roc: float
+    cuota_mensual: float      # primera cuota tras la gracia, antes de prepagos
+    maxima_necesidad_capital: float
+    tir_anual: float          # NaN si el flujo no tiene TIR
+    van: float                # a la tasa de descuento de los datos
+    mes_recuperacion: float   # NaN si el acumulado termina en negativo
+    meses: np.ndarray
+    flujo: np.ndarray  # (componente x mes), en el orden de COLUMNAS_FLUJO
+
+    @property
+    def flujo_neto(self):
+        return self.flujo.sum(axis=0)
+
+    @property
+    def flujo_acumulado(self):
+        return self.flujo_neto.cumsum()
+
+    def flujo_df(self):
+        """Flujo de caja como DataFrame, con las columnas de la página 05."""
+        return tabla_flujo(self.meses, self.flujo)
+
+
+def _solo_lectura(arreglo):
+    arreglo.flags.writeable = False
+    return arreglo
+
+
+def _campos_lote(datos, variaciones):
+    campos = [campo.name for campo in fields(DatosProyecto)]
+    desconocidos = set(variaciones) - set(campos)
+    if desconocidos:
+        raise TypeError(f"Campos desconocidos en DatosProyecto: {sorted(desconocidos)}")
+    # Solo los campos variados se expanden a un valor por escenario; los demás
+    # quedan como vectores de longitud 1 y se combinan por broadcasting.
+    variados = dict(zip(variaciones, np.broadcast_arrays(*map(np.asarray, variaciones.values()))))
+    v = {nombre: np.ravel(variados[nombre]) if nombre in variados else np.atleast_1d(getattr(datos, nombre))
+         for nombre in campos}
+    return v, max(arreglo.size for arreglo in v.values())
+
+
+def _exacto(v):
+    return bool(np.any(v['centavos_exactos']))
+
+
+# --- Préstamo ---
+def _prestamo_simple(v):
+    # Sin gracia ni prepagos el pago es una cuota fija y basta la fórmula cerrada
+    return not (np.any(v['meses_gracia_prestamo'] > 0) or np.any(v['prepago_ventas_pct'] > 0))
+
+
+def _cuota_inicial(v, exacto=False):
+    # Cuota del primer mes de amortización: la gracia capitalizada aumenta el saldo
+    factor_gracia = np.where(v['capitalizar_intereses_gracia'],
+                             (1 + v['tasa_interes_anual'] / 1200) ** v['meses_gracia_prestamo'], 1.0)
+    cuota = cuota_mensual(v['monto_prestamo'] * factor_gracia, v['tasa_interes_anual'], v['plazo_prestamo_anios'])
+    return centavos.a_moneda(centavos.a_centavos(cuota)) if exacto else cuota
+
+
+def _cronograma(v, tasas_anuales=None, meses=None):
+    # El mes k del préstamo es el mes inicio_pago + k - 1 del proyecto; los
+    # prepagos son un porcentaje de lo cobrado por ventas en ese mes
+    tasas = v['tasa_interes_anual'][:, None] if tasas_anuales is None else tasas_anuales
+    total_meses = int((v['meses_gracia_prestamo'] + v['plazo_prestamo_anios'] * 12).max())
+    meses = total_meses if meses is None else min(meses, total_meses)
+    if not np.any(v['prepago_ventas_pct'] > 0):
+        # Sin prepagos el cronograma no depende de las ventas: una fila por préstamo distinto
+        return cronograma_lote(v['monto_prestamo'], tasas, v['plazo_prestamo_anios'], v['meses_gracia_prestamo'],
+                               v['capitalizar_intereses_gracia'], 0.0, meses)
+    mes_proyecto = v['mes_inicio_pago_prestamo'][:, None] + np.arange(meses)[None, :]
+    dentro = mes_proyecto <= v['duracion_total_meses'][:, None]
+    if ventas_simples(v):
+        duracion_ventas = v['mes_fin_ventas'] - v['mes_inicio_ventas'] + 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            venta_mensual = np.where(duracion_ventas > 0, v['precio_venta_unitario'] * v['cantidad_viviendas'] / duracion_ventas, 0.0)
+        en_ventas = (mes_proyecto >= v['mes_inicio_ventas'][:, None]) & (mes_proyecto <= v['mes_fin_ventas'][:, None]) & dentro
+        cobrado = np.where(en_ventas, venta_mensual[:, None], 0.0)
+    elif meses:
+        por_mes = ingresos_ventas(v, int(mes_proyecto.max()))
+        forma = np.broadcast_shapes(por_mes.shape[:1] + mes_proyecto.shape[1:], mes_proyecto.shape)
+        cobrado = np.where(dentro, np.take_along_axis(np.broadcast_to(por_mes, (forma[0], por_mes.shape[1])),
+                                                      np.broadcast_to(mes_proyecto - 1, forma), axis=1), 0.0)
+    else:
+        cobrado = np.zeros((1, 0))
+    prepagos = cobrado * (v['prepago_ventas_pct'] / 100)[:, None]
+    return cronograma_lote(v['monto_prestamo'], tasas, v['plazo_prestamo_anios'], v['meses_gracia_prestamo'],
+                           v['capitalizar_intereses_gracia'], prepagos, meses)
+
+
+def _pagos_por_mes(v, cronograma, horizonte):
+    # Cuota más prepago de cada mes del proyecto (escenario x mes)
+    pagos = cronograma['cuota'] + cronograma['prepago']
+    indice = np.arange(horizonte)[None, :] - (v['mes_inicio_pago_prestamo'][:, None] - 1)
+    valido = (indice >= 0) & (indice < pagos.shape[1])
+    n_filas = max(pagos.shape[0], indice.shape[0])
+    pagos = np.take_along_axis(np.broadcast_to(pagos, (n_filas, pagos.shape[1])),
+                               np.broadcast_to(np.clip(indice, 0, max(pagos.shape[1] - 1, 0)), (n_filas, horizonte)), axis=1)
+    return np.where(valido, pagos, 0.0)
+
+
+def cronograma_prestamo(datos, tasas_anuales=None, meses=None, **variaciones):
+    """Cronograma del préstamo del proyecto, como `cronograma_lote`.
+
+    `tasas_anuales` reemplaza la tasa fija de `datos` por una trayectoria
+    (préstamo x mes), p. ej. las de `calculos.tasas`; las variaciones con
+    nombre funcionan como en `evaluar_lote`. Además del cronograma devuelve
+    `pagos_proyecto`: cuota más prepago por mes del proyecto (escenario x mes).
+    Con `centavos_exactos` los importes se cuadran al centavo con
+    `calculos.centavos.cronograma_centavos`.
+    """
+    v, _ = _campos_lote(datos, variaciones)
+    cronograma = _cronograma(v, tasas_anuales, meses)
+    if _exacto(v):
+        cronograma = centavos.cronograma_centavos(cronograma, v['monto_prestamo'])
+        cronograma.update({clave: centavos.a_moneda(cronograma[clave]) for clave in centavos.IMPORTES_CRONOGRAMA})
+    cronograma['pagos_proyecto'] = _pagos_por_mes(v, cronograma, int(v['duracion_total_meses'].max()))
+    return cronograma
+
+
+# --- Ventas ---
+def calendario_ventas(datos, **variaciones):
+    """Unidades vendidas y cobros por mes de uno o muchos escenarios.
+
+    Devuelve los meses (desde 1), `unidades` vendidas y `unidades_acumuladas`
+    (escenario x mes), `cobros` por concepto de `calculos.ventas.CONCEPTOS_COBRO`
+    y el mes de entrega de cada fase (`entregas`, escenario x fase). Las
+    variaciones con nombre funcionan como en `evaluar_lote`.
+    """
+    v, _ = _campos_lote(datos, variaciones)
+    horizonte = int(v['duracion_total_meses'].max())
+    dentro = np.arange(1, horizonte + 1)[None, :] <= v['duracion_total_meses'][:, None]
+    acumuladas = unidades_acumuladas(v, horizonte)
+    return {
+        "meses": np.arange(1, horizonte + 1),
+        "unidades": np.diff(acumuladas, axis=1, prepend=0.0),
+        "unidades_acumuladas": acumuladas,
+        "cobros": {concepto: np.where(dentro, valores, 0.0) for concepto, valores in cobros(v, horizonte).items()},
+        "entregas": entregas(v),
+    }
+
+
+def flujo_lote(datos, granularidad="mensual", **variaciones):
+    """Flujo de caja de uno o muchos cronogramas con el motor de eventos.
+
+    Los argumentos con nombre reemplazan campos de `datos` como en
+    `evaluar_lote`. Con granularidad "diaria" cada mes tiene
+    `DIAS_POR_MES` días: los eventos puntuales y las cuotas caen el primer
+    día del mes y los intervalos se reparten por día. Devuelve los periodos
+    (meses o días, desde 1) y la matriz (escenario x componente x periodo)
+    en el orden de `COLUMNAS_FLUJO`. Con `centavos_exactos` la matriz se
+    arma en centavos enteros y se devuelve convertida a moneda.
+    """
+    v, n_escenarios = _campos_lote(datos, variaciones)
+    exacto = _exacto(v)
+    periodos, matriz = _flujo(v, n_escenarios, granularidad, exacto)
+    return periodos, (centavos.a_moneda(matriz) if exacto else matriz)
+
+
+def flujo_centavos(datos, granularidad="mensual", **variaciones):
+    """Como `flujo_lote`, pero siempre en centavos enteros (int64), sin convertir a moneda."""
+    v, n_escenarios = _campos_lote(datos, variaciones)
+    return _flujo(v, n_escenarios, granularidad, True)
+
+
+def _flujo(v, n_escenarios, granularidad, exacto):
+    g = PERIODOS_POR_MES[granularidad]
+    horizonte = int(v['duracion_total_meses'].max()) * g
+    c = {nombre: i for i, nombre in enumerate(COLUMNAS_FLUJO)}
+    flujo = ConstructorFlujo(n_escenarios, len(COLUMNAS_FLUJO), horizonte, exacto=exacto)
+
+    def primer_periodo(mes):
+        return (mes - 1) * g + 1
+
+    # ENTRADAS
+    flujo.puntual(c['Ingreso Préstamo'], primer_periodo(v['mes_recibo_prestamo']), v['monto_prestamo'])
+    if ventas_simples(v):
+        flujo.repartir(c['Ingresos por Ventas'], primer_periodo(v['mes_inicio_ventas']), v['mes_fin_ventas'] * g,
+                       v['precio_venta_unitario'] * v['cantidad_viviendas'])
+    else:
+        # Con curva de absorción o plan de pagos, cada mes cobra lo suyo (el primer día, con detalle diario)
+        flujo.serie(c['Ingresos por Ventas'], 1, ingresos_ventas(v, horizonte // g), paso=g)
+
+    # SALIDAS
+    flujo.puntual(c['Costo Terreno'], primer_periodo(v['mes_compra_terreno']), -v['costo_terreno'])
+    flujo.puntual(c['Gastos Admin/Permisos'], primer_periodo(v['mes_gastos_admin']), -v['total_gastos_admin_permisos'])
+    flujo.puntual(c['Otros Gastos'], primer_periodo(v['mes_gastos_admin']), -v['otros_gastos'])
+    flujo.repartir(c['Costo Urbanización'], primer_periodo(v['mes_inicio_urbanizacion']), v['mes_fin_urbanizacion'] * g,
+                   -v['total_urbanizacion'])
+    for inicio, fin, costo in _costos_fases(v, exacto):
+        flujo.repartir(c['Costo Construcción'], primer_periodo(inicio), fin * g, -costo)
+
+    # PAGO DEL PRÉSTAMO: desde el mes de inicio hasta el final del proyecto o del préstamo
+    if exacto:
+        # El cronograma en centavos deja la última cuota cuadrada con el saldo
+        cronograma = centavos.cronograma_centavos(_cronograma(v, meses=int(v['duracion_total_meses'].max())),
+                                                  v['monto_prestamo'])
+        flujo.serie(c['Pago Préstamo'], primer_periodo(v['mes_inicio_pago_prestamo']),
+                    -centavos.a_moneda(cronograma['cuota'] + cronograma['prepago']), paso=g)
+    elif _prestamo_simple(v):
+        cuota = cuota_mensual(v['monto_prestamo'], v['tasa_interes_anual'], v['plazo_prestamo_anios'])
+        mes_fin_pago = np.minimum(v['duracion_total_meses'], v['mes_inicio_pago_prestamo'] + v['plazo_prestamo_anios'] * 12 - 1)
+        flujo.repetir(c['Pago Préstamo'], primer_periodo(v['mes_inicio_pago_prestamo']), primer_periodo(mes_fin_pago),
+                      np.where(v['monto_prestamo'] > 0, -cuota, 0.0), paso=g)
+    else:
+        cronograma = _cronograma(v, meses=int(v['duracion_total_meses'].max()))
+        flujo.serie(c['Pago Préstamo'], primer_periodo(v['mes_inicio_pago_prestamo']),
+                    -(cronograma['cuota'] + cronograma['prepago']), paso=g)
+
+    # Cada escenario termina en su propio horizonte
+    periodos = np.arange(1, horizonte + 1)
+    matriz = flujo.construir()
+    matriz *= (periodos <= v['duracion_total_meses'][:, None] * g)[:, None, :]
+    return periodos, matriz
+
+
+def _costos_fases(v, exacto):
+    # (inicio, fin, costo) de la construcción de cada fase; en centavos
+    # exactos las fases se reparten el costo total sin perder centavos
+    costo_total = v['total_construccion_unitaria'] * v['cantidad_viviendas']
+    total_centavos = centavos.a_centavos(v['total_construccion_unitaria']) * v['cantidad_viviendas']
+    for k, (inicio, fin, fraccion) in enumerate(tramos_construccion(v)):
+        if exacto:
+            yield inicio, fin, centavos.a_moneda(centavos.partes_iguales(total_centavos, v['fases_entrega'], k))
+        else:
+            yield inicio, fin, costo_total * fraccion
+
+
+def tabla_flujo(periodos, flujo):
+    """DataFrame para mostrar un flujo (componente x periodo), con neto y acumulado."""
+    import pandas as pd  # solo quien muestra la tabla paga la importación de pandas
+    flujo_df = pd.DataFrame(flujo.T, index=periodos, columns=COLUMNAS_FLUJO)
+    flujo_df['Flujo Neto Mensual'] = flujo.sum(axis=0)
+    flujo_df['Flujo Acumulado'] = flujo_df['Flujo Neto Mensual'].cumsum()
+    return flujo_df
+
+
+@lru_cache(maxsize=256)
+def evaluar_proyecto(datos):
+    """KPIs y flujo de caja de un proyecto; memorizado con desalojo LRU."""
+    v, _ = _campos_lote(datos, {})
+    if datos.centavos_exactos:
+        importes = {clave: float(valor[0]) for clave, valor in _importes_centavos(v).items()}
+        costo_total_construccion, costo_total_inversion, ingresos_totales, utilidad_bruta, impuesto = (
+            importes[clave] for clave in ("costo_total_construccion", "costo_total_inversion", "ingresos_totales",
+                                          "utilidad_bruta", "impuesto"))
+        utilidad_neta, capital_propio = importes["utilidad_neta"], importes["capital_propio"]
+    else:
+        costo_total_construccion = datos.total_construccion_unitaria * datos.cantidad_viviendas
+        costo_total_inversion = (datos.costo_terreno + datos.total_urbanizacion + costo_total_construccion
+                                 + datos.total_gastos_admin_permisos + datos.otros_gastos)
+        ingresos_totales = datos.precio_venta_unitario * datos.cantidad_viviendas
+        utilidad_bruta = ingresos_totales - costo_total_inversion
+        impuesto = utilidad_bruta * (datos.impuesto_renta_pct / 100) if utilidad_bruta > 0 else 0.0
+        utilidad_neta = utilidad_bruta - impuesto
+        capital_propio = costo_total_inversion - datos.monto_prestamo
+
+    # ROI y ROC
+    roi = (utilidad_neta / capital_propio) * 100 if capital_propio > 0 else float('inf')
+    roc = (utilidad_bruta / costo_total_inversion) * 100 if costo_total_inversion > 0 else 0.0
+
+    cuota = _cuota_inicial(v, datos.centavos_exactos)
+    meses, flujo = _flujo(v, 1, "mensual", datos.centavos_exactos)
+    flujo = centavos.a_moneda(flujo[0]) if datos.centavos_exactos else flujo[0]
+    # Los KPIs del flujo salen del mismo acumulado que en evaluar_lote, así ambos coinciden
+    kpis_flujo = {nombre: float(valor[0]) for nombre, valor in _kpis_acumulado(v, cuota, datos.centavos_exactos, KPIS_FLUJO).items()}
+
+    return ResultadosProyecto(
+        ingresos_totales=ingresos_totales,
+        costo_total_construccion=costo_total_construccion,
+        costo_total_inversion=costo_total_inversion,
+        capital_propio=capital_propio,
+        utilidad_bruta=utilidad_bruta,
+        impuesto=impuesto,
+        utilidad_neta=utilidad_neta,
+        roi=roi,
+        roc=roc,
+        cuota_mensual=float(cuota[0]),
+        **kpis_flujo,
+        meses=_solo_lectura(meses),
+        flujo=_solo_lectura(flujo),
+    )
+
+
+# --- Evaluación vectorizada de muchos escenarios ---
+KPIS_LOTE = (
+    "ingresos_totales",
+    "costo_total_inversion",
+    "capital_propio",
+    "utilidad_bruta",
+    "utilidad_neta",
+    "roi",
+    "roc",
+    "cuota_mensual",
+    "maxima_necesidad_capital",
+)
+KPIS_FLUJO = ("tir_anual", "van", "mes_recuperacion")
+
+
+def _acumulado_lote(v, cuota, exacto=False):
+    # Flujo acumulado (escenario x mes) en forma cerrada: cada evento puntual
+    # suma su monto a partir de su mes y cada pago repartido crece linealmente
+    # durante su intervalo. Devuelve también la máscara de los meses dentro
+    # del horizonte de cada escenario. En centavos exactos cada término es
+    # el acumulado entero de la partida de `_flujo`, así que coinciden al centavo.
+    horizonte = int(v['duracion_total_meses'].max())
+    n_escenarios = max(arreglo.size for arreglo in v.values())
+    mes = np.arange(1, horizonte + 1)[None, :]
+    monto = centavos.a_centavos if exacto else np.asarray
+
+    def puntual(mes_evento, importe):
+        return np.where(mes >= mes_evento[:, None], importe[:, None], 0)
+
+    def repartido(inicio, fin, total):
+        if exacto:
+            return centavos.repartido_acumulado(monto(total), inicio, fin, horizonte)[:, 1:]
+        duracion = fin - inicio + 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avance = np.clip((mes - inicio[:, None] + 1) / duracion[:, None], 0.0, 1.0)
+        return np.where(duracion[:, None] > 0, avance * total[:, None], 0.0)
+
+    if exacto:
+        cronograma = centavos.cronograma_centavos(_cronograma(v, meses=horizonte), v['monto_prestamo'])
+        pagos = _pagos_por_mes(v, {'cuota': cronograma['cuota'], 'prepago': cronograma['prepago']}, horizonte)
+        pago_prestamo = np.cumsum(pagos.astype(np.int64), axis=1)
+    elif _prestamo_simple(v):
+        n_pagos = v['plazo_prestamo_anios'] * 12
+        pagos_hechos = np.clip(mes - v['mes_inicio_pago_prestamo'][:, None] + 1, 0, n_pagos[:, None])
+        pago_prestamo = np.where(v['monto_prestamo'][:, None] > 0, pagos_hechos * cuota[:, None], 0.0)
+    else:
+        pago_prestamo = np.cumsum(_pagos_por_mes(v, _cronograma(v, meses=horizonte), horizonte), axis=1)
+    terminos = [
+        puntual(v['mes_recibo_prestamo'], monto(v['monto_prestamo'])),
+        (repartido(v['mes_inicio_ventas'], v['mes_fin_ventas'], v['precio_venta_unitario'] * v['cantidad_viviendas'])
+         if ventas_simples(v) else monto(np.cumsum(ingresos_ventas(v, horizonte), axis=1))),
+        -puntual(v['mes_compra_terreno'], monto(v['costo_terreno'])),
+        -puntual(v['mes_gastos_admin'], monto(v['total_gastos_admin_permisos']) + monto(v['otros_gastos'])
+                 if exacto else v['total_gastos_admin_permisos'] + v['otros_gastos']),
+        -repartido(v['mes_inicio_urbanizacion'], v['mes_fin_urbanizacion'], v['total_urbanizacion']),
+        *(-repartido(inicio, fin, costo) for inicio, fin, costo in _costos_fases(v, exacto)),
+        -pago_prestamo,
+    ]
+    # Se suman primero los términos comunes a todos los escenarios (una fila)
+    # para no repetir su costo en cada escenario.
+    acumulado = sum(sorted(terminos, key=len))
+    acumulado = np.broadcast_to(acumulado, (n_escenarios, horizonte))
+    return acumulado, mes <= v['duracion_total_meses'][:, None]
+
+
+def _importes_centavos(v):
+    # Totales del proyecto sumados en centavos enteros; el impuesto se redondea
+    # al centavo. Devuelve los importes ya convertidos a moneda.
+    c = {campo: centavos.a_centavos(v[campo]) for campo in (
+        'costo_terreno', 'total_urbanizacion', 'total_construccion_unitaria', 'total_gastos_admin_permisos',
+        'otros_gastos', 'precio_venta_unitario', 'monto_prestamo')}
+    costo_total_construccion = c['total_construccion_unitaria'] * v['cantidad_viviendas']
+    costo_total_inversion = (c['costo_terreno'] + c['total_urbanizacion'] + costo_total_construccion
+                             + c['total_gastos_admin_permisos'] + c['otros_gastos'])
+    ingresos_totales = c['precio_venta_unitario'] * v['cantidad_viviendas']
+    utilidad_bruta = ingresos_totales - costo_total_inversion
+    impuesto = np.where(utilidad_bruta > 0, centavos.redondear(utilidad_bruta * (v['impuesto_renta_pct'] / 100)), 0)
+    importes = {
+        "costo_total_construccion": costo_total_construccion,
+        "costo_total_inversion": costo_total_inversion,
+        "ingresos_totales": ingresos_totales,
+        "utilidad_bruta": utilidad_bruta,
+        "impuesto": impuesto,
+        "utilidad_neta": utilidad_bruta - impuesto,
+        "capital_propio": costo_total_inversion - c['monto_prestamo'],
+    }
+    return {clave: centavos.a_moneda(valor) for clave, valor in importes.items()}
+
+
+def _kpis_acumulado(v, cuota, exacto, pedidas):
+    # Máxima necesidad de capital y los KPIs de `pedidas` (de KPIS_FLUJO) a partir
+    # del acumulado en forma cerrada; evaluar_proyecto y evaluar_lote pasan por
+    # aquí, así el flujo neto se reconstruye igual en los dos
+    acumulado, dentro = _acumulado_lote(v, cuota, exacto)
+    if exacto:
+        acumulado = centavos.a_moneda(acumulado)
+    minimo = np.where(dentro, acumulado, np.inf).min(axis=1, initial=np.inf)
+    kpis = {"maxima_necesidad_capital": np.where(np.isfinite(minimo), minimo, 0.0)}  # 0 sin meses, como antes
+    if not pedidas:
+        return kpis
+    neto = np.diff(acumulado, axis=1, prepend=0.0) * dentro
+    if "tir_anual" in pedidas:
+        kpis["tir_anual"] = anualizar(tir(neto))
+    if "van" in pedidas:
+        kpis["van"] = van_por_escenario(neto, tasa_periodica(v['tasa_descuento_anual']))
+    if "mes_recuperacion" in pedidas:
+        kpis["mes_recuperacion"] = periodo_recuperacion(neto)
+    return kpis
+
+
+def evaluar_lote(datos, metricas_flujo=False, **variaciones):
+    """KPIs de muchos escenarios a la vez.
+
+    Cada argumento con nombre reemplaza un campo de `datos` por un arreglo;
+    los arreglos se combinan con broadcasting y se aplanan. Devuelve un
+    diccionario con un vector por cada nombre de `KPIS_LOTE`, con las mismas
+    reglas que `evaluar_proyecto`. Con `metricas_flujo` agrega también los
+    de `KPIS_FLUJO` (TIR, VAN y recuperación), que son más costosos; puede
+    ser True o una colección con solo los nombres que se necesitan. Si
+    algún escenario usa `centavos_exactos`, todo el lote se calcula en
+    centavos.
+    """
+    v, n_escenarios = _campos_lote(datos, variaciones)
+    exacto = _exacto(v)
+
+    if exacto:
+        importes = _importes_centavos(v)
+        costo_total_inversion, ingresos_totales, utilidad_bruta, utilidad_neta, capital_propio = (
+            importes[clave] for clave in ("costo_total_inversion", "ingresos_totales", "utilidad_bruta",
+                                          "utilidad_neta", "capital_propio"))
+    else:
+        costo_total_construccion = v['total_construccion_unitaria'] * v['cantidad_viviendas']
+        costo_total_inversion = (v['costo_terreno'] + v['total_urbanizacion'] + costo_total_construccion
+                                 + v['total_gastos_admin_permisos'] + v['otros_gastos'])
+        ingresos_totales = v['precio_venta_unitario'] * v['cantidad_viviendas']
+        utilidad_bruta = ingresos_totales - costo_total_inversion
+        impuesto = np.where(utilidad_bruta > 0, utilidad_bruta * (v['impuesto_renta_pct'] / 100), 0.0)
+        utilidad_neta = utilidad_bruta - impuesto
+        capital_propio = costo_total_inversion - v['monto_prestamo']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(capital_propio > 0, utilidad_neta / capital_propio * 100, np.inf)
+        roc = np.where(costo_total_inversion > 0, utilidad_bruta / costo_total_inversion * 100, 0.0)
+
+    cuota = _cuota_inicial(v, exacto)
+    pedidas = () if not metricas_flujo else KPIS_FLUJO if metricas_flujo is True else tuple(metricas_flujo)
+    kpis_flujo = _kpis_acumulado(v, cuota, exacto, pedidas)
+
+    kpis = {
+        "ingresos_totales": ingresos_totales,
+        "costo_total_inversion": costo_total_inversion,
+        "capital_propio": capital_propio,
+        "utilidad_bruta": utilidad_bruta,
+        "utilidad_neta": utilidad_neta,
+        "roi": roi,
+        "roc": roc,
+        "cuota_mensual": cuota,
+        **kpis_flujo,
+    }
+    return {nombre: np.broadcast_to(valor, n_escenarios).copy() for nombre, valor in kpis.items()}
+
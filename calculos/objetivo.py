@@ -0,0 +1,127 @@
+"""Búsqueda de objetivo: qué valor de una entrada lleva una métrica a una meta.
+
+Primero se evalúa una malla del rango en un solo lote para ubicar el cambio
+de signo de `métrica - objetivo`; luego se refina ese intervalo con regula
+falsi modificada (método de Illinois), que nunca sale del intervalo.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from calculos.modelo import KPIS_FLUJO, evaluar_lote
+
+METRICAS = {
+    "utilidad_neta": "Utilidad Neta ($)",
+    "utilidad_bruta": "Utilidad Bruta ($)",
+    "roi": "ROI (%)",
+    "roc": "ROC (%)",
+    "maxima_necesidad_capital": "Máxima Necesidad de Capital ($)",
+    "van": "VAN ($)",
+    "tir_anual": "TIR Anual (%)",
+}
+VARIABLES_LIBRES = {
+    "precio_venta_unitario": "Precio de Venta por Vivienda ($)",
+    "tasa_interes_anual": "Tasa de Interés Anual (%)",
+    "monto_prestamo": "Monto del Préstamo ($)",
+    "costo_terreno": "Costo del Terreno ($)",
+    "total_construccion_unitaria": "Costo de Construcción por Vivienda ($)",
+    "total_urbanizacion": "Total Costos de Urbanización ($)",
+    "total_gastos_admin_permisos": "Gastos Admin/Permisos ($)",
+    "otros_gastos": "Otros Gastos e Imprevistos ($)",
+    "impuesto_renta_pct": "Impuesto Sobre la Renta (%)",
+    "tasa_descuento_anual": "Tasa de Descuento Anual (%)",
+}
+# Entradas que no mueven cada métrica: la utilidad, el ROI y el ROC no ven los
+# intereses del préstamo (el ROI sí ve su monto, por el capital propio), el
+# flujo de caja no incluye el impuesto y la tasa de descuento solo entra en el VAN
+_SIN_EFECTO = {
+    "utilidad_neta": {"tasa_interes_anual", "monto_prestamo", "tasa_descuento_anual"},
+    "utilidad_bruta": {"tasa_interes_anual", "monto_prestamo", "impuesto_renta_pct", "tasa_descuento_anual"},
+    "roi": {"tasa_interes_anual", "tasa_descuento_anual"},
+    "roc": {"tasa_interes_anual", "monto_prestamo", "impuesto_renta_pct", "tasa_descuento_anual"},
+    "maxima_necesidad_capital": {"impuesto_renta_pct", "tasa_descuento_anual"},
+    "van": {"impuesto_renta_pct"},
+    "tir_anual": {"impuesto_renta_pct", "tasa_descuento_anual"},
+}
+
+
+def variables_libres(metrica):
+    """Entradas que se pueden ajustar para llevar `metrica` a una meta: las que la afectan."""
+    return {variable: etiqueta for variable, etiqueta in VARIABLES_LIBRES.items() if variable not in _SIN_EFECTO[metrica]}
+
+
+@dataclass(frozen=True)
+class ResultadoBusqueda:
+    convergio: bool
+    valor: float              # NaN si no hay solución en el rango
+    valor_metrica: float
+    evaluaciones: int
+    mensaje: str
+
+
+def buscar_objetivo(datos, metrica, objetivo, variable, minimo, maximo, cual="menor",
+                    tolerancia=1e-9, max_iteraciones=100, puntos_malla=64):
+    """Valor de `variable` en [minimo, maximo] con el que `metrica` alcanza `objetivo`.
+
+    Si la métrica cruza el objetivo varias veces, `cual` elige el "menor" o
+    el "mayor" valor de la variable que lo logra (por ejemplo, el precio
+    mínimo para utilidad cero o la tasa máxima que mantiene un VAN). La
+    variable debe ser una de `variables_libres(metrica)`.
+    """
+    if metrica not in METRICAS:
+        raise ValueError(f"Métrica desconocida: {metrica}")
+    if variable not in VARIABLES_LIBRES:
+        raise ValueError(f"Variable libre desconocida: {variable}")
+    if variable in _SIN_EFECTO[metrica]:
+        raise ValueError(f"{METRICAS[metrica]} no depende de {VARIABLES_LIBRES[variable]}: ningún valor la lleva al objetivo.")
+    if not minimo < maximo:
+        raise ValueError("El mínimo del rango debe ser menor que el máximo.")
+
+    evaluaciones = 0
+
+    def diferencia(valores):
+        nonlocal evaluaciones
+        valores = np.atleast_1d(np.asarray(valores, dtype=float))
+        evaluaciones += valores.size
+        kpis = evaluar_lote(datos, metricas_flujo=metrica in KPIS_FLUJO, **{variable: valores})
+        return kpis[metrica] - objetivo
+
+    malla = np.linspace(minimo, maximo, puntos_malla)
+    valores = diferencia(malla)
+    signos = np.sign(valores)
+    candidatos = sorted(
+        [(malla[i], i, True) for i in np.flatnonzero(signos == 0)]
+        + [(malla[i], i, False) for i in np.flatnonzero(signos[:-1] * signos[1:] < 0)]
+    )
+    if not candidatos:
+        cercano = np.nanargmin(np.abs(valores)) if np.isfinite(valores).any() else 0
+        return ResultadoBusqueda(
+            False, float("nan"), float(valores[cercano] + objetivo), evaluaciones,
+            f"La métrica no alcanza el objetivo en el rango; lo más cercano es con {malla[cercano]:,.4f}.",
+        )
+    _, i, exacto = candidatos[0] if cual == "menor" else candidatos[-1]
+    if exacto:
+        return ResultadoBusqueda(True, float(malla[i]), float(objetivo), evaluaciones, "Solución exacta en la malla.")
+
+    a, b = malla[i], malla[i + 1]
+    fa, fb = valores[i], valores[i + 1]
+    tolerancia_x = tolerancia * max(1.0, abs(maximo - minimo))
+    for _ in range(max_iteraciones):
+        c = (a * fb - b * fa) / (fb - fa)
+        fc = diferencia(c)[0]
+        if fc == 0 or not np.isfinite(fc):
+            a, b, fb = c, c, fc
+            break
+        if np.sign(fc) != np.sign(fb):
+            a, fa = b, fb
+        else:
+            fa /= 2  # Illinois: evita que un extremo quede fijo para siempre
+        b, fb = c, fc
+        if abs(b - a) <= tolerancia_x:
+            break
+
+    convergio = bool(fb == 0 or (np.isfinite(fb) and abs(b - a) <= tolerancia_x))
+    return ResultadoBusqueda(
+        convergio, float(b), float(fb + objetivo), evaluaciones,
+        "Solución encontrada." if convergio else "Se alcanzó el máximo de iteraciones.",
+    )
@@ -0,0 +1,295 @@
+"""Optimización del cronograma del proyecto.
+
+Busca, entre los cronogramas que cumplen las `Restricciones`, el de menor
+necesidad máxima de capital (el punto más bajo del flujo acumulado) o el de
+mayor VAN. Las variables son los meses de la página de Flujo de Caja:
+compra del terreno, urbanización, construcción, ventas, recepción y primer
+pago del préstamo. El mes de los gastos administrativos queda fijo.
+
+Dos ideas reducen la búsqueda:
+
+- Dominancia. Ambos objetivos mejoran (o no empeoran) si el flujo acumulado
+  de cada mes es mayor o igual, y el terreno y la urbanización son salidas
+  que no afectan a ninguna otra partida: conviene pagarlas lo más tarde
+  posible. Así la urbanización dura su mínimo y termina el mes anterior a la
+  construcción, y el terreno se compra al iniciarla.
+- Ramificación y poda. Los nodos son los pares (inicio, fin) de la
+  construcción. Para cada nodo se arma una cota del flujo acumulado: los
+  costos del nodo más, mes a mes, el máximo de los cobros por ventas y el
+  máximo del préstamo entre todas sus opciones factibles. Los nodos se
+  evalúan en lotes con `evaluar_lote`, de la mejor cota a la peor, y la
+  búsqueda se detiene cuando la cota del siguiente ya no supera al mejor
+  cronograma encontrado.
+
+La poda no siempre alcanza. Con la necesidad máxima de capital muchos
+cronogramas empatan (el punto más bajo llega antes de las ventas), y con
+prepagos la cota del préstamo solo descuenta el capital del cronograma sin
+prepagos. Por eso la búsqueda tiene un presupuesto de meses evaluados
+(`LIMITE_MESES_EVALUADOS`): al agotarlo devuelve el mejor cronograma
+encontrado, marcado como búsqueda incompleta. Con los datos por defecto y
+60 meses termina completa en alrededor de un segundo; con 120 meses y el
+objetivo de capital agota el presupuesto. Las cotas por nodo crecen con el
+cubo de la duración, así que solo se admiten proyectos de hasta
+`HORIZONTE_MAXIMO` meses.
+"""
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from calculos.metricas import tasa_periodica, van_por_escenario
+from calculos.modelo import calendario_ventas, cronograma_prestamo, evaluar_lote, flujo_lote
+
+OBJETIVOS = {
+    "maxima_necesidad_capital": "Menor necesidad máxima de capital",
+    "van": "Mayor VAN",
+}
+VARIABLES_CRONOGRAMA = {
+    "mes_compra_terreno": "Mes de Compra del Terreno",
+    "mes_inicio_urbanizacion": "Mes Inicio Urbanización",
+    "mes_fin_urbanizacion": "Mes Fin Urbanización",
+    "mes_inicio_construccion": "Mes Inicio Construcción",
+    "mes_fin_construccion": "Mes Fin Construcción",
+    "mes_recibo_prestamo": "Mes de Recepción del Préstamo",
+    "mes_inicio_ventas": "Mes Inicio de Ventas",
+    "mes_fin_ventas": "Mes Fin de Ventas",
+    "mes_inicio_pago_prestamo": "Mes Inicio Pago Préstamo",
+}
+TOLERANCIA_COTA = 0.05  # margen de la cota por redondeos (p. ej. con centavos exactos): cinco centavos
+HORIZONTE_MAXIMO = 120   # meses; con 240 las cotas por nodo ya ocupan unos 2 GB
+LIMITE_MESES_EVALUADOS = 12_000_000  # cronogramas evaluados x meses del proyecto: unos segundos de búsqueda
+CELDAS_POR_BLOQUE = 4_000_000    # escenarios x meses de cada bloque de calendarios de la cota de ventas
+CELDAS_COTA_VENTAS = 12_000_000  # escenarios x meses de todos los calendarios de la cota de ventas
+
+
+@dataclass(frozen=True)
+class Restricciones:
+    """Condiciones que debe cumplir un cronograma, además de caber en la duración del proyecto.
+
+    Siempre se exige: terreno no después de la urbanización, urbanización
+    terminada antes de la construcción, ventas desde el inicio de la
+    construcción y préstamo recibido antes del primer costo (terreno o
+    gastos administrativos), con el primer pago entre 1 y
+    `meses_maximos_hasta_pago` meses después.
+    """
+    duracion_minima_urbanizacion: int = 5
+    duracion_minima_construccion: int = 18
+    duracion_minima_ventas: int = 19
+    meses_maximos_hasta_pago: int = 1
+
+    @classmethod
+    def desde_datos(cls, datos):
+        """Las duraciones y el plazo hasta el primer pago del cronograma actual."""
+        return cls(
+            duracion_minima_urbanizacion=max(datos.mes_fin_urbanizacion - datos.mes_inicio_urbanizacion + 1, 1),
+            duracion_minima_construccion=max(datos.mes_fin_construccion - datos.mes_inicio_construccion + 1, 1),
+            duracion_minima_ventas=max(datos.mes_fin_ventas - datos.mes_inicio_ventas + 1, 1),
+            meses_maximos_hasta_pago=max(datos.mes_inicio_pago_prestamo - datos.mes_recibo_prestamo, 1),
+        )
+
+
+@dataclass(frozen=True)
+class ResultadoCronograma:
+    cronograma: dict          # variable -> mes, con las claves de VARIABLES_CRONOGRAMA
+    valor: float              # del objetivo con el cronograma óptimo
+    valor_actual: float       # del objetivo con el cronograma de los datos
+    candidatos: int           # cronogramas factibles tras la dominancia
+    evaluados: int
+    nodos: int
+    nodos_evaluados: int
+    segundos: float
+    completa: bool            # False si se agotó el presupuesto: el mejor encontrado, quizá no el óptimo
+
+    @property
+    def podados(self):
+        return self.candidatos - self.evaluados
+
+    def aplicar(self, datos):
+        """Los datos con el cronograma óptimo."""
+        return replace(datos, **self.cronograma)
+
+
+def _rango(desde, hasta):
+    return np.arange(desde, hasta + 1, dtype=np.int64)
+
+
+def _acumulado(flujo):
+    return np.cumsum(flujo, axis=1)
+
+
+def _maximo_por_grupo(valores, grupos, n_grupos):
+    # Máximo mes a mes de las filas de cada grupo (grupo x mes); -inf en los grupos sin filas.
+    # Las filas vienen ordenadas por grupo, así cada grupo es un tramo contiguo
+    resultado = np.full((n_grupos, valores.shape[1]), -np.inf)
+    presentes, inicios = np.unique(grupos, return_index=True)
+    if presentes.size:
+        resultado[presentes] = np.maximum.reduceat(valores, inicios, axis=0)
+    return resultado
+
+
+def _cota_ventas(datos, ventas_inicio, ventas_fin, nodo_inicio, nodo_fin, horizonte):
+    # Máximo mes a mes del cobro acumulado entre las ventas que empiezan en el inicio de cada nodo o
+    # después. Con plan de pagos los cobros dependen de las entregas, es decir, del fin de la
+    # construcción, y un fin más tardío nunca adelanta un cobro: los fines de los nodos se agrupan en
+    # tantos grupos como quepan en CELDAS_COTA_VENTAS y cada grupo se acota con su primer fin
+    if datos.enganche_pct < 100:
+        fines = np.unique(nodo_fin)
+        n_grupos = min(fines.size, max(CELDAS_COTA_VENTAS // (ventas_inicio.size * horizonte), 1))
+        fines = fines[np.linspace(0, fines.size, n_grupos, endpoint=False).astype(np.int64)]
+        grupo = np.searchsorted(fines, nodo_fin, side="right") - 1
+    else:
+        fines, grupo = np.array([datos.mes_fin_construccion]), np.zeros(nodo_inicio.size, dtype=np.int64)
+    cota = np.empty((nodo_inicio.size, horizonte))
+    # Los calendarios se arman por bloques de fines, para no tener todos en memoria a la vez
+    por_bloque = max(CELDAS_POR_BLOQUE // (ventas_inicio.size * horizonte), 1)
+    for desde in range(0, fines.size, por_bloque):
+        bloque = fines[desde:desde + por_bloque]
+        fila_fin, fila_venta = np.divmod(np.arange(bloque.size * ventas_inicio.size), ventas_inicio.size)
+        cobros = calendario_ventas(datos, mes_inicio_ventas=ventas_inicio[fila_venta], mes_fin_ventas=ventas_fin[fila_venta],
+                                   mes_fin_construccion=bloque[fila_fin])["cobros"]
+        ventas = _acumulado(sum(cobros.values()))
+        # Máximo sobre las ventas que empiezan en cada mes o después: máximo por grupo y luego desde el final
+        envolvente = _maximo_por_grupo(ventas, fila_fin * horizonte + ventas_inicio[fila_venta] - 1, bloque.size * horizonte)
+        envolvente = np.maximum.accumulate(envolvente.reshape(bloque.size, horizonte, -1)[:, ::-1], axis=1)[:, ::-1]
+        nodos = (grupo >= desde) & (grupo < desde + bloque.size)
+        cota[nodos] = envolvente[grupo[nodos] - desde, nodo_inicio[nodos] - 1]
+    return cota
+
+
+def _cota_prestamo(datos, prestamo_recibo, prestamo_pago, horizonte):
+    # Aporte acumulado del préstamo (monto recibido menos lo pagado) de cada opción (recibo, primer pago)
+    mes = np.arange(1, horizonte + 1)[None, :]
+    prestamo = np.where(mes >= prestamo_recibo[:, None], datos.monto_prestamo, 0.0)
+    if datos.prepago_ventas_pct <= 0:
+        # Sin prepagos el pago no depende de las ventas: se descuenta exacto
+        pagos = cronograma_prestamo(datos, mes_inicio_pago_prestamo=prestamo_pago)["pagos_proyecto"]
+        return prestamo - _acumulado(np.broadcast_to(pagos, prestamo.shape))
+    # Con prepagos lo pagado hasta cada mes es el monto más los intereses menos el saldo, y el saldo no
+    # supera al del cronograma sin prepagos: lo pagado es al menos el capital amortizado sin prepagos
+    saldo = cronograma_prestamo(datos, prepago_ventas_pct=0.0)["saldo"][0]
+    amortizado = np.concatenate([[0.0], np.maximum(datos.monto_prestamo - saldo, 0.0)])
+    mes_prestamo = np.clip(mes - prestamo_pago[:, None] + 1, 0, saldo.size)
+    return prestamo - amortizado[mes_prestamo]
+
+
+def _valores_objetivo(acumulado, objetivo, tasa):
+    if objetivo == "maxima_necesidad_capital":
+        return acumulado.min(axis=1)
+    return van_por_escenario(np.diff(acumulado, axis=1, prepend=0.0), tasa)
+
+
+def optimizar_cronograma(datos, objetivo="maxima_necesidad_capital", restricciones=None, tamano_lote=20_000,
+                         limite_meses_evaluados=LIMITE_MESES_EVALUADOS):
+    """Cronograma factible que optimiza `objetivo` (ver `OBJETIVOS`), por búsqueda completa con poda.
+
+    Ambos objetivos se maximizan: la necesidad máxima de capital es negativa
+    y se busca la más cercana a cero. Con varios óptimos se devuelve el
+    primero en el orden de búsqueda. La búsqueda se detiene al pasar de
+    `limite_meses_evaluados` (cronogramas evaluados x meses del proyecto);
+    el resultado lo indica con `completa`.
+    """
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo desconocido: {objetivo}")
+    r = restricciones or Restricciones.desde_datos(datos)
+    if min(r.duracion_minima_urbanizacion, r.duracion_minima_construccion, r.duracion_minima_ventas,
+           r.meses_maximos_hasta_pago) < 1:
+        raise ValueError("Las duraciones mínimas y el plazo hasta el primer pago deben ser de al menos 1 mes.")
+    inicio_reloj = time.perf_counter()
+    horizonte = datos.duracion_total_meses
+    if horizonte > HORIZONTE_MAXIMO:
+        raise ValueError(f"La optimización del cronograma admite proyectos de hasta {HORIZONTE_MAXIMO} meses.")
+    du, dc, dv = r.duracion_minima_urbanizacion, r.duracion_minima_construccion, r.duracion_minima_ventas
+    if du + max(dc, dv) > horizonte:
+        raise ValueError("Ningún cronograma cumple las restricciones dentro de la duración del proyecto.")
+
+    # --- Nodos: (inicio, fin) de la construcción; la urbanización y el terreno quedan fijados por dominancia ---
+    inicios = _rango(du + 1, horizonte - dc + 1)
+    nodo_inicio = np.repeat(inicios, np.maximum(horizonte - (inicios + dc - 1) + 1, 0))
+    nodo_fin = np.concatenate([_rango(ic + dc - 1, horizonte) for ic in inicios]) if inicios.size else inicios
+    ultimo_recibo = np.minimum(nodo_inicio - du, datos.mes_gastos_admin)  # recibir antes del terreno y de los gastos
+
+    # --- Opciones de ventas (inicio, fin) y del préstamo (recibo, primer pago), ordenadas por su primer mes ---
+    ventas_inicio = np.concatenate([np.full(max(horizonte - (iv + dv - 1) + 1, 0), iv)
+                                    for iv in _rango(1, horizonte - dv + 1)]).astype(np.int64)
+    ventas_fin = np.concatenate([_rango(iv + dv - 1, horizonte) for iv in _rango(1, horizonte - dv + 1)]).astype(np.int64)
+    recibos = _rango(1, max(int(ultimo_recibo.max(initial=0)), 0))
+    prestamo_recibo = np.repeat(recibos, np.minimum(r.meses_maximos_hasta_pago, horizonte - recibos).clip(0))
+    prestamo_pago = np.concatenate([_rango(mr + 1, min(mr + r.meses_maximos_hasta_pago, horizonte))
+                                    for mr in recibos]).astype(np.int64) if recibos.size else recibos
+
+    # Cuántas opciones tiene cada nodo: ventas desde el inicio de la construcción, préstamo con recibo factible
+    n_ventas = ventas_inicio.size - np.searchsorted(ventas_inicio, nodo_inicio, side="left")
+    n_prestamo = np.searchsorted(prestamo_recibo, ultimo_recibo, side="right")
+    por_nodo = n_ventas * n_prestamo
+    factibles = por_nodo > 0
+    nodo_inicio, nodo_fin, ultimo_recibo, n_ventas, n_prestamo, por_nodo = (
+        a[factibles] for a in (nodo_inicio, nodo_fin, ultimo_recibo, n_ventas, n_prestamo, por_nodo))
+    if not nodo_inicio.size:
+        raise ValueError("Ningún cronograma cumple las restricciones dentro de la duración del proyecto.")
+
+    tasa = tasa_periodica(datos.tasa_descuento_anual)
+    actual = evaluar_lote(datos, metricas_flujo=("van",))[objetivo][0]
+
+    # --- Cota de cada nodo ---
+    # Costos del nodo (sin ventas ni préstamo)
+    costos = _acumulado(flujo_lote(
+        datos, precio_venta_unitario=0.0, monto_prestamo=0.0,
+        mes_compra_terreno=nodo_inicio - du, mes_inicio_urbanizacion=nodo_inicio - du,
+        mes_fin_urbanizacion=nodo_inicio - 1, mes_inicio_construccion=nodo_inicio, mes_fin_construccion=nodo_fin,
+    )[1].sum(axis=1))
+    ventas_nodo = _cota_ventas(datos, ventas_inicio, ventas_fin, nodo_inicio, nodo_fin, horizonte)
+    envolvente_prestamo = _cota_prestamo(datos, prestamo_recibo, prestamo_pago, horizonte)
+    envolvente_prestamo = np.maximum.accumulate(_maximo_por_grupo(envolvente_prestamo, prestamo_recibo - 1, max(recibos.size, 1)), axis=0)
+    prestamo_nodo = envolvente_prestamo[ultimo_recibo - 1]
+
+    if objetivo == "van" and datos.tasa_descuento_anual < 0:
+        cotas = np.full(nodo_inicio.size, np.inf)  # con descuento negativo el VAN no crece con el acumulado
+    else:
+        cotas = _valores_objetivo(costos + ventas_nodo + prestamo_nodo, objetivo, tasa)
+
+    # --- Búsqueda: de la mejor cota a la peor, en lotes de nodos completos ---
+    orden = np.argsort(-cotas, kind="stable")
+    mejor, mejor_cronograma = -np.inf, None
+    evaluados = nodos_evaluados = 0
+    maximo_evaluados = max(limite_meses_evaluados // horizonte, 1)
+    i = 0
+    while i < orden.size and cotas[orden[i]] + TOLERANCIA_COTA > mejor and evaluados < maximo_evaluados:
+        # Los nodos se agregan al lote mientras su cota todavía pueda superar al mejor
+        filas = np.cumsum(por_nodo[orden[i:]])
+        fin_lote = i + max(int(np.searchsorted(filas, min(tamano_lote, maximo_evaluados - evaluados), side="right")), 1)
+        lote = orden[i:fin_lote]
+        lote = lote[cotas[lote] + TOLERANCIA_COTA > mejor]
+        i = fin_lote
+
+        campos = {nombre: [] for nombre in VARIABLES_CRONOGRAMA}
+        for nodo in lote:
+            nv, nl = n_ventas[nodo], n_prestamo[nodo]
+            desde = ventas_inicio.size - nv
+            iv, fv = np.repeat(ventas_inicio[desde:], nl), np.repeat(ventas_fin[desde:], nl)
+            mr, mp = np.tile(prestamo_recibo[:nl], nv), np.tile(prestamo_pago[:nl], nv)
+            ic, fc = nodo_inicio[nodo], nodo_fin[nodo]
+            for nombre, valores in (("mes_compra_terreno", ic - du), ("mes_inicio_urbanizacion", ic - du),
+                                    ("mes_fin_urbanizacion", ic - 1), ("mes_inicio_construccion", ic),
+                                    ("mes_fin_construccion", fc), ("mes_recibo_prestamo", mr),
+                                    ("mes_inicio_pago_prestamo", mp), ("mes_inicio_ventas", iv), ("mes_fin_ventas", fv)):
+                campos[nombre].append(np.broadcast_to(valores, iv.shape))
+        campos = {nombre: np.concatenate(partes) for nombre, partes in campos.items()}
+        valores = evaluar_lote(datos, metricas_flujo=("van",) if objetivo == "van" else False, **campos)[objetivo]
+        evaluados += valores.size
+        nodos_evaluados += lote.size
+        k = int(np.argmax(valores))
+        if valores[k] > mejor:
+            mejor = float(valores[k])
+            mejor_cronograma = {nombre: int(campos[nombre][k]) for nombre in VARIABLES_CRONOGRAMA}
+
+    return ResultadoCronograma(
+        cronograma=mejor_cronograma,
+        valor=mejor,
+        valor_actual=float(actual),
+        candidatos=int(por_nodo.sum()),
+        evaluados=evaluados,
+        nodos=int(nodo_inicio.size),
+        nodos_evaluados=nodos_evaluados,
+        segundos=time.perf_counter() - inicio_reloj,
+        completa=not (i < orden.size and cotas[orden[i]] + TOLERANCIA_COTA > mejor),
+    )
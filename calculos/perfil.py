@@ -0,0 +1,80 @@
+"""Perfilado opcional de cada ejecución de una página.
+
+Una página marca el inicio de cada fase (cálculo, gráficos, tablas...) con
+`Perfilador.marca`; cada marca cierra la fase anterior. Al terminar, la
+duración de cada fase se agrega como una línea JSON al registro, de donde se
+obtienen p50 y p95 por página y por fase. Con el perfilado apagado las marcas
+no hacen nada más que comprobar un booleano.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+CLAVE_ESTADO = "perfilado"
+RUTA_REGISTRO = Path(os.environ.get("SIMULADOR_PERFIL_ARCHIVO", "perfil.jsonl"))
+
+
+def perfilado_activo(estado):
+    """Activo si se encendió en la sesión o con la variable de entorno SIMULADOR_PERFIL=1."""
+    return bool(estado.get(CLAVE_ESTADO, False)) or os.environ.get("SIMULADOR_PERFIL") == "1"
+
+
+class Perfilador:
+    def __init__(self, pagina, activo, ruta=RUTA_REGISTRO):
+        self.pagina = pagina
+        self.activo = activo
+        self.ruta = Path(ruta)
+        self.tramos = []
+        self._inicio = self._inicio_tramo = time.perf_counter() if activo else 0.0
+        self._tramo = None
+
+    def marca(self, nombre):
+        """Cierra la fase en curso y empieza la fase `nombre`."""
+        if not self.activo:
+            return
+        ahora = time.perf_counter()
+        if self._tramo is not None:
+            self.tramos.append((self._tramo, (ahora - self._inicio_tramo) * 1e3))
+        self._tramo, self._inicio_tramo = nombre, ahora
+
+    def finalizar(self):
+        """Cierra la última fase y agrega la ejecución al registro. Devuelve el registro o None."""
+        if not self.activo:
+            return None
+        self.marca(None)
+        registro = {
+            "pagina": self.pagina,
+            "marca_tiempo": time.time(),
+            "total_ms": (time.perf_counter() - self._inicio) * 1e3,
+            "tramos": dict(self.tramos),
+        }
+        with open(self.ruta, "a", encoding="utf-8") as archivo:
+            archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        return registro
+
+    def tabla(self):
+        """Fases de esta ejecución, en orden, con su duración en ms."""
+        import pandas as pd
+        return pd.DataFrame(self.tramos, columns=["Fase", "ms"]).set_index("Fase")
+
+
+def resumen_registro(ruta=RUTA_REGISTRO, pagina=None, ultimas=1_000):
+    """p50 y p95 (ms) por página y fase sobre las últimas `ultimas` ejecuciones de cada página."""
+    import pandas as pd
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return pd.DataFrame(columns=["pagina", "fase", "ejecuciones", "p50_ms", "p95_ms"])
+    registros = pd.read_json(ruta, lines=True)
+    if pagina is not None:
+        registros = registros[registros["pagina"] == pagina]
+    registros = registros.groupby("pagina").tail(ultimas)
+    filas = [
+        {"pagina": r.pagina, "fase": fase, "ms": ms}
+        for r in registros.itertuples(index=False)
+        for fase, ms in {**r.tramos, "total": r.total_ms}.items()
+    ]
+    fases = pd.DataFrame(filas, columns=["pagina", "fase", "ms"])
+    return (fases.groupby(["pagina", "fase"], sort=False)["ms"]
+            .agg(ejecuciones="size", p50_ms="median", p95_ms=lambda ms: ms.quantile(0.95))
+            .reset_index())
@@ -0,0 +1,102 @@
+"""Utilidades para mostrar series y tablas largas sin enviar todo al navegador.
+
+Las páginas de Préstamo y Flujo de Caja pueden llegar a cientos de meses (o
+miles de días). Aquí se resumen las tablas por año, se paginan, se reducen
+las series de los gráficos conservando sus extremos y se estima cuántos
+bytes ocupa cada elemento, para informar la carga que se evita.
+"""
+import numpy as np
+
+UMBRAL_PUNTOS = 500       # puntos por traza a partir de los cuales se usa WebGL y se reduce la serie
+MAX_PUNTOS = 1_000        # puntos que se conservan al reducir una serie
+FILAS_POR_PAGINA = 60
+_CSS_POR_CELDA = 48       # regla "#T_..._rowN_colM { color: ...; }" que genera un Styler por celda
+
+
+def anio_de_periodo(periodos, periodos_por_anio=12):
+    """Año (desde 1) al que pertenece cada periodo (desde 1)."""
+    return (np.asarray(periodos, dtype=np.int64) - 1) // periodos_por_anio + 1
+
+
+def resumen_anual(df, periodos, periodos_por_anio=12, saldos=()):
+    """Tabla con una fila por año.
+
+    Las columnas de flujo se suman; las de `saldos` (saldo restante, flujo
+    acumulado) toman el valor del último periodo del año.
+    """
+    agregaciones = {columna: "last" if columna in saldos else "sum" for columna in df.columns}
+    resumen = df.groupby(anio_de_periodo(periodos, periodos_por_anio)).agg(agregaciones)
+    resumen.index.name = "Año"
+    return resumen
+
+
+def numero_paginas(n_filas, filas_por_pagina=FILAS_POR_PAGINA):
+    return max(1, -(-n_filas // filas_por_pagina))
+
+
+def pagina(df, numero, filas_por_pagina=FILAS_POR_PAGINA):
+    """Filas de la página `numero` (desde 1)."""
+    inicio = (numero - 1) * filas_por_pagina
+    return df.iloc[inicio:inicio + filas_por_pagina]
+
+
+def indices_reducidos(y, max_puntos=MAX_PUNTOS):
+    """Índices de una versión reducida de la serie `y` que conserva sus extremos.
+
+    La serie se divide en `max_puntos / 2` tramos y de cada uno se toman el
+    mínimo y el máximo, de modo que picos como la máxima necesidad de
+    capital no desaparecen del gráfico. El primer y el último punto siempre
+    se conservan.
+    """
+    y = np.asarray(y, dtype=float)
+    n = y.size
+    if n <= max_puntos:
+        return np.arange(n)
+    n_tramos = max(1, max_puntos // 2)
+    largo = -(-n // n_tramos)
+    relleno = np.full(n_tramos * largo, np.nan)
+    relleno[:n] = y
+    tramos = relleno.reshape(n_tramos, largo)
+    validos = ~np.isnan(tramos).all(axis=1)
+    base = np.arange(n_tramos)[validos] * largo
+    minimos = base + np.nanargmin(tramos[validos], axis=1)
+    maximos = base + np.nanargmax(tramos[validos], axis=1)
+    return np.unique(np.concatenate([[0, n - 1], minimos, maximos]))
+
+
+def bytes_tabla(df):
+    """Bytes de la tabla serializada en Arrow, el formato con que Streamlit la envía."""
+    import pyarrow as pa
+    tabla = pa.Table.from_pandas(df)
+    destino = pa.BufferOutputStream()
+    with pa.ipc.new_stream(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return destino.getvalue().size
+
+
+def bytes_estilo_moneda(df, color_por_celda=False):
+    """Estimación de los bytes extra que agrega un Styler con formato "${:,.2f}".
+
+    Un Styler envía además el texto ya formateado de cada celda y, si colorea
+    celda por celda, una regla CSS por cada una.
+    """
+    valores = df.select_dtypes("number").to_numpy(dtype=float)
+    valores = valores[np.isfinite(valores)]
+    with np.errstate(divide="ignore"):
+        digitos = np.maximum(np.floor(np.log10(np.abs(valores))) + 1, 1)
+    # signo + "$" + dígitos + separadores de miles + ".00", más el desplazamiento Arrow de cada texto
+    texto = ((valores < 0) + 1 + digitos + (digitos - 1) // 3 + 3 + 4).sum()
+    css = _CSS_POR_CELDA * valores.size if color_por_celda else 0
+    return int(texto + css)
+
+
+def bytes_figura(figura):
+    """Bytes del JSON de una figura de Plotly."""
+    return len(figura.to_json().encode())
+
+
+def formato_bytes(n):
+    for unidad in ("B", "KB", "MB"):
+        if abs(n) < 1024 or unidad == "MB":
+            return f"{n:,.0f} {unidad}" if unidad == "B" else f"{n:,.1f} {unidad}"
+        n /= 1024
@@ -0,0 +1,200 @@
+"""Presupuestos de obra (cómputo de cantidades) con miles de partidas.
+
+Un presupuesto importado de CSV o Excel se guarda por columnas con tipos
+compactos: cantidades y precios en arreglos de NumPy, y categoría, fase y
+unidad codificadas como enteros sobre su lista de valores distintos. Los
+totales por categoría y fase (una matriz categoría x fase) se calculan una
+vez al importar y después se actualizan solo con la diferencia de la fila
+editada, sin volver a sumar todo el presupuesto.
+
+El total por categoría es la tabla resumida que usan las páginas de costos,
+así que el resto del simulador trabaja con unas pocas filas por presupuesto.
+"""
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+SIN_FASE = "Sin fase"
+# Nombre canónico de cada columna y los encabezados que se aceptan para ella
+COLUMNAS = {
+    "categoria": ("categoria", "category", "capitulo", "rubro"),
+    "descripcion": ("descripcion", "description", "concepto", "partida", "item"),
+    "unidad": ("unidad", "unit", "ud", "und"),
+    "cantidad": ("cantidad", "quantity", "qty", "metrado"),
+    "precio_unitario": ("precio unitario", "precio_unitario", "unit price", "unit_price", "pu", "costo unitario"),
+    "fase": ("fase", "phase", "etapa"),
+}
+OBLIGATORIAS = ("categoria", "cantidad", "precio_unitario")
+# Encabezado con que se muestra cada columna
+ETIQUETAS = {
+    "categoria": "Categoría",
+    "descripcion": "Descripción",
+    "unidad": "Unidad",
+    "cantidad": "Cantidad",
+    "precio_unitario": "Precio Unitario",
+    "fase": "Fase",
+}
+
+
+def _normalizar_encabezado(texto):
+    sin_tildes = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return " ".join(sin_tildes.lower().replace("_", " ").split())
+
+
+def _mapa_columnas(encabezados):
+    alias = {_normalizar_encabezado(a): canonica for canonica, nombres in COLUMNAS.items() for a in nombres}
+    mapa = {}
+    for encabezado in encabezados:
+        canonica = alias.get(_normalizar_encabezado(encabezado))
+        if canonica is not None and canonica not in mapa.values():
+            mapa[encabezado] = canonica
+    faltantes = [ETIQUETAS[c] for c in OBLIGATORIAS if c not in mapa.values()]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el presupuesto: {', '.join(faltantes)}.")
+    return mapa
+
+
+class Presupuesto:
+    """Partidas de un presupuesto por columnas, con totales por categoría y fase.
+
+    `categorias`, `fases` y `unidades` son las listas de valores distintos;
+    cada partida guarda su posición en ellas.
+    """
+
+    def __init__(self, categoria, cantidad, precio_unitario, descripcion=None, unidad=None, fase=None):
+        n = len(cantidad)
+        self.cantidad = np.nan_to_num(np.asarray(cantidad, dtype=np.float64))
+        self.precio_unitario = np.nan_to_num(np.asarray(precio_unitario, dtype=np.float64))
+        self.descripcion = np.asarray([""] * n if descripcion is None else descripcion, dtype=object)
+        self.categorias, self.codigo_categoria = self._codificar(categoria, "")
+        self.unidades, self.codigo_unidad = self._codificar([""] * n if unidad is None else unidad, "")
+        self.fases, self.codigo_fase = self._codificar([SIN_FASE] * n if fase is None else fase, SIN_FASE)
+        self.recalcular()
+
+    @staticmethod
+    def _codificar(valores, vacio):
+        textos = np.asarray([vacio if v is None or v != v else str(v).strip() or vacio for v in valores], dtype=object)
+        distintos, codigos = np.unique(textos, return_inverse=True)
+        return list(distintos), codigos.astype(np.int32)
+
+    def __len__(self):
+        return self.cantidad.size
+
+    @property
+    def importe(self):
+        return self.cantidad * self.precio_unitario
+
+    @property
+    def total(self):
+        return float(self.matriz.sum())
+
+    def recalcular(self):
+        """Vuelve a calcular la matriz categoría x fase desde todas las partidas."""
+        celdas = self.codigo_categoria.astype(np.int64) * len(self.fases) + self.codigo_fase
+        self.matriz = np.bincount(celdas, weights=self.importe, minlength=len(self.categorias) * len(self.fases)
+                                  ).reshape(len(self.categorias), len(self.fases))
+
+    def _codigo(self, lista, valor):
+        # Un valor nuevo se agrega al final de su lista, y la matriz crece con una fila o columna en cero
+        valor = "" if valor is None else str(valor).strip()
+        if valor not in lista:
+            lista.append(valor)
+            faltan = (len(self.categorias) - self.matriz.shape[0], len(self.fases) - self.matriz.shape[1])
+            self.matriz = np.pad(self.matriz, ((0, faltan[0]), (0, faltan[1])))
+        return lista.index(valor)
+
+    def editar(self, fila, **cambios):
+        """Cambia una partida y actualiza los totales con la diferencia de su importe.
+
+        Los cambios usan los nombres de `COLUMNAS` (p. ej. `cantidad=12`).
+        """
+        desconocidos = set(cambios) - set(COLUMNAS)
+        if desconocidos:
+            raise ValueError(f"Columnas desconocidas: {sorted(desconocidos)}")
+        anterior = (self.codigo_categoria[fila], self.codigo_fase[fila], self.cantidad[fila] * self.precio_unitario[fila])
+        for columna, valor in cambios.items():
+            if columna == "categoria":
+                self.codigo_categoria[fila] = self._codigo(self.categorias, valor)
+            elif columna == "fase":
+                self.codigo_fase[fila] = self._codigo(self.fases, valor or SIN_FASE)
+            elif columna == "unidad":
+                self.codigo_unidad[fila] = self._codigo(self.unidades, valor)
+            elif columna == "descripcion":
+                self.descripcion[fila] = "" if valor is None else str(valor)
+            else:
+                getattr(self, columna)[fila] = 0.0 if valor is None or valor != valor else float(valor)
+        categoria, fase, importe = anterior
+        self.matriz[categoria, fase] -= importe
+        self.matriz[self.codigo_categoria[fila], self.codigo_fase[fila]] += self.cantidad[fila] * self.precio_unitario[fila]
+
+    def totales_por_categoria(self):
+        return dict(zip(self.categorias, self.matriz.sum(axis=1)))
+
+    def totales_por_fase(self):
+        return dict(zip(self.fases, self.matriz.sum(axis=0)))
+
+    def filas(self, categoria=None, fase=None):
+        """Posiciones de las partidas, opcionalmente de una categoría y una fase."""
+        seleccion = np.ones(len(self), dtype=bool)
+        if categoria is not None:
+            seleccion &= self.codigo_categoria == self.categorias.index(categoria)
+        if fase is not None:
+            seleccion &= self.codigo_fase == self.fases.index(fase)
+        return np.flatnonzero(seleccion)
+
+    def tabla(self, filas):
+        """DataFrame de las partidas `filas`, indexado por su posición en el presupuesto."""
+        import pandas as pd
+        filas = np.asarray(filas, dtype=np.int64)
+        return pd.DataFrame({
+            ETIQUETAS["categoria"]: np.asarray(self.categorias, dtype=object)[self.codigo_categoria[filas]],
+            ETIQUETAS["descripcion"]: self.descripcion[filas],
+            ETIQUETAS["unidad"]: np.asarray(self.unidades, dtype=object)[self.codigo_unidad[filas]],
+            ETIQUETAS["cantidad"]: self.cantidad[filas],
+            ETIQUETAS["precio_unitario"]: self.precio_unitario[filas],
+            ETIQUETAS["fase"]: np.asarray(self.fases, dtype=object)[self.codigo_fase[filas]],
+            "Importe": self.cantidad[filas] * self.precio_unitario[filas],
+        }, index=pd.Index(filas, name="Partida"))
+
+    def tabla_resumen(self, columna_concepto, columna_valor):
+        """Una fila por categoría con su total, con los nombres de columna de la tabla de costos."""
+        import pandas as pd
+        totales = self.totales_por_categoria()
+        return pd.DataFrame({columna_concepto: list(totales), columna_valor: [float(v) for v in totales.values()]})
+
+    def tabla_matriz(self):
+        """Totales categoría x fase como DataFrame, con totales de fila."""
+        import pandas as pd
+        matriz = pd.DataFrame(self.matriz, index=pd.Index(self.categorias, name="Categoría"), columns=self.fases)
+        matriz["Total"] = matriz.sum(axis=1)
+        return matriz
+
+    def bytes_en_memoria(self):
+        """Bytes de las columnas numéricas y codificadas (las descripciones aparte)."""
+        return sum(a.nbytes for a in (self.cantidad, self.precio_unitario, self.codigo_categoria,
+                                      self.codigo_unidad, self.codigo_fase, self.matriz))
+
+
+def importar_presupuesto(archivo, nombre=None):
+    """Lee un presupuesto de un CSV o un Excel (.xlsx, .xls).
+
+    `archivo` es una ruta o un archivo abierto (p. ej. el de `st.file_uploader`);
+    con un archivo abierto, el tipo sale de `nombre`. Los encabezados se
+    reconocen sin importar mayúsculas ni tildes (ver `COLUMNAS`).
+    """
+    import pandas as pd
+    nombre = str(nombre if nombre is not None else archivo)
+    if Path(nombre).suffix.lower() in (".xlsx", ".xls"):
+        df = pd.read_excel(archivo)  # requiere openpyxl (xlsx) o xlrd (xls)
+    else:
+        df = pd.read_csv(archivo)
+    df = df.rename(columns=_mapa_columnas(df.columns))
+    return Presupuesto(
+        categoria=df["categoria"].to_numpy(),
+        cantidad=pd.to_numeric(df["cantidad"], errors="coerce").to_numpy(dtype=float),
+        precio_unitario=pd.to_numeric(df["precio_unitario"], errors="coerce").to_numpy(dtype=float),
+        descripcion=df["descripcion"].fillna("").astype(str).to_numpy() if "descripcion" in df else None,
+        unidad=df["unidad"].to_numpy() if "unidad" in df else None,
+        fase=df["fase"].to_numpy() if "fase" in df else None,
+    )
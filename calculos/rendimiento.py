@@ -0,0 +1,530 @@
+"""Banco de pruebas de rendimiento de los cálculos financieros, fuera de Streamlit.
+
+Cada caso prepara sus datos y devuelve la función a cronometrar. Se mide la
+mediana y el mínimo de varias repeticiones y, en una ejecución aparte con
+`tracemalloc`, la memoria pico. Los resultados se guardan en JSON para usarlos
+como línea base; al comparar contra una base, el comando termina con código 1
+si algún caso empeora más allá del umbral.
+
+Con `--arranque` también se mide el arranque en frío de cada página: cada
+repetición ejecuta la página una vez en un proceso nuevo de Python (con
+Streamlit ya importado), así el tiempo incluye las importaciones que hace la
+propia página. Se registra además qué bibliotecas pesadas quedaron cargadas.
+
+Uso:
+    python -m calculos.rendimiento --guardar base.json
+    python -m calculos.rendimiento --base base.json --umbral 0.25
+    python -m calculos.rendimiento --arranque --filtro arranque/
+"""
+import argparse
+import gc
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+
+from calculos.amortizacion import calcular_amortizacion, calcular_amortizacion_lote, cronograma_lote, resumen_amortizacion
+from calculos.grafo import GRAFO_PROYECTO
+from calculos.modelo import DatosProyecto, evaluar_lote, evaluar_proyecto, flujo_lote
+from calculos.optimizacion import OBJETIVOS, optimizar_cronograma
+from calculos.presupuesto import importar_presupuesto
+from calculos.resultados import abrir_resultados, guardar_resultados
+from calculos.riesgo import distribuciones_base, simular_monte_carlo
+from calculos.servicio import Evaluador
+from calculos.tesoreria import CarteraTesoreria
+from calculos.tasas import ModeloVasicek, simular_tasas
+from calculos import sensibilidad, sensibilidad_global
+
+VERSION_FORMATO = 1
+CASOS = {}
+
+
+def caso(nombre):
+    """Registra un caso: una función sin argumentos que prepara los datos y devuelve lo que se cronometra."""
+    def registrar(preparar):
+        CASOS[nombre] = preparar
+        return preparar
+    return registrar
+
+
+# Sin la caché de evaluar_proyecto, para medir el cálculo y no la búsqueda en la caché
+_evaluar = evaluar_proyecto.__wrapped__
+
+
+# --- Página 02: presupuesto de obra ---
+def _presupuesto_csv(n_partidas):
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    ruta = Path(tempfile.gettempdir()) / f"presupuesto_{n_partidas}.csv"
+    pd.DataFrame({
+        "Categoría": rng.choice([f"Capítulo {i:02d}" for i in range(25)], n_partidas),
+        "Descripción": [f"Partida {i}" for i in range(n_partidas)],
+        "Unidad": rng.choice(["m2", "m3", "kg", "ud"], n_partidas),
+        "Cantidad": rng.uniform(1, 100, n_partidas).round(2),
+        "Precio Unitario": rng.uniform(1, 500, n_partidas).round(2),
+        "Fase": rng.choice(["Cimentación", "Estructura", "Acabados", "Exteriores"], n_partidas),
+    }).to_csv(ruta, index=False)
+    return ruta
+
+
+@caso("presupuesto/importar/50k_partidas")
+def _importar_presupuesto():
+    ruta = _presupuesto_csv(50_000)
+    return lambda: importar_presupuesto(ruta)
+
+
+@caso("presupuesto/editar/1k_filas_de_50k")
+def _editar_presupuesto():
+    presupuesto = importar_presupuesto(_presupuesto_csv(50_000))
+    filas = np.random.default_rng(1).integers(0, len(presupuesto), 1_000)
+
+    def editar():
+        for fila in filas:
+            presupuesto.editar(int(fila), cantidad=presupuesto.cantidad[fila] + 1.0)
+    return editar
+
+
+# --- Página 04: amortización ---
+for _anios in (1, 5, 15, 30):
+    caso(f"amortizacion/tabla/{_anios}_anios")(
+        lambda anios=_anios: lambda: calcular_amortizacion(200000.0, 5.0, anios)
+    )
+
+
+@caso("amortizacion/lote/10k_prestamos_30_anios")
+def _amortizacion_lote():
+    rng = np.random.default_rng(0)
+    montos = rng.uniform(50_000, 500_000, 10_000)
+    tasas = rng.uniform(0, 15, 10_000)
+    return lambda: calcular_amortizacion_lote(montos, tasas, 30)
+
+
+@caso("amortizacion/resumen/1M_prestamos")
+def _amortizacion_resumen():
+    rng = np.random.default_rng(0)
+    montos = rng.uniform(50_000, 500_000, 1_000_000)
+    tasas = rng.uniform(0, 15, 1_000_000)
+    anios = rng.integers(1, 31, 1_000_000)
+    return lambda: resumen_amortizacion(montos, tasas, anios)
+
+
+@caso("amortizacion/cronograma/10k_trayectorias_360_meses")
+def _cronograma_tasa_variable():
+    tasas = ModeloVasicek().trayectorias(np.random.default_rng(0), 10_000, 360)
+    prepagos = np.zeros(360)
+    prepagos[24:60] = 2_000.0
+    return lambda: cronograma_lote(200_000.0, tasas, 29, meses_gracia=12, capitalizar=True, prepagos=prepagos)
+
+
+@caso("amortizacion/cronograma/10k_prestamos_tasa_fija")
+def _cronograma_tasa_fija():
+    # Tasa y prepagos escalares: la forma que documenta cronograma_lote además de las matrices
+    montos = np.random.default_rng(0).uniform(50_000, 500_000, 10_000)
+    return lambda: (cronograma_lote(200_000.0, 5.0, 15), cronograma_lote(montos, 5.0, 15, prepagos=0.0))
+
+
+@caso("amortizacion/tasas/10k_trayectorias_30_anios")
+def _simulacion_tasas():
+    datos = DatosProyecto(plazo_prestamo_anios=30, meses_gracia_prestamo=6, prepago_ventas_pct=20.0)
+    return lambda: simular_tasas(datos, ModeloVasicek(), n_trayectorias=10_000)
+
+
+# --- Página 05: flujo de caja ---
+for _meses in (36, 120, 360):
+    caso(f"flujo/proyecto/{_meses}_meses")(
+        lambda meses=_meses: lambda: _evaluar(DatosProyecto(duracion_total_meses=meses, mes_fin_ventas=meses))
+    )
+
+
+@caso("flujo/diario/360_meses")
+def _flujo_diario():
+    datos = DatosProyecto(duracion_total_meses=360, mes_fin_ventas=360)
+    return lambda: flujo_lote(datos, "diaria")
+
+
+@caso("flujo/lote/1k_escenarios_360_meses")
+def _flujo_lote():
+    datos = DatosProyecto(duracion_total_meses=360)
+    fines = np.random.default_rng(0).integers(18, 361, 1_000)
+    return lambda: flujo_lote(datos, mes_fin_ventas=fines)
+
+
+@caso("flujo/ventas/10k_viviendas_curva_s_5_fases")
+def _ventas_por_fases():
+    # Las viviendas se agrupan en cohortes por mes y fase: el costo no depende de la cantidad
+    datos = DatosProyecto(cantidad_viviendas=10_000, duracion_total_meses=120, mes_inicio_ventas=12, mes_fin_ventas=96,
+                          curva_absorcion=6.0, enganche_pct=10.0, mensualidades_pct=40.0, fases_entrega=5,
+                          mes_fin_construccion=96, meses_entre_fases=12)
+    return lambda: _evaluar(datos)
+
+
+for _objetivo in OBJETIVOS:
+    caso(f"flujo/cronograma_optimo/60_meses_{_objetivo}")(
+        lambda objetivo=_objetivo: lambda: optimizar_cronograma(DatosProyecto(duracion_total_meses=60, mes_fin_ventas=60), objetivo)
+    )
+
+
+@caso("flujo/cronograma_optimo/60_meses_prepagos")
+def _cronograma_optimo_prepagos():
+    # Con prepagos la cota del préstamo es holgada y la búsqueda termina por el presupuesto de meses evaluados
+    datos = DatosProyecto(duracion_total_meses=60, prepago_ventas_pct=20.0)
+    return lambda: optimizar_cronograma(datos)
+
+
+# --- Aritmética exacta en centavos: la misma carga en punto flotante y en centavos enteros ---
+def _proyecto_36_meses(exacto):
+    return lambda: _evaluar(DatosProyecto(centavos_exactos=exacto))
+
+
+def _flujo_lote_360_meses(exacto):
+    datos = DatosProyecto(duracion_total_meses=360, centavos_exactos=exacto)
+    fines = np.random.default_rng(0).integers(18, 361, 1_000)
+    return lambda: flujo_lote(datos, mes_fin_ventas=fines)
+
+
+def _kpis_lote_10k(exacto):
+    precios = np.linspace(50_000, 120_000, 10_000)
+    return lambda: evaluar_lote(DatosProyecto(centavos_exactos=exacto), precio_venta_unitario=precios)
+
+
+@caso("centavos/flotante/proyecto_36_meses")
+def _proyecto_flotante():
+    return _proyecto_36_meses(exacto=False)
+
+
+@caso("centavos/centavos/proyecto_36_meses")
+def _proyecto_centavos():
+    return _proyecto_36_meses(exacto=True)
+
+
+@caso("centavos/flotante/flujo_lote_1k_escenarios_360_meses")
+def _flujo_lote_flotante():
+    return _flujo_lote_360_meses(exacto=False)
+
+
+@caso("centavos/centavos/flujo_lote_1k_escenarios_360_meses")
+def _flujo_lote_centavos():
+    return _flujo_lote_360_meses(exacto=True)
+
+
+@caso("centavos/flotante/kpis_lote_10k_escenarios")
+def _kpis_lote_flotante():
+    return _kpis_lote_10k(exacto=False)
+
+
+@caso("centavos/centavos/kpis_lote_10k_escenarios")
+def _kpis_lote_centavos():
+    return _kpis_lote_10k(exacto=True)
+
+
+# --- Página 06: escenarios, Monte Carlo y sensibilidad ---
+@caso("riesgo/escenario_puntual")
+def _escenario_puntual():
+    datos = DatosProyecto()
+    return lambda: _evaluar(replace(
+        datos,
+        precio_venta_unitario=datos.precio_venta_unitario * 0.9,
+        total_construccion_unitaria=datos.total_construccion_unitaria * 1.2,
+    ))
+
+
+@caso("riesgo/monte_carlo/100k_escenarios")
+def _monte_carlo():
+    datos = DatosProyecto()
+    distribuciones = distribuciones_base(datos)
+    return lambda: simular_monte_carlo(datos, distribuciones, n_escenarios=100_000)
+
+
+@caso("riesgo/lote_kpis_flujo/10k_escenarios")
+def _lote_kpis_flujo():
+    precios = np.linspace(50_000, 120_000, 10_000)
+    return lambda: evaluar_lote(DatosProyecto(), metricas_flujo=True, precio_venta_unitario=precios)
+
+
+@caso("riesgo/sensibilidad/malla_200x200")
+def _malla():
+    datos = DatosProyecto()
+    x = sensibilidad.valores_variable("variacion_precio_venta_pct", -30, 30, 200)
+    y = sensibilidad.valores_variable("tasa_interes_anual", 0, 15, 200)
+    return lambda: sensibilidad.barrido_2d(datos, "variacion_precio_venta_pct", x, "tasa_interes_anual", y, procesos=1)
+
+
+@caso("riesgo/tornado")
+def _tornado():
+    datos = DatosProyecto()
+    rangos = {variable: sensibilidad.rango_por_defecto(datos, variable) for variable in sensibilidad.VARIABLES}
+    return lambda: sensibilidad.tornado(datos, rangos)
+
+
+@caso("riesgo/sobol/10_factores_n4096")
+def _sobol():
+    datos = DatosProyecto()
+    return lambda: sensibilidad_global.indices_sobol(datos, n=4096)
+
+
+# --- Página 09: tesorería consolidada de la cartera ---
+def _cartera(n_proyectos, meses):
+    datos = [DatosProyecto(precio_venta_unitario=80_000.0 + 1_000 * i, duracion_total_meses=meses, mes_fin_ventas=meses)
+             for i in range(n_proyectos)]
+    return {f"Proyecto {i}": (d, 1 + 6 * i, lambda d=d: _evaluar(d).flujo) for i, d in enumerate(datos)}
+
+
+@caso("cartera/consolidar/12_proyectos_120_meses")
+def _consolidar_cartera():
+    proyectos = _cartera(12, 120)
+
+    def consolidar():
+        cartera = CarteraTesoreria()
+        cartera.sincronizar(proyectos)
+        return cartera.consolidado()
+    return consolidar
+
+
+@caso("cartera/actualizar/1_de_12_proyectos_120_meses")
+def _actualizar_cartera():
+    # Cambia el precio de un solo proyecto: solo se evalúa ese y se reemplaza su aporte
+    proyectos = _cartera(12, 120)
+    cartera = CarteraTesoreria()
+    cartera.sincronizar(proyectos)
+    precios = itertools.count(1)
+
+    def actualizar():
+        datos = DatosProyecto(precio_venta_unitario=90_000.0 + next(precios), duracion_total_meses=120, mes_fin_ventas=120)
+        proyectos["Proyecto 5"] = (datos, 31, lambda: _evaluar(datos).flujo)
+        cartera.sincronizar(proyectos)
+        return cartera.consolidado()
+    return actualizar
+
+
+# --- Página 07: KPIs del Dashboard ---
+@caso("dashboard/kpis_sesion_nueva")
+def _dashboard():
+    def kpis():
+        # El grafo llama a evaluar_proyecto, que tiene caché; se vacía para medir el cálculo completo
+        evaluar_proyecto.cache_clear()
+        recalculo = GRAFO_PROYECTO.actualizar({})
+        return recalculo.valores["resultados"].flujo_df()
+    return kpis
+
+
+# --- Resultados en disco ---
+def _variaciones_resultados(n_escenarios):
+    rng = np.random.default_rng(0)
+    return {"precio_venta_unitario": rng.uniform(70_000, 100_000, n_escenarios),
+            "plazo_prestamo_anios": rng.integers(10, 31, n_escenarios)}
+
+
+@caso("resultados/guardar/10k_escenarios")
+def _guardar_resultados():
+    ruta = Path(tempfile.gettempdir()) / "resultados_10k"
+    variaciones = _variaciones_resultados(10_000)
+    return lambda: guardar_resultados(ruta, DatosProyecto(), **variaciones)
+
+
+@caso("resultados/leer/mes_y_escenario_de_100k")
+def _leer_resultados():
+    # Con orden "mes" un mes es contiguo; un escenario toca una fila por columna
+    ruta = Path(tempfile.gettempdir()) / "resultados_100k"
+    variaciones = _variaciones_resultados(100_000)
+    guardar_resultados(ruta, DatosProyecto(), orden="mes", **variaciones)
+
+    def leer():
+        resultados = abrir_resultados(ruta)
+        return resultados.mes(24), resultados.flujo_escenario(54_321)
+    return leer
+
+
+# --- Servicio de evaluación ---
+@caso("servicio/lote/200_proyectos_sin_cache")
+def _servicio_sin_cache():
+    # En el hilo que llama (procesos=0): mide validación, hash y evaluación, sin HTTP
+    proyectos = [{"precio_venta_unitario": 80_000.0 + i} for i in range(200)]
+
+    def lote():
+        evaluar_proyecto.cache_clear()
+        return Evaluador(procesos=0, capacidad_cache=0).evaluar(proyectos)
+    return lote
+
+
+@caso("servicio/solicitud/1k_aciertos_de_cache")
+def _servicio_cache():
+    evaluador = Evaluador(procesos=0)
+    evaluador.evaluar([{}])
+    return lambda: [evaluador.evaluar([{}]) for _ in range(1_000)]
+
+
+# --- Medición ---
+def medir(funcion, repeticiones=5, tiempo_minimo=0.05):
+    """Mediana y mínimo (s por llamada) y memoria pico (bytes) de `funcion`."""
+    funcion()  # calentamiento
+    llamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            funcion()
+        if time.perf_counter() - inicio >= tiempo_minimo or llamadas >= 1 << 16:
+            break
+        llamadas *= 2
+
+    tiempos = []
+    gc.disable()
+    try:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for _ in range(llamadas):
+                funcion()
+            tiempos.append((time.perf_counter() - inicio) / llamadas)
+    finally:
+        gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "mediana_s": statistics.median(tiempos),
+        "minimo_s": min(tiempos),
+        "llamadas_por_repeticion": llamadas,
+        "repeticiones": repeticiones,
+        "memoria_pico_bytes": pico,
+    }
+
+
+# --- Arranque en frío de las páginas ---
+RAIZ = Path(__file__).resolve().parent.parent
+MODULOS_PESADOS = ("pandas", "pyarrow", "plotly.express")
+_SCRIPT_ARRANQUE = """
+import json, resource, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+if sys.argv[2] == "1":
+    app.session_state["solo_indicadores"] = True
+inicio = time.perf_counter()
+app.run()
+print(json.dumps({
+    "s": time.perf_counter() - inicio,
+    "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "modulos": [m for m in sys.argv[3].split(",") if m in sys.modules],
+    "errores": [str(e.value) for e in app.exception],
+}))
+"""
+
+
+def paginas():
+    return [RAIZ / "01_Resumen_Proyecto.py"] + sorted((RAIZ / "pages").glob("*.py"))
+
+
+def medir_arranque(pagina, solo_indicadores=False, repeticiones=3):
+    """Tiempo de la primera ejecución de `pagina` en procesos nuevos; memoria como RSS máximo del proceso."""
+    mediciones = []
+    for _ in range(repeticiones):
+        proceso = subprocess.run(
+            [sys.executable, "-c", _SCRIPT_ARRANQUE, str(pagina), "1" if solo_indicadores else "0", ",".join(MODULOS_PESADOS)],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        )
+        medicion = json.loads(proceso.stdout.strip().splitlines()[-1])
+        if medicion["errores"]:
+            raise RuntimeError(f"{pagina.name}: {medicion['errores'][0]}")
+        mediciones.append(medicion)
+    tiempos = [m["s"] for m in mediciones]
+    return {
+        "mediana_s": statistics.median(tiempos),
+        "minimo_s": min(tiempos),
+        "llamadas_por_repeticion": 1,
+        "repeticiones": repeticiones,
+        "memoria_pico_bytes": max(m["rss"] for m in mediciones),
+        "modulos_cargados": mediciones[-1]["modulos"],
+    }
+
+
+def _imprimir(nombre, medida):
+    extra = f"  [{', '.join(medida['modulos_cargados'])}]" if "modulos_cargados" in medida else ""
+    print(f"{nombre:<45} {medida['mediana_s'] * 1e3:>10.3f} ms "
+          f"{medida['memoria_pico_bytes'] / 2**20:>9.1f} MiB{extra}", file=sys.stderr)
+
+
+def ejecutar(filtro="", repeticiones=5, arranque=False):
+    """Mide los casos cuyo nombre contiene `filtro`; con `arranque`, también el arranque de cada página."""
+    resultados = {}
+    for nombre, preparar in CASOS.items():
+        if filtro in nombre:
+            resultados[nombre] = medir(preparar(), repeticiones)
+            _imprimir(nombre, resultados[nombre])
+    if arranque:
+        for pagina in paginas():
+            for solo_indicadores in (False, True):
+                nombre = f"arranque/{pagina.stem}" + ("/solo_indicadores" if solo_indicadores else "")
+                if filtro in nombre:
+                    resultados[nombre] = medir_arranque(pagina, solo_indicadores, min(repeticiones, 3))
+                    _imprimir(nombre, resultados[nombre])
+    return {
+        "version": VERSION_FORMATO,
+        "entorno": {"python": platform.python_version(), "numpy": np.__version__, "plataforma": platform.platform()},
+        "casos": resultados,
+    }
+
+
+def comparar(actual, base, umbral=0.25, umbral_memoria=0.25):
+    """Casos que empeoran respecto a la base: lista de (caso, medida, base, actual, cambio relativo)."""
+    regresiones = []
+    for nombre, medida in actual["casos"].items():
+        anterior = base["casos"].get(nombre)
+        if anterior is None:
+            continue
+        for clave, limite in (("mediana_s", umbral), ("memoria_pico_bytes", umbral_memoria)):
+            if anterior[clave] > 0:
+                cambio = medida[clave] / anterior[clave] - 1
+                if cambio > limite:
+                    regresiones.append((nombre, clave, anterior[clave], medida[clave], cambio))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m calculos.rendimiento",
+        description="Mide tiempos y memoria de los cálculos financieros y los compara con una línea base.",
+    )
+    parser.add_argument("--filtro", default="", help="Solo los casos cuyo nombre contiene este texto.")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones por caso (por defecto: 5).")
+    parser.add_argument("--arranque", action="store_true",
+                        help="Mide también el arranque en frío de cada página (un proceso nuevo por repetición).")
+    parser.add_argument("--guardar", help="Archivo JSON donde guardar los resultados como nueva línea base.")
+    parser.add_argument("--base", help="Línea base JSON contra la que comparar.")
+    parser.add_argument("--umbral", type=float, default=0.25,
+                        help="Aumento relativo de tiempo tolerado antes de fallar (por defecto: 0.25).")
+    parser.add_argument("--umbral-memoria", type=float, default=0.25,
+                        help="Aumento relativo de memoria pico tolerado (por defecto: 0.25).")
+    args = parser.parse_args(argv)
+
+    actual = ejecutar(args.filtro, args.repeticiones, args.arranque)
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as archivo:
+            json.dump(actual, archivo, indent=2)
+    if not args.base:
+        return 0
+
+    with open(args.base, encoding="utf-8") as archivo:
+        base = json.load(archivo)
+    regresiones = comparar(actual, base, args.umbral, args.umbral_memoria)
+    for nombre, clave, anterior, medida, cambio in regresiones:
+        print(f"REGRESIÓN {nombre} [{clave}]: {anterior:.6g} -> {medida:.6g} ({cambio:+.1%})", file=sys.stderr)
+    if regresiones:
+        return 1
+    print(f"Sin regresiones respecto a {args.base}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Resultados de muchos escenarios en disco, por columnas y con lectura mapeada en memoria.
+
+Cada componente del flujo de caja de la página 05 y cada columna del
+cronograma del préstamo se guarda como una matriz (escenario x mes) en su
+propio archivo `.npy`, junto con un `meta.json` que describe el conjunto. Al
+abrirlo, las matrices se mapean en memoria (`np.load(..., mmap_mode="r")`):
+leer un escenario o un mes no copia ni carga el resto del archivo, y el
+sistema operativo solo lee las páginas que se tocan.
+
+El orden en disco se elige al escribir: "escenario" deja contiguos los meses
+de cada escenario (rápido para ver un escenario completo) y "mes" deja
+contiguos los escenarios de cada mes (rápido para cortar un mes a través de
+millones de escenarios). La interfaz de lectura es la misma en ambos casos.
+
+Uso:
+    python -m calculos.resultados proyectos.csv resultados/ --orden mes
+"""
+import argparse
+import json
+import sys
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+from calculos.modelo import COLUMNAS_FLUJO, DatosProyecto, cronograma_prestamo, flujo_lote
+
+VERSION_FORMATO = 1
+ORDENES = ("escenario", "mes")
+# Columnas del cronograma de `cronograma_lote` que se guardan, con su nombre para mostrar
+COLUMNAS_AMORTIZACION = {
+    "tasa": "Tasa Anual (%)",
+    "cuota": "Cuota Mensual",
+    "prepago": "Prepago",
+    "capital": "Capital Pagado",
+    "interes": "Interés Pagado",
+    "interes_capitalizado": "Interés Capitalizado",
+    "saldo": "Saldo Restante",
+}
+
+
+def _archivo(nombre):
+    # "Costo Urbanización" -> "costo_urbanizacion"
+    sin_tildes = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode()
+    return "_".join("".join(c if c.isalnum() else " " for c in sin_tildes.lower()).split())
+
+
+class EscritorResultados:
+    """Escribe un conjunto de resultados por bloques de escenarios consecutivos.
+
+    Las matrices se reservan en disco al crear el escritor; cada bloque se
+    copia en su lugar sin mantener en memoria los anteriores.
+    """
+
+    def __init__(self, ruta, n_escenarios, meses, meses_prestamo, orden="escenario", entradas=()):
+        if orden not in ORDENES:
+            raise ValueError(f"Orden desconocido: {orden!r}. Opciones: {', '.join(ORDENES)}.")
+        self.ruta = Path(ruta)
+        self.ruta.mkdir(parents=True, exist_ok=True)
+        self.n_escenarios = n_escenarios
+        self.orden = orden
+        self.escritos = 0
+        self.meta = {
+            "version": VERSION_FORMATO,
+            "orden": orden,
+            "n_escenarios": n_escenarios,
+            "meses": meses,
+            "meses_prestamo": meses_prestamo,
+            "flujo": {nombre: f"flujo_{_archivo(nombre)}.npy" for nombre in COLUMNAS_FLUJO},
+            "amortizacion": {nombre: f"amortizacion_{clave}.npy" for clave, nombre in COLUMNAS_AMORTIZACION.items()},
+            "entradas": {campo: f"entrada_{campo}.npy" for campo in entradas},
+        }
+        self._matrices = {}
+        for grupo, largo in (("flujo", meses), ("amortizacion", meses_prestamo)):
+            forma = (n_escenarios, largo) if orden == "escenario" else (largo, n_escenarios)
+            for nombre, archivo in self.meta[grupo].items():
+                self._matrices[grupo, nombre] = np.lib.format.open_memmap(
+                    self.ruta / archivo, mode="w+", dtype=np.float64, shape=forma)
+        for campo, archivo in self.meta["entradas"].items():
+            self._matrices["entradas", campo] = np.lib.format.open_memmap(
+                self.ruta / archivo, mode="w+", dtype=np.float64, shape=(n_escenarios,))
+
+    def _copiar(self, grupo, nombre, bloque):
+        destino = self._matrices[grupo, nombre]
+        filas = slice(self.escritos, self.escritos + bloque.shape[0])
+        if bloque.ndim == 1:
+            destino[filas] = bloque
+        elif self.orden == "escenario":
+            destino[filas, :bloque.shape[1]] = bloque
+        else:
+            destino[:bloque.shape[1], filas] = bloque.T
+
+    def agregar(self, datos, **variaciones):
+        """Calcula y escribe el siguiente bloque de escenarios (variaciones como en `evaluar_lote`)."""
+        _, flujo = flujo_lote(datos, **variaciones)
+        n = flujo.shape[0]
+        if self.escritos + n > self.n_escenarios:
+            raise ValueError(f"El bloque excede los {self.n_escenarios:,} escenarios reservados.")
+        if flujo.shape[2] > self.meta["meses"]:
+            raise ValueError(f"El bloque dura {flujo.shape[2]} meses y se reservaron {self.meta['meses']}.")
+        cronograma = cronograma_prestamo(datos, meses=self.meta["meses_prestamo"], **variaciones)
+
+        for i, nombre in enumerate(COLUMNAS_FLUJO):
+            self._copiar("flujo", nombre, flujo[:, i, :])
+        for clave, nombre in COLUMNAS_AMORTIZACION.items():
+            self._copiar("amortizacion", nombre, np.broadcast_to(cronograma[clave], (n, self.meta["meses_prestamo"])))
+        for campo in self.meta["entradas"]:
+            valor = variaciones.get(campo, getattr(datos, campo))
+            self._copiar("entradas", campo, np.broadcast_to(np.asarray(valor, dtype=np.float64), (n,)))
+        self.escritos += n
+
+    def cerrar(self):
+        """Vacía las matrices a disco y escribe `meta.json`; el conjunto queda listo para `abrir_resultados`."""
+        if self.escritos != self.n_escenarios:
+            raise ValueError(f"Se escribieron {self.escritos:,} de {self.n_escenarios:,} escenarios.")
+        for matriz in self._matrices.values():
+            matriz.flush()
+        self._matrices.clear()
+        with open(self.ruta / "meta.json", "w", encoding="utf-8") as archivo:
+            json.dump(self.meta, archivo, ensure_ascii=False, indent=2)
+
+
+class Resultados:
+    """Conjunto de resultados abierto con `abrir_resultados`.
+
+    `flujo[nombre]` y `amortizacion[nombre]` son matrices (escenario x mes)
+    mapeadas en memoria, de solo lectura; con orden "mes" son la vista
+    traspuesta del archivo, sin copia.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        with open(self.ruta / "meta.json", encoding="utf-8") as archivo:
+            self.meta = json.load(archivo)
+        if self.meta["version"] != VERSION_FORMATO:
+            raise ValueError(f"Versión de formato {self.meta['version']} no soportada (se espera {VERSION_FORMATO}).")
+        self.n_escenarios = self.meta["n_escenarios"]
+        self.meses = np.arange(1, self.meta["meses"] + 1)
+        self.meses_prestamo = np.arange(1, self.meta["meses_prestamo"] + 1)
+        self.flujo = {nombre: self._abrir(archivo) for nombre, archivo in self.meta["flujo"].items()}
+        self.amortizacion = {nombre: self._abrir(archivo) for nombre, archivo in self.meta["amortizacion"].items()}
+        self.entradas = {campo: np.load(self.ruta / archivo, mmap_mode="r")
+                         for campo, archivo in self.meta["entradas"].items()}
+
+    def _abrir(self, archivo):
+        matriz = np.load(self.ruta / archivo, mmap_mode="r")
+        return matriz if self.meta["orden"] == "escenario" else matriz.T
+
+    def __len__(self):
+        return self.n_escenarios
+
+    def flujo_escenario(self, escenario):
+        """Flujo de caja de un escenario como en la página 05 (con neto y acumulado)."""
+        from calculos.modelo import tabla_flujo
+        flujo = np.stack([self.flujo[nombre][escenario] for nombre in COLUMNAS_FLUJO])
+        return tabla_flujo(self.meses, flujo)
+
+    def amortizacion_escenario(self, escenario):
+        """Cronograma del préstamo de un escenario como DataFrame."""
+        import pandas as pd
+        return pd.DataFrame({"Mes": self.meses_prestamo,
+                             **{nombre: np.asarray(matriz[escenario]) for nombre, matriz in self.amortizacion.items()}})
+
+    def mes(self, mes, columnas=COLUMNAS_FLUJO, escenarios=slice(None)):
+        """Valor de cada columna del flujo en `mes` (desde 1) para los escenarios pedidos."""
+        return {nombre: np.asarray(self.flujo[nombre][escenarios, mes - 1]) for nombre in columnas}
+
+    def flujo_neto(self, escenarios=slice(None)):
+        """Flujo neto (escenario x mes) de los escenarios pedidos; solo se lee esa parte."""
+        return sum(np.asarray(self.flujo[nombre][escenarios]) for nombre in COLUMNAS_FLUJO)
+
+    def bytes_en_disco(self):
+        return sum(archivo.stat().st_size for archivo in self.ruta.glob("*.npy"))
+
+
+def abrir_resultados(ruta):
+    """Abre un conjunto de resultados escrito con `EscritorResultados` o `guardar_resultados`."""
+    return Resultados(ruta)
+
+
+def guardar_resultados(ruta, datos, tamano_bloque=2_500, orden="escenario", **variaciones):
+    """Calcula flujo y cronograma de un lote de escenarios y los escribe en `ruta`.
+
+    Las variaciones son las de `evaluar_lote` y se guardan también como
+    entradas de cada escenario. El lote se recorre en bloques de
+    `tamano_bloque` escenarios.
+    """
+    n = max([np.size(valor) for valor in variaciones.values()], default=1)
+    variaciones = {campo: np.broadcast_to(valor, (n,)) for campo, valor in variaciones.items()}
+    duracion = np.broadcast_to(variaciones.get("duracion_total_meses", datos.duracion_total_meses), (n,))
+    gracia = np.broadcast_to(variaciones.get("meses_gracia_prestamo", datos.meses_gracia_prestamo), (n,))
+    plazo = np.broadcast_to(variaciones.get("plazo_prestamo_anios", datos.plazo_prestamo_anios), (n,))
+
+    escritor = EscritorResultados(ruta, n, int(duracion.max()), int((gracia + plazo * 12).max()), orden,
+                                  entradas=variaciones)
+    for inicio in range(0, n, tamano_bloque):
+        escritor.agregar(datos, **{campo: valor[inicio:inicio + tamano_bloque] for campo, valor in variaciones.items()})
+    escritor.cerrar()
+    return abrir_resultados(ruta)
+
+
+def main(argv=None):
+    from calculos.cartera import leer_bloques, variaciones_bloque
+
+    parser = argparse.ArgumentParser(
+        prog="python -m calculos.resultados",
+        description="Guarda flujo de caja y cronograma del préstamo de una cartera de escenarios en disco.",
+    )
+    parser.add_argument("entrada", help="Archivo .csv o .parquet con un escenario por fila (como en calculos.cartera).")
+    parser.add_argument("salida", help="Carpeta donde se escriben los archivos .npy y meta.json.")
+    parser.add_argument("--bloque", type=int, default=2_500, help="Escenarios por bloque (por defecto: 2500).")
+    parser.add_argument("--orden", choices=ORDENES, default="escenario",
+                        help="Contiguos en disco: los meses de cada escenario o los escenarios de cada mes.")
+    args = parser.parse_args(argv)
+
+    # Una primera pasada fija el número de escenarios y los horizontes que se reservan en disco
+    defecto = DatosProyecto()
+    n, meses, meses_prestamo, entradas = 0, 0, 0, set()
+    for bloque in leer_bloques(args.entrada, args.bloque):
+        v = variaciones_bloque(bloque)
+        n += len(bloque)
+        meses = max(meses, int(np.max(v.get("duracion_total_meses", defecto.duracion_total_meses))))
+        prestamo = (np.asarray(v.get("meses_gracia_prestamo", defecto.meses_gracia_prestamo))
+                    + np.asarray(v.get("plazo_prestamo_anios", defecto.plazo_prestamo_anios)) * 12)
+        meses_prestamo = max(meses_prestamo, int(np.max(prestamo)))
+        entradas.update(v)
+
+    escritor = EscritorResultados(args.salida, n, meses, meses_prestamo, args.orden, entradas=sorted(entradas))
+    for bloque in leer_bloques(args.entrada, args.bloque):
+        escritor.agregar(defecto, **variaciones_bloque(bloque))
+    escritor.cerrar()
+    tamano = abrir_resultados(args.salida).bytes_en_disco()
+    print(f"{n:,} escenarios x {meses} meses -> {args.salida} ({tamano / 2**20:,.1f} MiB)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
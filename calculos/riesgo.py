@@ -0,0 +1,180 @@
+"""Simulación Monte Carlo del proyecto.
+
+Las variables inciertas se describen con una `Distribucion` y se muestrean
+por bloques de tamaño fijo: las matrices intermedias (escenario x mes) nunca
+superan `tamano_bloque` filas, y de cada escenario solo se conservan los KPIs
+analizados para calcular percentiles exactos. Cada variable usa su propio
+generador derivado de la semilla, así que el resultado es reproducible y no
+depende del tamaño de bloque.
+
+`etapas_monte_carlo` hace la misma simulación como trabajo de
+`calculos.trabajos`: informa el avance tras cada bloque y, cada tanto, un
+resumen de los escenarios simulados hasta ese momento.
+"""
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from calculos.modelo import evaluar_lote
+
+VARIABLES = {
+    "sobrecosto_construccion_pct": "Sobrecosto de Construcción (%)",
+    "variacion_precio_venta_pct": "Variación en Precio de Venta (%)",
+    "impuesto_renta_pct": "Impuesto Sobre la Renta (%)",
+    "duracion_ventas_meses": "Duración de las Ventas (meses)",
+}
+METRICAS = ("utilidad_neta", "roi", "maxima_necesidad_capital")
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+TIPOS_DISTRIBUCION = ("fija", "uniforme", "normal", "triangular")
+
+
+@dataclass(frozen=True)
+class Distribucion:
+    """Distribución de una variable incierta.
+
+    Parámetros según el tipo: `fija` (valor), `uniforme` (mínimo, máximo),
+    `normal` (media, desviación) y `triangular` (mínimo, moda, máximo).
+    """
+    tipo: str = "fija"
+    parametros: tuple = (0.0,)
+
+    def __post_init__(self):
+        esperados = {"fija": 1, "uniforme": 2, "normal": 2, "triangular": 3}
+        if self.tipo not in esperados:
+            raise ValueError(f"Tipo de distribución desconocido: {self.tipo}")
+        if len(self.parametros) != esperados[self.tipo]:
+            raise ValueError(f"La distribución '{self.tipo}' requiere {esperados[self.tipo]} parámetros.")
+
+    def muestrear(self, rng, n):
+        if self.tipo == "fija":
+            return np.full(n, float(self.parametros[0]))
+        if self.tipo == "uniforme":
+            return rng.uniform(*self.parametros, size=n)
+        if self.tipo == "normal":
+            return rng.normal(*self.parametros, size=n)
+        return rng.triangular(*self.parametros, size=n)
+
+
+@dataclass(frozen=True)
+class ResultadoMonteCarlo:
+    n_escenarios: int
+    semilla: int
+    nivel_confianza: float
+    percentiles: dict = field(repr=False)   # métrica -> valores en PERCENTILES
+    media: dict = field(repr=False)
+    var: dict = field(repr=False)           # métrica -> percentil (1 - nivel_confianza)
+    cvar: dict = field(repr=False)          # métrica -> media de la cola bajo el VaR
+    histogramas: dict = field(repr=False)   # métrica -> (conteos, bordes)
+    probabilidad_perdida: float = 0.0
+    muestras: dict = field(default=None, repr=False)
+
+
+def _variaciones(datos, muestras):
+    # Traduce las variables de riesgo a campos de DatosProyecto.
+    duracion = np.maximum(np.rint(muestras["duracion_ventas_meses"]), 1).astype(np.int64)
+    return {
+        "total_construccion_unitaria": datos.total_construccion_unitaria * (1 + muestras["sobrecosto_construccion_pct"] / 100),
+        "precio_venta_unitario": datos.precio_venta_unitario * (1 + muestras["variacion_precio_venta_pct"] / 100),
+        "impuesto_renta_pct": np.clip(muestras["impuesto_renta_pct"], 0.0, 100.0),
+        "mes_fin_ventas": datos.mes_inicio_ventas + duracion - 1,
+    }
+
+
+def distribuciones_base(datos):
+    """Distribuciones fijas que reproducen el caso base de `datos`."""
+    return {
+        "sobrecosto_construccion_pct": Distribucion("fija", (0.0,)),
+        "variacion_precio_venta_pct": Distribucion("fija", (0.0,)),
+        "impuesto_renta_pct": Distribucion("fija", (datos.impuesto_renta_pct,)),
+        "duracion_ventas_meses": Distribucion("fija", (datos.mes_fin_ventas - datos.mes_inicio_ventas + 1,)),
+    }
+
+
+def distribuciones_sugeridas(datos):
+    """Distribuciones con que abre la página de Análisis de Riesgo."""
+    duracion_ventas = datos.mes_fin_ventas - datos.mes_inicio_ventas + 1
+    return {
+        "sobrecosto_construccion_pct": Distribucion("triangular", (-5.0, 5.0, 30.0)),
+        "variacion_precio_venta_pct": Distribucion("normal", (0.0, 10.0)),
+        "impuesto_renta_pct": Distribucion("fija", (float(datos.impuesto_renta_pct),)),
+        "duracion_ventas_meses": Distribucion("uniforme", (float(duracion_ventas), duracion_ventas * 1.5)),
+    }
+
+
+def _resumir(resultados, semilla, nivel_confianza, bins, conservar_muestras):
+    alfa = (1 - nivel_confianza) * 100
+    percentiles, media, var, cvar, histogramas = {}, {}, {}, {}, {}
+    for metrica, valores in resultados.items():
+        histogramas[metrica] = np.histogram(valores[np.isfinite(valores)], bins=bins)
+        percentiles[metrica] = np.percentile(valores, PERCENTILES)
+        media[metrica] = float(np.mean(valores))
+        var[metrica] = float(np.percentile(valores, alfa))
+        cola = valores[valores <= var[metrica]]
+        cvar[metrica] = float(cola.mean()) if cola.size else var[metrica]
+
+    return ResultadoMonteCarlo(
+        n_escenarios=resultados["utilidad_neta"].size,
+        semilla=semilla,
+        nivel_confianza=nivel_confianza,
+        percentiles=percentiles,
+        media=media,
+        var=var,
+        cvar=cvar,
+        histogramas=histogramas,
+        probabilidad_perdida=float(np.mean(resultados["utilidad_neta"] < 0)),
+        muestras=resultados if conservar_muestras else None,
+    )
+
+
+def simular_monte_carlo(datos, distribuciones, n_escenarios=1_000_000, semilla=0,
+                        tamano_bloque=100_000, nivel_confianza=0.95, bins=60, conservar_muestras=False):
+    """Simula `n_escenarios` del proyecto y resume utilidad neta, ROI y capital.
+
+    `distribuciones` asigna una `Distribucion` a cada nombre de `VARIABLES`;
+    las variables ausentes quedan fijas en el caso base. Con
+    `conservar_muestras` el resultado incluye además los KPIs de cada escenario.
+    """
+    etapas = etapas_monte_carlo(datos, distribuciones, n_escenarios, semilla, tamano_bloque, nivel_confianza, bins,
+                                conservar_muestras)
+    while True:
+        try:
+            next(etapas)
+        except StopIteration as fin:
+            return fin.value
+
+
+def etapas_monte_carlo(datos, distribuciones, n_escenarios=1_000_000, semilla=0, tamano_bloque=100_000,
+                       nivel_confianza=0.95, bins=60, conservar_muestras=False, intervalo_parcial=None):
+    """`simular_monte_carlo` por bloques, como trabajo de `calculos.trabajos`.
+
+    Produce `(progreso, parcial)` tras cada bloque y devuelve el resultado
+    final. Con `intervalo_parcial` (segundos), cada vez que pasa ese tiempo
+    `parcial` es un `ResultadoMonteCarlo` de los escenarios ya simulados; si
+    no, es None. El resultado final es el mismo que el de `simular_monte_carlo`.
+    """
+    desconocidas = set(distribuciones) - set(VARIABLES)
+    if desconocidas:
+        raise ValueError(f"Variables de riesgo desconocidas: {sorted(desconocidas)}")
+    distribuciones = {**distribuciones_base(datos), **distribuciones}
+
+    semillas = np.random.SeedSequence(semilla).spawn(len(VARIABLES))
+    generadores = {nombre: np.random.default_rng(s) for nombre, s in zip(VARIABLES, semillas)}
+    resultados = {metrica: np.empty(n_escenarios) for metrica in METRICAS}
+
+    ultimo_parcial = time.monotonic()
+    for inicio in range(0, n_escenarios, tamano_bloque):
+        n = min(tamano_bloque, n_escenarios - inicio)
+        muestras = {nombre: distribuciones[nombre].muestrear(generadores[nombre], n) for nombre in VARIABLES}
+        kpis = evaluar_lote(datos, **_variaciones(datos, muestras))
+        for metrica in METRICAS:
+            resultados[metrica][inicio:inicio + n] = kpis[metrica]
+
+        hechos = inicio + n
+        parcial = None
+        if intervalo_parcial is not None and hechos < n_escenarios and time.monotonic() - ultimo_parcial >= intervalo_parcial:
+            parcial = _resumir({m: valores[:hechos] for m, valores in resultados.items()}, semilla, nivel_confianza, bins, False)
+            ultimo_parcial = time.monotonic()
+        yield hechos / n_escenarios, parcial
+
+    return _resumir(resultados, semilla, nivel_confianza, bins, conservar_muestras)
@@ -0,0 +1,137 @@
+"""Análisis de sensibilidad: barrido bidimensional y gráfico de tornado.
+
+El barrido evalúa todas las combinaciones de dos variables sobre una malla
+con `evaluar_lote`, por bloques; las mallas grandes se reparten entre varios
+procesos. El resultado guarda todas las métricas, así que cambiar la métrica
+que colorea el mapa de calor no requiere recalcular.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from calculos.modelo import evaluar_lote
+
+VARIABLES = {
+    "sobrecosto_construccion_pct": "Sobrecosto de Construcción (%)",
+    "variacion_precio_venta_pct": "Variación en Precio de Venta (%)",
+    "tasa_interes_anual": "Tasa de Interés Anual (%)",
+    "plazo_prestamo_anios": "Plazo del Préstamo (años)",
+    "cantidad_viviendas": "Cantidad de Viviendas",
+}
+VARIABLES_ENTERAS = ("plazo_prestamo_anios", "cantidad_viviendas")
+METRICAS = ("utilidad_neta", "roi", "maxima_necesidad_capital")
+
+# A partir de este número de puntos el barrido se reparte entre procesos
+UMBRAL_PROCESOS = 250_000
+
+
+def valor_base(datos, variable):
+    """Valor de la variable en el caso base (0 para los porcentajes)."""
+    if variable in ("sobrecosto_construccion_pct", "variacion_precio_venta_pct"):
+        return 0.0
+    return getattr(datos, variable)
+
+
+def rango_por_defecto(datos, variable):
+    """Rango (mínimo, máximo) sugerido para barrer cada variable."""
+    return {
+        "sobrecosto_construccion_pct": (-10.0, 50.0),
+        "variacion_precio_venta_pct": (-30.0, 30.0),
+        "tasa_interes_anual": (0.0, 20.0),
+        "plazo_prestamo_anios": (1, 30),
+        "cantidad_viviendas": (max(1, datos.cantidad_viviendas // 2), datos.cantidad_viviendas * 2),
+    }[variable]
+
+
+def valores_variable(variable, minimo, maximo, n_puntos):
+    """Puntos equiespaciados del rango; sin repetidos para las variables enteras."""
+    valores = np.linspace(minimo, maximo, n_puntos)
+    if variable in VARIABLES_ENTERAS:
+        valores = np.unique(np.rint(valores)).astype(np.int64)
+    return valores
+
+
+def _a_campos(datos, variables):
+    # Traduce las variables de sensibilidad a campos de DatosProyecto.
+    campos = {}
+    for variable, valores in variables.items():
+        if variable not in VARIABLES:
+            raise ValueError(f"Variable de sensibilidad desconocida: {variable}")
+        if variable == "sobrecosto_construccion_pct":
+            campos["total_construccion_unitaria"] = datos.total_construccion_unitaria * (1 + valores / 100)
+        elif variable == "variacion_precio_venta_pct":
+            campos["precio_venta_unitario"] = datos.precio_venta_unitario * (1 + valores / 100)
+        else:
+            campos[variable] = valores
+    return campos
+
+
+def _evaluar_bloque(datos, variables):
+    kpis = evaluar_lote(datos, **_a_campos(datos, variables))
+    return {metrica: kpis[metrica] for metrica in METRICAS}
+
+
+@dataclass(frozen=True)
+class ResultadoBarrido:
+    variable_x: str
+    variable_y: str
+    valores_x: np.ndarray = field(repr=False)
+    valores_y: np.ndarray = field(repr=False)
+    metricas: dict = field(repr=False)  # métrica -> matriz (len(valores_y) x len(valores_x))
+    procesos: int = 1
+
+
+def barrido_2d(datos, variable_x, valores_x, variable_y, valores_y, procesos=None, tamano_bloque=50_000):
+    """Evalúa la malla completa de `valores_x` x `valores_y`.
+
+    Con `procesos` mayor que 1 (por defecto, todos los núcleos) y una malla
+    de al menos `UMBRAL_PROCESOS` puntos, los bloques se evalúan en paralelo.
+    """
+    if variable_x == variable_y:
+        raise ValueError("Las dos variables del barrido deben ser distintas.")
+    valores_x, valores_y = np.asarray(valores_x), np.asarray(valores_y)
+    malla_x, malla_y = np.meshgrid(valores_x, valores_y)
+    malla_x, malla_y = malla_x.ravel(), malla_y.ravel()
+
+    bloques = [
+        {variable_x: malla_x[inicio:inicio + tamano_bloque], variable_y: malla_y[inicio:inicio + tamano_bloque]}
+        for inicio in range(0, malla_x.size, tamano_bloque)
+    ]
+    procesos = procesos or os.cpu_count() or 1
+    if procesos > 1 and malla_x.size >= UMBRAL_PROCESOS:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(bloques))) as pool:
+            resultados = list(pool.map(_evaluar_bloque, [datos] * len(bloques), bloques))
+    else:
+        procesos = 1
+        resultados = [_evaluar_bloque(datos, bloque) for bloque in bloques]
+
+    forma = (valores_y.size, valores_x.size)
+    metricas = {
+        metrica: np.concatenate([r[metrica] for r in resultados]).reshape(forma)
+        for metrica in METRICAS
+    }
+    return ResultadoBarrido(variable_x, variable_y, valores_x, valores_y, metricas, procesos)
+
+
+def tornado(datos, rangos, metrica="utilidad_neta"):
+    """Sensibilidad una-variable-a-la-vez de `metrica`.
+
+    `rangos` asigna (bajo, alto) a cada variable. Devuelve el valor base y una
+    lista de tuplas (variable, valor_en_bajo, valor_en_alto), ordenada de
+    mayor a menor impacto. Todas las evaluaciones se hacen en un solo lote.
+    """
+    nombres = list(rangos)
+    n = 2 * len(nombres)
+    variables = {}
+    for i, variable in enumerate(nombres):
+        columna = np.full(n, valor_base(datos, variable), dtype=float)
+        columna[2 * i], columna[2 * i + 1] = rangos[variable]
+        variables[variable] = np.rint(columna).astype(np.int64) if variable in VARIABLES_ENTERAS else columna
+
+    valores = _evaluar_bloque(datos, variables)[metrica]
+    base = float(_evaluar_bloque(datos, {})[metrica][0])
+    barras = [(variable, float(valores[2 * i]), float(valores[2 * i + 1])) for i, variable in enumerate(nombres)]
+    barras.sort(key=lambda barra: abs(barra[2] - barra[1]), reverse=True)
+    return base, barras
@@ -0,0 +1,327 @@
+"""Sensibilidad global: índices de Sobol de primer orden y totales.
+
+Cada factor incierto varía de manera uniforme en su rango y se estima qué
+parte de la varianza de cada métrica explica por sí solo (primer orden, S1) y
+junto con sus interacciones (total, ST). Se usa el esquema de Saltelli: dos
+matrices de muestras A y B de N filas y, por cada factor, la matriz A con la
+columna de ese factor tomada de B; en total N x (factores + 2) evaluaciones,
+todas con `evaluar_lote` por bloques. S1 se estima con el estimador de
+Saltelli (2010) y ST con el de Jansen; los intervalos de confianza se obtienen
+remuestreando (bootstrap) las N filas. El bootstrap trata las filas como
+independientes, así que con muestreo de baja discrepancia los intervalos son
+conservadores: la dispersión real entre semillas es menor (ver la CLI).
+
+Las muestras salen de secuencias de baja discrepancia (Sobol o Halton) con
+una aleatorización que conserva su estructura (desplazamiento digital o
+módulo 1). Cubren el espacio de manera más pareja que los números
+pseudoaleatorios, así que los índices se estabilizan con muchas menos
+evaluaciones del modelo; `muestreo="aleatorio"` permite compararlo.
+
+Uso:
+    python -m calculos.sensibilidad_global --n 4096
+    python -m calculos.sensibilidad_global --n 1024 --repeticiones 10 --muestreo sobol halton aleatorio
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from calculos.modelo import DatosProyecto, evaluar_lote
+
+FACTORES = {
+    "costo_terreno": "Costo del Terreno ($)",
+    "total_urbanizacion": "Total de Urbanización ($)",
+    "total_construccion_unitaria": "Construcción por Vivienda ($)",
+    "total_gastos_admin_permisos": "Gastos Admin. y Permisos ($)",
+    "precio_venta_unitario": "Precio de Venta Unitario ($)",
+    "tasa_interes_anual": "Tasa de Interés Anual (%)",
+    "plazo_prestamo_anios": "Plazo del Préstamo (años)",
+    "duracion_construccion_meses": "Duración de la Construcción (meses)",
+    "mes_inicio_ventas": "Mes de Inicio de Ventas",
+    "duracion_ventas_meses": "Duración de las Ventas (meses)",
+}
+FACTORES_ENTEROS = ("plazo_prestamo_anios", "duracion_construccion_meses", "mes_inicio_ventas", "duracion_ventas_meses")
+METRICAS = ("utilidad_neta", "maxima_necesidad_capital")
+MUESTREOS = ("sobol", "halton", "aleatorio")
+
+# --- Secuencias de baja discrepancia ---
+
+# Números de dirección de Joe y Kuo (new-joe-kuo-6.21201) para las dimensiones 2 a 21:
+# (grado s del polinomio primitivo, coeficientes a, m_1..m_s). La dimensión 1 es la de van der Corput.
+_DIRECCIONES_SOBOL = (
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+    (6, 1, (1, 3, 3, 9, 7, 49)),
+    (6, 13, (1, 1, 1, 15, 21, 21)),
+    (6, 16, (1, 3, 1, 13, 27, 49)),
+    (6, 19, (1, 1, 1, 15, 7, 5)),
+    (6, 22, (1, 3, 1, 15, 13, 25)),
+    (6, 25, (1, 1, 5, 5, 19, 61)),
+    (7, 1, (1, 3, 7, 11, 23, 15, 103)),
+    (7, 4, (1, 3, 7, 13, 13, 15, 69)),
+)
+MAX_DIMENSIONES_SOBOL = len(_DIRECCIONES_SOBOL) + 1
+_BITS = 32
+_PRIMOS = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97, 101)
+
+
+def _numeros_direccion(dimensiones):
+    # V[j, k] = m_k / 2^k en punto fijo de 32 bits, para la dimensión j y el bit k
+    v = np.zeros((dimensiones, _BITS), dtype=np.uint64)
+    v[0] = [1 << (_BITS - 1 - k) for k in range(_BITS)]
+    for j, (s, a, iniciales) in enumerate(_DIRECCIONES_SOBOL[:dimensiones - 1], start=1):
+        m = list(iniciales)
+        for k in range(s, _BITS):
+            nuevo = m[k - s] ^ (m[k - s] << s)
+            for i in range(1, s):
+                if (a >> (s - 1 - i)) & 1:
+                    nuevo ^= m[k - i] << i
+            m.append(nuevo)
+        v[j] = [m[k] << (_BITS - 1 - k) for k in range(_BITS)]
+    return v
+
+
+def puntos_sobol(n, dimensiones, semilla=0):
+    """Primeros `n` puntos de la secuencia de Sobol en [0, 1)^dimensiones, con desplazamiento digital aleatorio."""
+    if dimensiones > MAX_DIMENSIONES_SOBOL:
+        raise ValueError(f"La secuencia de Sobol admite hasta {MAX_DIMENSIONES_SOBOL} dimensiones.")
+    v = _numeros_direccion(dimensiones)
+    indice = np.arange(n, dtype=np.uint64)
+    gray = indice ^ (indice >> np.uint64(1))
+    x = np.zeros((n, dimensiones), dtype=np.uint64)
+    for k in range(max(int(n - 1).bit_length(), 1)):
+        activo = ((gray >> np.uint64(k)) & np.uint64(1)).astype(bool)
+        x[activo] ^= v[:, k]
+    # El XOR con un entero aleatorio por dimensión conserva la estructura de red de la secuencia
+    desplazamiento = np.random.default_rng(semilla).integers(0, 1 << _BITS, dimensiones, dtype=np.uint64)
+    return (x ^ desplazamiento).astype(float) / (1 << _BITS)
+
+
+def puntos_halton(n, dimensiones, semilla=0):
+    """Primeros `n` puntos de la secuencia de Halton en [0, 1)^dimensiones, desplazados al azar módulo 1."""
+    if dimensiones > len(_PRIMOS):
+        raise ValueError(f"La secuencia de Halton admite hasta {len(_PRIMOS)} dimensiones.")
+    x = np.zeros((n, dimensiones))
+    for j, base in enumerate(_PRIMOS[:dimensiones]):
+        resto, escala = np.arange(1, n + 1), 1.0
+        while np.any(resto):
+            escala /= base
+            resto, digito = np.divmod(resto, base)
+            x[:, j] += digito * escala
+    return (x + np.random.default_rng(semilla).random(dimensiones)) % 1.0
+
+
+def puntos_aleatorios(n, dimensiones, semilla=0):
+    """Puntos pseudoaleatorios uniformes, como referencia para comparar."""
+    return np.random.default_rng(semilla).random((n, dimensiones))
+
+
+_GENERADORES = {"sobol": puntos_sobol, "halton": puntos_halton, "aleatorio": puntos_aleatorios}
+
+# --- Factores ---
+
+
+def rangos_por_defecto(datos, amplitud=1.0):
+    """Rango (mínimo, máximo) de cada factor alrededor del caso base; `amplitud` los ensancha o estrecha."""
+    duracion_construccion = datos.mes_fin_construccion - datos.mes_inicio_construccion + 1
+    duracion_ventas = datos.mes_fin_ventas - datos.mes_inicio_ventas + 1
+
+    def relativo(valor, pct):
+        return (valor * (1 - pct * amplitud), valor * (1 + pct * amplitud))
+
+    return {
+        "costo_terreno": relativo(datos.costo_terreno, 0.2),
+        "total_urbanizacion": relativo(datos.total_urbanizacion, 0.2),
+        "total_construccion_unitaria": relativo(datos.total_construccion_unitaria, 0.2),
+        "total_gastos_admin_permisos": relativo(datos.total_gastos_admin_permisos, 0.2),
+        "precio_venta_unitario": relativo(datos.precio_venta_unitario, 0.15),
+        "tasa_interes_anual": (max(datos.tasa_interes_anual - 3 * amplitud, 0.0), datos.tasa_interes_anual + 3 * amplitud),
+        "plazo_prestamo_anios": (max(round(datos.plazo_prestamo_anios - 5 * amplitud), 1), round(datos.plazo_prestamo_anios + 5 * amplitud)),
+        "duracion_construccion_meses": (duracion_construccion, round(duracion_construccion * (1 + 0.5 * amplitud))),
+        "mes_inicio_ventas": (max(round(datos.mes_inicio_ventas - 3 * amplitud), 1), round(datos.mes_inicio_ventas + 6 * amplitud)),
+        "duracion_ventas_meses": (max(round(duracion_ventas * (1 - 0.25 * amplitud)), 1), round(duracion_ventas * (1 + 0.5 * amplitud))),
+    }
+
+
+def _escalar(unitarios, rangos):
+    # Del cubo unitario a los rangos; los factores enteros toman cada valor del rango con igual probabilidad
+    valores = {}
+    for j, (factor, (minimo, maximo)) in enumerate(rangos.items()):
+        u = unitarios[:, j]
+        if factor in FACTORES_ENTEROS:
+            valores[factor] = np.minimum(minimo + np.floor(u * (maximo - minimo + 1)), maximo).astype(np.int64)
+        else:
+            valores[factor] = minimo + u * (maximo - minimo)
+    return valores
+
+
+def _a_campos(datos, valores):
+    # Traduce los factores a campos de DatosProyecto; las duraciones fijan el mes de fin.
+    campos = {}
+    for factor, valor in valores.items():
+        if factor not in FACTORES:
+            raise ValueError(f"Factor de sensibilidad desconocido: {factor}")
+        if factor == "duracion_construccion_meses":
+            campos["mes_fin_construccion"] = datos.mes_inicio_construccion + valor - 1
+        elif factor != "duracion_ventas_meses":
+            campos[factor] = valor
+    inicio_ventas = valores.get("mes_inicio_ventas", datos.mes_inicio_ventas)
+    if "duracion_ventas_meses" in valores:
+        campos["mes_fin_ventas"] = inicio_ventas + valores["duracion_ventas_meses"] - 1
+    elif "mes_inicio_ventas" in valores:  # se desplaza el periodo de ventas sin cambiar su duración
+        campos["mes_fin_ventas"] = inicio_ventas + (datos.mes_fin_ventas - datos.mes_inicio_ventas)
+    return campos
+
+
+# --- Índices de Sobol ---
+
+
+@dataclass(frozen=True)
+class ResultadoSobol:
+    factores: tuple
+    n_base: int                              # filas N de las matrices A y B
+    evaluaciones: int                        # N x (factores + 2)
+    muestreo: str
+    nivel_confianza: float
+    segundos: float
+    primer_orden: dict = field(repr=False)   # métrica -> S1 por factor
+    total: dict = field(repr=False)          # métrica -> ST por factor
+    intervalos_primer_orden: dict = field(repr=False)  # métrica -> (factores x 2) con los extremos del intervalo
+    intervalos_total: dict = field(repr=False)
+    varianza: dict = field(repr=False)       # métrica -> varianza total de la muestra
+
+
+def _indices(f_a, f_b, f_ab):
+    # Estimadores de Saltelli (primer orden) y Jansen (total) sobre el último eje
+    varianza = np.var(np.concatenate([f_a, f_b], axis=-1), axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        primer_orden = np.mean(f_b * (f_ab - f_a), axis=-1) / varianza
+        total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=-1) / varianza
+    return primer_orden, total, varianza
+
+
+def indices_sobol(datos, rangos=None, n=4096, muestreo="sobol", semilla=0, nivel_confianza=0.95,
+                  n_bootstrap=200, tamano_bloque=50_000):
+    """Índices de Sobol de primer orden y totales de `METRICAS` para los factores de `rangos`.
+
+    `rangos` asigna (mínimo, máximo) a cada factor de `FACTORES` (por
+    defecto, `rangos_por_defecto`). Con muestreo Sobol, `n` se redondea a la
+    potencia de 2 siguiente, que es donde la secuencia está equilibrada.
+    """
+    if muestreo not in _GENERADORES:
+        raise ValueError(f"Muestreo desconocido: {muestreo}")
+    rangos = dict(rangos or rangos_por_defecto(datos))
+    k = len(rangos)
+    if k == 0:
+        raise ValueError("Se necesita al menos un factor.")
+    if muestreo == "sobol":
+        n = 1 << max(int(n - 1).bit_length(), 1)
+    inicio = time.perf_counter()
+
+    unitarios = _GENERADORES[muestreo](n, 2 * k, semilla)
+    a, b = unitarios[:, :k], unitarios[:, k:]
+    matrices = [a, b]
+    for j in range(k):
+        ab = a.copy()
+        ab[:, j] = b[:, j]
+        matrices.append(ab)
+    valores = _escalar(np.concatenate(matrices), rangos)
+
+    total_filas = n * (k + 2)
+    salidas = {metrica: np.empty(total_filas) for metrica in METRICAS}
+    for desde in range(0, total_filas, tamano_bloque):
+        bloque = {factor: columna[desde:desde + tamano_bloque] for factor, columna in valores.items()}
+        kpis = evaluar_lote(datos, **_a_campos(datos, bloque))
+        for metrica in METRICAS:
+            salidas[metrica][desde:desde + tamano_bloque] = kpis[metrica]
+
+    rng = np.random.default_rng(semilla)
+    remuestras = rng.integers(0, n, (n_bootstrap, n))
+    alfa = (1 - nivel_confianza) / 2 * 100
+    primer_orden, total, intervalos_primer, intervalos_total, varianza = {}, {}, {}, {}, {}
+    for metrica, salida in salidas.items():
+        f = salida.reshape(k + 2, n)
+        f = f - np.mean(f[:2])  # centrar reduce la cancelación numérica
+        f_a, f_b, f_ab = f[0], f[1], f[2:]
+        primer_orden[metrica], total[metrica], varianza[metrica] = _indices(f_a, f_b, f_ab)
+
+        # Bootstrap: las mismas filas remuestreadas para A, B y cada A_B, un factor por vez
+        intervalos_primer[metrica], intervalos_total[metrica] = np.empty((k, 2)), np.empty((k, 2))
+        f_a_r, f_b_r = f_a[remuestras], f_b[remuestras]
+        for j in range(k):
+            s1, st, _ = _indices(f_a_r, f_b_r, f_ab[j][remuestras])
+            intervalos_primer[metrica][j] = np.nanpercentile(s1, [alfa, 100 - alfa])
+            intervalos_total[metrica][j] = np.nanpercentile(st, [alfa, 100 - alfa])
+
+    return ResultadoSobol(
+        factores=tuple(rangos), n_base=n, evaluaciones=total_filas, muestreo=muestreo,
+        nivel_confianza=nivel_confianza, segundos=time.perf_counter() - inicio,
+        primer_orden=primer_orden, total=total, intervalos_primer_orden=intervalos_primer,
+        intervalos_total=intervalos_total, varianza={m: float(v) for m, v in varianza.items()},
+    )
+
+
+def tabla_indices(resultado, metrica):
+    """DataFrame con S1, ST y sus intervalos por factor, ordenado por ST de mayor a menor."""
+    import pandas as pd  # solo la página y la CLI arman tablas
+
+    tabla = pd.DataFrame({
+        "S1": resultado.primer_orden[metrica],
+        "S1 mín.": resultado.intervalos_primer_orden[metrica][:, 0],
+        "S1 máx.": resultado.intervalos_primer_orden[metrica][:, 1],
+        "ST": resultado.total[metrica],
+        "ST mín.": resultado.intervalos_total[metrica][:, 0],
+        "ST máx.": resultado.intervalos_total[metrica][:, 1],
+    }, index=pd.Index([FACTORES[f] for f in resultado.factores], name="Factor"))
+    return tabla.sort_values("ST", ascending=False)
+
+
+# --- Línea de comandos ---
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m calculos.sensibilidad_global",
+        description="Índices de Sobol del proyecto por defecto con muestreo de baja discrepancia.",
+    )
+    parser.add_argument("--n", type=int, default=4096, help="Filas N de las matrices de muestras (por defecto: 4096).")
+    parser.add_argument("--muestreo", nargs="+", choices=MUESTREOS, default=["sobol"], help="Uno o más métodos de muestreo.")
+    parser.add_argument("--amplitud", type=float, default=1.0, help="Escala de los rangos por defecto (por defecto: 1).")
+    parser.add_argument("--repeticiones", type=int, default=1,
+                        help="Con más de una, repite con semillas distintas e informa la dispersión de los índices.")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    datos = DatosProyecto()
+    rangos = rangos_por_defecto(datos, args.amplitud)
+    for muestreo in args.muestreo:
+        resultados = [indices_sobol(datos, rangos, args.n, muestreo, args.semilla + r) for r in range(args.repeticiones)]
+        primero = resultados[0]
+        segundos = sum(r.segundos for r in resultados) / len(resultados)
+        print(f"{muestreo}: {primero.evaluaciones:,} evaluaciones (N={primero.n_base:,}) en {segundos:.2f} s", file=sys.stderr)
+        for metrica in METRICAS:
+            print(f"  {metrica}", file=sys.stderr)
+            tabla = tabla_indices(primero, metrica)
+            if args.repeticiones > 1:
+                # Desviación estándar de los índices entre semillas: menor es más estable
+                etiquetas = [FACTORES[f] for f in primero.factores]
+                tabla["S1 desv."] = dict(zip(etiquetas, np.std([r.primer_orden[metrica] for r in resultados], axis=0)))
+                tabla["ST desv."] = dict(zip(etiquetas, np.std([r.total[metrica] for r in resultados], axis=0)))
+            print(tabla.to_string(float_format=lambda x: f"{x:8.4f}"), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""Servicio HTTP/JSON local para evaluar proyectos con el mismo modelo del simulador.
+
+Otras herramientas obtienen los KPIs del Dashboard, el flujo de caja y el
+resumen del préstamo sin pasar por Streamlit. Las solicitudes se atienden en
+hilos; la evaluación corre en un grupo de procesos de trabajo. Los
+resultados se guardan en una caché LRU por el hash del contenido de las
+entradas (el mismo hash del almacén de escenarios), y dos solicitudes
+simultáneas con las mismas entradas esperan una sola evaluación.
+
+Rutas:
+    GET  /salud      estado del servicio y de la caché
+    POST /evaluar    {"datos": {...}} o {"proyectos": [{...}, ...]}; opcional
+                     "flujo": true para incluir el flujo de caja mensual
+
+Los campos de cada proyecto son los de `DatosProyecto`; los ausentes toman
+el valor por defecto. Las entradas fuera de los rangos de las páginas se
+rechazan con 400; cualquier otro error responde 500, siempre con
+{"error": "..."}.
+
+Uso:
+    python -m calculos.servicio --puerto 8765 --procesos 4
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, fields
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from calculos.amortizacion import resumen_amortizacion, resumen_cronograma
+from calculos.escenarios import hash_entradas
+from calculos.modelo import COLUMNAS_FLUJO, DatosProyecto, cronograma_prestamo, evaluar_proyecto
+
+MAX_PROYECTOS_POR_SOLICITUD = 10_000
+TAMANO_TAREA = 64   # proyectos por tarea enviada a un proceso de trabajo
+_CAMPOS = {campo.name for campo in fields(DatosProyecto)}
+# Rangos de los widgets de las páginas (None: sin límite); fuera de ellos el modelo falla o no tiene sentido
+_RANGOS = {
+    "cantidad_viviendas": (1, None),
+    "costo_terreno": (0, None),
+    "otros_gastos": (0, None),
+    "precio_venta_unitario": (0, None),
+    "monto_prestamo": (0, None),
+    "tasa_interes_anual": (0, 100),
+    "plazo_prestamo_anios": (1, 100),
+    "total_urbanizacion": (0, None),
+    "total_construccion_unitaria": (0, None),
+    "total_gastos_admin_permisos": (0, None),
+    "impuesto_renta_pct": (0, 100),
+    "tasa_descuento_anual": (0, 100),
+    "duracion_total_meses": (1, 360),
+    "meses_gracia_prestamo": (0, 120),
+    "prepago_ventas_pct": (0, 100),
+    "curva_absorcion": (0, 12),
+    "enganche_pct": (0, 100),
+    "mensualidades_pct": (0, 100),
+    "fases_entrega": (1, 24),
+    "meses_entre_fases": (1, 60),
+}
+# Meses del cronograma: entre 1 y la duración total del proyecto
+_MESES = tuple(campo.name for campo in fields(DatosProyecto) if campo.name.startswith("mes_"))
+
+
+def _json(valor):
+    # JSON no admite NaN ni infinito (TIR sin solución, ROI sin capital propio): se envían como null
+    return None if isinstance(valor, float) and not math.isfinite(valor) else valor
+
+
+def evaluar(campos):
+    """Resultado serializable de un proyecto: KPIs, resumen del préstamo y flujo de caja."""
+    datos = DatosProyecto(**campos)
+    resultados = evaluar_proyecto(datos)
+    kpis = {campo.name: _json(float(getattr(resultados, campo.name)))
+            for campo in fields(resultados) if campo.name not in ("meses", "flujo")}
+    if datos.meses_gracia_prestamo or datos.prepago_ventas_pct:
+        prestamo = resumen_cronograma(cronograma_prestamo(datos))
+    else:
+        # Sin gracia ni prepagos alcanza la fórmula cerrada, como en `flujo_lote`
+        prestamo = {**resumen_amortizacion(datos.monto_prestamo, datos.tasa_interes_anual, datos.plazo_prestamo_anios),
+                    "total_prepagos": 0.0}
+    return {
+        "kpis": kpis,
+        "amortizacion": {"cuota_mensual": kpis["cuota_mensual"],
+                         **{nombre: float(np.ravel(prestamo[nombre])[0])
+                            for nombre in ("total_pagado", "total_prepagos", "total_intereses")}},
+        "flujo": {
+            "meses": resultados.meses.tolist(),
+            **{columna: fila.tolist() for columna, fila in zip(COLUMNAS_FLUJO, resultados.flujo)},
+            "Flujo Neto Mensual": resultados.flujo_neto.tolist(),
+        },
+    }
+
+
+def evaluar_varios(lista_campos):
+    """`evaluar` para una tarea de varios proyectos en un proceso de trabajo."""
+    return [evaluar(campos) for campos in lista_campos]
+
+
+def _validar_rangos(campos):
+    for nombre, (minimo, maximo) in _RANGOS.items():
+        valor = campos[nombre]
+        if not math.isfinite(valor) or valor < minimo or (maximo is not None and valor > maximo):
+            limite = f"entre {minimo} y {maximo}" if maximo is not None else f"mayor o igual a {minimo}"
+            raise ValueError(f"'{nombre}' debe estar {limite}; se recibió {valor}.")
+    duracion = campos["duracion_total_meses"]
+    for nombre in _MESES:
+        if not 1 <= campos[nombre] <= duracion:
+            raise ValueError(f"'{nombre}' debe estar entre 1 y la duración total ({duracion} meses); se recibió {campos[nombre]}.")
+    if campos["enganche_pct"] + campos["mensualidades_pct"] > 100:
+        raise ValueError("'enganche_pct' y 'mensualidades_pct' no pueden sumar más de 100.")
+
+
+def preparar(proyecto):
+    """Campos completos de `DatosProyecto` y su hash; ValueError si hay campos desconocidos o inválidos."""
+    if not isinstance(proyecto, dict):
+        raise ValueError("Cada proyecto debe ser un objeto JSON.")
+    desconocidos = set(proyecto) - _CAMPOS
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos en DatosProyecto: {sorted(desconocidos)}")
+    try:
+        campos = asdict(DatosProyecto.desde_estado(proyecto))
+    except (TypeError, ValueError, OverflowError) as error:
+        raise ValueError(f"Valor inválido: {error}") from None
+    _validar_rangos(campos)
+    return campos, hash_entradas({"datos": campos, "tablas": {}})
+
+
+class Evaluador:
+    """Grupo de procesos con caché LRU de resultados por hash de las entradas.
+
+    Los proyectos de una solicitud que no están en caché se envían a los
+    procesos en tareas de hasta `TAMANO_TAREA` proyectos, para no pagar la
+    comunicación entre procesos por cada uno. Con `procesos=0` se evalúa en
+    el hilo de la solicitud (útil para depurar).
+    """
+
+    def __init__(self, procesos=2, capacidad_cache=1_024):
+        self.pool = ProcessPoolExecutor(max_workers=procesos) if procesos > 0 else None
+        self.capacidad_cache = capacidad_cache
+        self._cache = OrderedDict()
+        self._en_curso = {}
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _futuros(self, preparados):
+        # Bajo el candado, cada proyecto es un acierto, una evaluación en curso que se comparte, o una nueva
+        futuros, nuevos = [], []
+        with self._candado:
+            for campos, clave in preparados:
+                if clave in self._cache:
+                    self._cache.move_to_end(clave)
+                    self.aciertos += 1
+                    futuro = Future()
+                    futuro.set_result(self._cache[clave])
+                elif clave in self._en_curso:
+                    self.fallos += 1
+                    futuro = self._en_curso[clave]
+                else:
+                    self.fallos += 1
+                    futuro = self._en_curso[clave] = Future()
+                    nuevos.append((clave, campos, futuro))
+                futuros.append(futuro)
+        for inicio in range(0, len(nuevos), TAMANO_TAREA):
+            tarea = nuevos[inicio:inicio + TAMANO_TAREA]
+            if self.pool is None:
+                try:
+                    self._repartir(tarea, resultados=evaluar_varios([campos for _, campos, _ in tarea]))
+                except Exception as error:  # se entrega a quien espera el resultado
+                    self._repartir(tarea, error=error)
+            else:
+                pool = self.pool
+                try:
+                    enviada = pool.submit(evaluar_varios, [campos for _, campos, _ in tarea])
+                except BrokenProcessPool as error:
+                    # Un proceso de trabajo murió (memoria, señal): quienes esperan reciben el error y el
+                    # grupo se reemplaza para las solicitudes siguientes
+                    self._reemplazar_pool(pool)
+                    self._repartir(tarea, error=error)
+                    continue
+                enviada.add_done_callback(partial(self._terminar, tarea))
+        return futuros
+
+    def _reemplazar_pool(self, roto):
+        with self._candado:
+            if self.pool is roto:
+                self.pool = ProcessPoolExecutor(max_workers=roto._max_workers)
+        roto.shutdown(wait=False, cancel_futures=True)
+
+    def _terminar(self, tarea, enviada):
+        if enviada.exception() is None:
+            self._repartir(tarea, resultados=enviada.result())
+        else:
+            self._repartir(tarea, error=enviada.exception())
+
+    def _repartir(self, tarea, resultados=None, error=None):
+        with self._candado:
+            for i, (clave, _, _) in enumerate(tarea):
+                self._en_curso.pop(clave, None)
+                if error is None:
+                    self._cache[clave] = resultados[i]
+                    self._cache.move_to_end(clave)
+            while len(self._cache) > self.capacidad_cache:
+                self._cache.popitem(last=False)
+        for i, (_, _, futuro) in enumerate(tarea):
+            if error is None:
+                futuro.set_result(resultados[i])
+            else:
+                futuro.set_exception(error)
+
+    def evaluar(self, proyectos, flujo=False):
+        """Resultados de una lista de proyectos, en el mismo orden."""
+        preparados = [preparar(proyecto) for proyecto in proyectos]
+        respuesta = []
+        for (_, clave), futuro in zip(preparados, self._futuros(preparados)):
+            resultado = futuro.result()
+            respuesta.append({"hash": clave, **{k: v for k, v in resultado.items() if flujo or k != "flujo"}})
+        return respuesta
+
+    def estado(self):
+        with self._candado:
+            return {
+                "procesos": self.pool._max_workers if self.pool is not None else 0,
+                "cache": {"entradas": len(self._cache), "capacidad": self.capacidad_cache,
+                          "aciertos": self.aciertos, "fallos": self.fallos},
+                "en_curso": len(self._en_curso),
+            }
+
+    def cerrar(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # conexiones persistentes para el generador de carga
+    disable_nagle_algorithm = True  # encabezados y cuerpo se escriben por separado: sin esto, ~40 ms por respuesta
+    evaluador = None
+
+    def _responder(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        if self.path == "/salud":
+            self._responder(200, {"estado": "ok", **self.evaluador.estado()})
+        else:
+            self._responder(404, {"error": f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        try:
+            largo = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            largo = -1
+        if largo < 0:
+            # Sin un largo válido no se sabe dónde termina el cuerpo: se responde y se cierra la conexión
+            self.close_connection = True
+            self._responder(400, {"error": "Content-Length inválido."})
+            return
+        cuerpo = self.rfile.read(largo)
+        if self.path != "/evaluar":
+            self._responder(404, {"error": f"Ruta desconocida: {self.path}"})
+            return
+        try:
+            solicitud = json.loads(cuerpo or b"{}")
+            if not isinstance(solicitud, dict):
+                raise ValueError("El cuerpo debe ser un objeto JSON.")
+            lote = "proyectos" in solicitud
+            proyectos = solicitud["proyectos"] if lote else [solicitud.get("datos", {})]
+            if not isinstance(proyectos, list) or len(proyectos) > MAX_PROYECTOS_POR_SOLICITUD:
+                raise ValueError(f"'proyectos' debe ser una lista de hasta {MAX_PROYECTOS_POR_SOLICITUD:,} proyectos.")
+            resultados = self.evaluador.evaluar(proyectos, flujo=bool(solicitud.get("flujo", False)))
+        except ValueError as error:  # incluye JSON mal formado
+            self._responder(400, {"error": str(error)})
+            return
+        except Exception as error:  # el cliente recibe JSON aunque falle la evaluación o el grupo de procesos
+            self._responder(500, {"error": f"Error interno: {type(error).__name__}: {error}"})
+            return
+        self._responder(200, {"resultados": resultados} if lote else resultados[0])
+
+    def log_message(self, formato, *args):
+        pass  # sin una línea por solicitud: afectaría la latencia medida
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # con la cola de 5 por defecto se rechazan conexiones de muchos clientes
+
+
+def crear_servidor(host="127.0.0.1", puerto=8765, procesos=2, capacidad_cache=1_024):
+    """Servidor listo para `serve_forever()`; su evaluador queda en `servidor.evaluador`."""
+    evaluador = Evaluador(procesos, capacidad_cache)
+    manejador = type("Manejador", (_Manejador,), {"evaluador": evaluador})
+    try:
+        servidor = _Servidor((host, puerto), manejador)
+    except OSError:
+        evaluador.cerrar()
+        raise
+    servidor.evaluador = evaluador
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m calculos.servicio",
+        description="Servicio HTTP/JSON local que evalúa proyectos inmobiliarios.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección (por defecto: 127.0.0.1, solo local).")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto (por defecto: 8765).")
+    parser.add_argument("--procesos", type=int, default=2, help="Procesos de trabajo; 0 evalúa en el hilo de la solicitud.")
+    parser.add_argument("--cache", type=int, default=1_024, help="Resultados en la caché LRU (por defecto: 1024).")
+    args = parser.parse_args(argv)
+
+    servidor = crear_servidor(args.host, args.puerto, args.procesos, args.cache)
+    print(f"Servicio en http://{args.host}:{servidor.server_port} ({args.procesos} procesos)", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servidor.evaluador.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
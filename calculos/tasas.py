@@ -0,0 +1,112 @@
+"""Trayectorias estocásticas de la tasa de interés del préstamo.
+
+La tasa anual sigue un modelo de Vasicek (reversión a la media): cada mes se
+acerca a la tasa de largo plazo a la velocidad indicada, más un choque
+normal. Las trayectorias se generan para todo el lote a la vez con la
+solución exacta del proceso, sin recorrer los meses en Python, y cada una se
+convierte en un cronograma del préstamo con `cronograma_prestamo`. De cada
+trayectoria solo se conservan el total de intereses y la máxima necesidad de
+capital del proyecto.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from calculos.modelo import COLUMNAS_FLUJO, cronograma_prestamo, flujo_lote
+from calculos.riesgo import PERCENTILES
+
+METRICAS = {
+    "total_intereses": "Total de Intereses",
+    "maxima_necesidad_capital": "Máxima Necesidad de Capital",
+}
+# Los bloques de meses se eligen para que phi^-k no pase de e^50
+_EXPONENTE_MAXIMO = 50.0
+
+
+@dataclass(frozen=True)
+class ModeloVasicek:
+    """Tasa anual (%) con reversión a la media.
+
+    `velocidad` es la fracción anual de la distancia a la tasa de largo plazo
+    que se corrige y `volatilidad` la desviación anual del choque, en puntos
+    porcentuales. La tasa simulada no baja de `piso`.
+    """
+    tasa_inicial: float = 5.0
+    tasa_largo_plazo: float = 6.0
+    velocidad: float = 0.3
+    volatilidad: float = 1.0
+    piso: float = 0.0
+
+    def __post_init__(self):
+        if self.velocidad < 0 or self.volatilidad < 0:
+            raise ValueError("La velocidad de reversión y la volatilidad no pueden ser negativas.")
+
+    def trayectorias(self, rng, n, meses):
+        """Matriz (trayectoria x mes) de tasas anuales; el primer mes usa la tasa inicial."""
+        phi = np.exp(-self.velocidad / 12)
+        if self.velocidad > 0:
+            escala = self.volatilidad * np.sqrt((1 - phi ** 2) / (2 * self.velocidad))
+        else:
+            escala = self.volatilidad * np.sqrt(1 / 12)
+        choques = rng.standard_normal((n, meses)) * escala
+        choques[:, 0] = 0.0
+
+        # x_t = phi * x_{t-1} + e_t tiene solución x_t = phi^t * (x_0 + sum(e_s * phi^-s)):
+        # una suma acumulada por bloque de meses, con el último valor como arranque del siguiente
+        desvio = np.empty((n, meses))
+        largo = meses if self.velocidad == 0 else max(1, int(_EXPONENTE_MAXIMO * 12 / self.velocidad))
+        arranque = np.full(n, (self.tasa_inicial - self.tasa_largo_plazo) / phi)
+        for inicio in range(0, meses, largo):
+            k = np.arange(1, min(largo, meses - inicio) + 1)
+            bloque = choques[:, inicio:inicio + k.size] * phi ** -k
+            desvio[:, inicio:inicio + k.size] = phi ** k * (arranque[:, None] + np.cumsum(bloque, axis=1))
+            arranque = desvio[:, inicio + k.size - 1]
+        return np.maximum(self.tasa_largo_plazo + desvio, self.piso)
+
+
+@dataclass(frozen=True)
+class ResultadoTasas:
+    n_trayectorias: int
+    semilla: int
+    percentiles: dict = field(repr=False)      # métrica -> valores en PERCENTILES
+    media: dict = field(repr=False)
+    histogramas: dict = field(repr=False)      # métrica -> (conteos, bordes)
+    bandas_tasa: dict = field(repr=False)      # percentil -> tasa anual por mes del préstamo
+    muestras: dict = field(default=None, repr=False)
+
+
+def simular_tasas(datos, modelo, n_trayectorias=10_000, semilla=0, tamano_bloque=2_500, bins=60,
+                  conservar_muestras=False):
+    """Simula `n_trayectorias` de la tasa y resume intereses y capital del proyecto.
+
+    El préstamo usa el monto, plazo, gracia y prepagos de `datos`, con la
+    tasa de cada trayectoria en lugar de la tasa fija. El resto del flujo de
+    caja del proyecto no depende de la tasa y se calcula una sola vez.
+    """
+    total_meses = datos.meses_gracia_prestamo + datos.plazo_prestamo_anios * 12
+    _, flujo = flujo_lote(datos)
+    sin_prestamo = np.delete(flujo[0], COLUMNAS_FLUJO.index("Pago Préstamo"), axis=0).sum(axis=0)
+
+    rng = np.random.default_rng(semilla)
+    resultados = {metrica: np.empty(n_trayectorias) for metrica in METRICAS}
+    tasas = np.empty((n_trayectorias, total_meses), dtype=np.float32)
+    for inicio in range(0, n_trayectorias, tamano_bloque):
+        n = min(tamano_bloque, n_trayectorias - inicio)
+        bloque = modelo.trayectorias(rng, n, total_meses)
+        cronograma = cronograma_prestamo(datos, tasas_anuales=bloque)
+        intereses = cronograma["interes"].sum(axis=1) + cronograma["interes_capitalizado"].sum(axis=1)
+        acumulado = np.cumsum(sin_prestamo - cronograma["pagos_proyecto"], axis=1)
+        resultados["total_intereses"][inicio:inicio + n] = intereses
+        resultados["maxima_necesidad_capital"][inicio:inicio + n] = acumulado.min(axis=1) if acumulado.size else 0.0
+        tasas[inicio:inicio + n] = bloque
+
+    bandas = dict(zip(PERCENTILES, np.percentile(tasas, PERCENTILES, axis=0))) if total_meses else {}
+    return ResultadoTasas(
+        n_trayectorias=n_trayectorias,
+        semilla=semilla,
+        percentiles={m: np.percentile(valores, PERCENTILES) for m, valores in resultados.items()},
+        media={m: float(valores.mean()) for m, valores in resultados.items()},
+        histogramas={m: np.histogram(valores, bins=bins) for m, valores in resultados.items()},
+        bandas_tasa=bandas,
+        muestras=resultados if conservar_muestras else None,
+    )
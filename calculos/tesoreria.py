@@ -0,0 +1,141 @@
+"""Tesorería consolidada de una cartera de proyectos.
+
+Cada proyecto aporta su flujo de caja mensual (componente x mes, el de la
+página 05) desplazado a su mes de inicio en un calendario común. La cartera
+guarda el aporte de cada proyecto y la suma de todos; cuando cambian las
+entradas o el mes de inicio de un proyecto se resta su aporte anterior y se
+suma el nuevo, sin volver a calcular ni a sumar los demás. Los aportes se
+guardan en centavos enteros (`calculos.centavos`), así restar y sumar una y
+otra vez no acumula error y el consolidado es siempre la suma exacta de los
+proyectos.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from calculos import centavos
+from calculos.modelo import COLUMNAS_FLUJO
+
+_PAGO_PRESTAMO = COLUMNAS_FLUJO.index("Pago Préstamo")
+
+
+@dataclass(frozen=True)
+class Aporte:
+    huella: object      # identifica las entradas: hash del escenario guardado o los DatosProyecto
+    mes_inicio: int     # mes del calendario común en el que cae el mes 1 del proyecto
+    flujo: np.ndarray   # (componente x mes) en centavos, en el orden de COLUMNAS_FLUJO
+
+    @property
+    def mes_fin(self):
+        return self.mes_inicio + self.flujo.shape[1] - 1
+
+
+@dataclass(frozen=True)
+class Consolidado:
+    meses: np.ndarray               # meses del calendario común, desde 1
+    flujo: np.ndarray               # (componente x mes) en moneda, en el orden de COLUMNAS_FLUJO
+    posicion: np.ndarray            # posición de caja acumulada al cierre de cada mes
+    servicio_deuda: np.ndarray      # pagos del préstamo de todos los proyectos en cada mes, en positivo
+    maxima_necesidad_capital: float
+    mes_maxima_necesidad: int       # 0 si la cartera está vacía
+
+    @property
+    def flujo_neto(self):
+        return self.flujo.sum(axis=0)
+
+
+def _posicion(flujo):
+    return np.cumsum(flujo.sum(axis=0))
+
+
+class CarteraTesoreria:
+    """Aportes de los proyectos sobre un calendario común y su suma, mantenida de forma incremental."""
+
+    def __init__(self):
+        self.aportes = {}  # nombre -> Aporte
+        self._total = np.zeros((len(COLUMNAS_FLUJO), 0), dtype=np.int64)
+        self.flujos_calculados = 0  # veces que se pidió el flujo de un proyecto
+
+    def _sumar(self, aporte, signo):
+        if aporte.mes_fin > self._total.shape[1]:
+            self._total = np.pad(self._total, ((0, 0), (0, aporte.mes_fin - self._total.shape[1])))
+        tramo = self._total[:, aporte.mes_inicio - 1:aporte.mes_fin]
+        (np.add if signo > 0 else np.subtract)(tramo, aporte.flujo, out=tramo)
+
+    def fijar(self, nombre, huella, mes_inicio, calcular_flujo):
+        """Agrega o actualiza un proyecto. Devuelve True si el consolidado cambió.
+
+        `calcular_flujo()` devuelve el flujo del proyecto (componente x mes, en
+        moneda) y solo se llama si la huella es nueva: mover el mes de inicio
+        reutiliza el flujo ya guardado.
+        """
+        if mes_inicio < 1:
+            raise ValueError(f"El mes de inicio de {nombre} debe ser 1 o posterior; se recibió {mes_inicio}.")
+        anterior = self.aportes.get(nombre)
+        if anterior is not None and anterior.huella == huella:
+            if anterior.mes_inicio == mes_inicio:
+                return False
+            flujo = anterior.flujo
+        else:
+            flujo = centavos.redondear_serie(calcular_flujo())
+            flujo.flags.writeable = False
+            self.flujos_calculados += 1
+        if anterior is not None:
+            self._sumar(anterior, -1)
+        self.aportes[nombre] = Aporte(huella, int(mes_inicio), flujo)
+        self._sumar(self.aportes[nombre], 1)
+        return True
+
+    def quitar(self, nombre):
+        """Saca un proyecto de la cartera. Devuelve True si estaba."""
+        aporte = self.aportes.pop(nombre, None)
+        if aporte is None:
+            return False
+        self._sumar(aporte, -1)
+        return True
+
+    def sincronizar(self, proyectos):
+        """Deja en la cartera exactamente `proyectos` (nombre -> (huella, mes_inicio, calcular_flujo)).
+
+        Devuelve los nombres que se agregaron, cambiaron o quitaron; los demás
+        proyectos no se tocan.
+        """
+        quitados = [nombre for nombre in list(self.aportes) if nombre not in proyectos and self.quitar(nombre)]
+        cambiados = [nombre for nombre, (huella, mes_inicio, calcular_flujo) in proyectos.items()
+                     if self.fijar(nombre, huella, mes_inicio, calcular_flujo)]
+        return tuple(cambiados + quitados)
+
+    @property
+    def horizonte(self):
+        """Último mes del calendario común con algún proyecto en curso."""
+        return max((aporte.mes_fin for aporte in self.aportes.values()), default=0)
+
+    def consolidado(self):
+        """Flujo consolidado, posición de caja, servicio de deuda y máxima necesidad de capital."""
+        total = self._total[:, :self.horizonte]
+        posicion = _posicion(total)
+        mes_minimo = int(np.argmin(posicion)) + 1 if posicion.size else 0
+        return Consolidado(
+            meses=np.arange(1, total.shape[1] + 1),
+            flujo=centavos.a_moneda(total),
+            posicion=centavos.a_moneda(posicion),
+            servicio_deuda=centavos.a_moneda(-total[_PAGO_PRESTAMO]),
+            maxima_necesidad_capital=float(centavos.a_moneda(posicion[mes_minimo - 1])) if mes_minimo else 0.0,
+            mes_maxima_necesidad=mes_minimo,
+        )
+
+    def resumen_proyectos(self):
+        """Una fila por proyecto: calendario, máxima necesidad de capital propia y servicio de deuda."""
+        filas = []
+        for nombre, aporte in self.aportes.items():
+            posicion = _posicion(aporte.flujo)
+            minimo = int(np.argmin(posicion)) if posicion.size else 0
+            filas.append({
+                "Proyecto": nombre,
+                "Mes de Inicio": aporte.mes_inicio,
+                "Mes de Fin": aporte.mes_fin,
+                "Máxima Necesidad de Capital": float(centavos.a_moneda(posicion[minimo])) if posicion.size else 0.0,
+                "Mes de Máxima Necesidad": aporte.mes_inicio + minimo,
+                "Servicio de Deuda": float(centavos.a_moneda(-aporte.flujo[_PAGO_PRESTAMO].sum())),
+            })
+        return filas
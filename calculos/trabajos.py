@@ -0,0 +1,174 @@
+"""Trabajos en segundo plano para los análisis pesados de las páginas.
+
+Un trabajo es una función generadora: cada `yield (progreso, parcial)`
+informa el avance (de 0 a 1) y, si `parcial` no es None, un resultado parcial
+para mostrar mientras tanto; lo que devuelve con `return` es el resultado
+final. Los trabajos corren en un grupo de hilos compartido por todas las
+sesiones (NumPy libera el GIL en las operaciones grandes), así que la
+ejecución de la página no espera a que terminen.
+
+Cada trabajo se identifica por una clave derivada de sus entradas: dos
+ejecuciones, dos páginas o dos sesiones que piden lo mismo comparten el
+trabajo. Cada sesión declara qué trabajo espera en cada espacio (p. ej.
+"riesgo/monte_carlo"); cuando cambia de trabajo porque cambiaron sus
+entradas, el anterior se cancela si ninguna otra sesión lo espera. La
+cancelación se atiende entre un `yield` y el siguiente.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PENDIENTE, EN_CURSO, TERMINADO, CANCELADO, ERROR = "pendiente", "en_curso", "terminado", "cancelado", "error"
+CLAVE_ESTADO = "_trabajos_sesion"  # espacio -> clave del trabajo que espera la sesión
+
+
+def clave_trabajo(nombre, *entradas):
+    """Clave de un trabajo a partir de su nombre y sus entradas (dataclasses, números, tuplas...)."""
+    return hashlib.sha256(repr((nombre, entradas)).encode()).hexdigest()
+
+
+class Trabajo:
+    """Estado de un trabajo; lo actualiza el hilo que lo ejecuta y lo leen las páginas."""
+
+    def __init__(self, clave):
+        self.clave = clave
+        self.estado = PENDIENTE
+        self.progreso = 0.0
+        self.parcial = None
+        self.resultado = None
+        self.error = None
+        self.interesados = 0
+        self.inicio = None
+        self.fin = None
+        self._cancelar = threading.Event()
+        self._hecho = threading.Event()
+
+    @property
+    def terminado(self):
+        return self.estado in (TERMINADO, CANCELADO, ERROR)
+
+    @property
+    def segundos(self):
+        if self.inicio is None:
+            return 0.0
+        return (self.fin if self.fin is not None else time.monotonic()) - self.inicio
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    def esperar(self, timeout=None):
+        """Espera a que el trabajo termine; devuelve False si se agota `timeout`."""
+        return self._hecho.wait(timeout)
+
+    def _ejecutar(self, funcion, args, kwargs):
+        try:
+            if self._cancelar.is_set():
+                self.estado = CANCELADO
+                return
+            self.estado = EN_CURSO
+            self.inicio = time.monotonic()
+            etapas = funcion(*args, **kwargs)
+            while True:
+                try:
+                    progreso, parcial = next(etapas)
+                except StopIteration as fin:
+                    self.resultado = fin.value
+                    self.progreso = 1.0
+                    self.estado = TERMINADO
+                    return
+                self.progreso = float(progreso)
+                if parcial is not None:
+                    self.parcial = parcial
+                if self._cancelar.is_set():
+                    etapas.close()
+                    self.estado = CANCELADO
+                    return
+        except Exception as error:  # se muestra en la página que espera el trabajo
+            self.error = error
+            self.estado = ERROR
+        finally:
+            self.fin = time.monotonic()
+            self._hecho.set()
+
+
+class Ejecutor:
+    """Grupo de hilos con los trabajos recientes, indexados por clave.
+
+    Se conservan a lo sumo `capacidad` trabajos terminados (los más
+    antiguos sin sesiones que los esperen se descartan primero).
+    """
+
+    def __init__(self, hilos=2, capacidad=32):
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="trabajo")
+        self._trabajos = OrderedDict()
+        self._candado = threading.Lock()
+        self.capacidad = capacidad
+
+    def enviar(self, clave, funcion, *args, **kwargs):
+        """Trabajo con esa clave: el existente si no fue cancelado ni falló, o uno nuevo."""
+        with self._candado:
+            previo = self._trabajos.get(clave)
+            if previo is not None and previo.estado not in (CANCELADO, ERROR):
+                self._trabajos.move_to_end(clave)
+                return previo
+            trabajo = self._trabajos[clave] = Trabajo(clave)
+            if previo is not None:  # se reintenta: las sesiones que lo esperaban siguen esperándolo
+                trabajo.interesados = previo.interesados
+                self._trabajos.move_to_end(clave)
+            self._recortar()
+        self._pool.submit(trabajo._ejecutar, funcion, args, kwargs)
+        return trabajo
+
+    def _recortar(self):
+        sobrantes = len(self._trabajos) - self.capacidad
+        for clave in [c for c, t in self._trabajos.items() if t.terminado and t.interesados <= 0][:max(sobrantes, 0)]:
+            del self._trabajos[clave]
+
+    def para_sesion(self, estado, espacio, clave, funcion, *args, **kwargs):
+        """`enviar` para una sesión: el trabajo que la sesión esperaba antes en `espacio` se suelta.
+
+        `estado` es `st.session_state` o cualquier mapeo por sesión.
+        """
+        trabajo = self.enviar(clave, funcion, *args, **kwargs)
+        esperados = estado.setdefault(CLAVE_ESTADO, {})
+        if esperados.get(espacio) != clave:
+            self.soltar(estado, espacio)
+            with self._candado:
+                trabajo.interesados += 1
+            esperados[espacio] = clave
+        return trabajo
+
+    def soltar(self, estado, espacio):
+        """La sesión deja de esperar su trabajo de `espacio`; se cancela si nadie más lo espera."""
+        clave = estado.get(CLAVE_ESTADO, {}).pop(espacio, None)
+        with self._candado:
+            trabajo = self._trabajos.get(clave)
+            if trabajo is not None:
+                trabajo.interesados -= 1
+                if trabajo.interesados <= 0 and not trabajo.terminado:
+                    trabajo.cancelar()
+
+    def obtener(self, clave):
+        with self._candado:
+            return self._trabajos.get(clave)
+
+    def resumen(self):
+        """Una fila por trabajo conservado: clave, estado, progreso, sesiones y segundos."""
+        with self._candado:
+            return [{"clave": t.clave[:12], "estado": t.estado, "progreso": t.progreso,
+                     "sesiones": t.interesados, "segundos": t.segundos} for t in self._trabajos.values()]
+
+
+_EJECUTOR = None
+_CANDADO_EJECUTOR = threading.Lock()
+
+
+def ejecutor():
+    """Ejecutor del proceso, compartido por todas las páginas y sesiones."""
+    global _EJECUTOR
+    with _CANDADO_EJECUTOR:
+        if _EJECUTOR is None:
+            _EJECUTOR = Ejecutor()
+        return _EJECUTOR
@@ -0,0 +1,112 @@
+"""Ventas por unidad: curva de absorción, plan de pagos y entregas por fases.
+
+Las viviendas se venden siguiendo una curva de absorción (una curva S
+logística entre el mes de inicio y el de fin de ventas; con pendiente 0 es la
+recta de siempre) y se asignan en orden a las fases de entrega. Cada venta se
+cobra con un enganche al firmar, mensualidades hasta el mes anterior a la
+entrega de su fase y el saldo contra entrega.
+
+Las unidades no se simulan una por una: las vendidas en un mismo mes para
+una misma fase forman una cohorte y todo se calcula con matrices (escenario x
+mes) por fase, así que el costo no depende de la cantidad de viviendas. Las
+funciones reciben los campos por escenario que arma `calculos.modelo`
+(vectores con un valor por escenario o de longitud 1).
+"""
+import numpy as np
+
+CONCEPTOS_COBRO = ("Enganche", "Mensualidades", "Saldo contra Entrega")
+
+
+def ventas_simples(v):
+    """True si todo se cobra al vender, con absorción lineal y una sola entrega: basta repartir el total."""
+    return not (np.any(v['curva_absorcion'] > 0) or np.any(v['enganche_pct'] < 100) or np.any(v['fases_entrega'] > 1))
+
+
+def absorcion(pendiente, avance):
+    """Fracción acumulada de unidades vendidas al `avance` (0 a 1) del periodo de ventas."""
+    pendiente = np.asarray(pendiente, dtype=float)
+    avance = np.clip(avance, 0.0, 1.0)
+    # Logística reescalada para pasar por (0, 0) y (1, 1); con pendiente casi nula se usa la recta
+    inclinada = np.maximum(pendiente, 1e-6)
+    bajo = 1 / (1 + np.exp(inclinada / 2))
+    alto = 1 / (1 + np.exp(-inclinada / 2))
+    curva = (1 / (1 + np.exp(-inclinada * (avance - 0.5))) - bajo) / (alto - bajo)
+    return np.where(pendiente > 1e-6, curva, avance)
+
+
+def unidades_acumuladas(v, horizonte):
+    """Unidades vendidas hasta cada mes 1..horizonte (escenario x mes), según la curva de absorción."""
+    mes = np.arange(1, horizonte + 1)[None, :]
+    duracion = (v['mes_fin_ventas'] - v['mes_inicio_ventas'] + 1)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avance = np.where(duracion > 0, (mes - v['mes_inicio_ventas'][:, None] + 1) / duracion, 0.0)
+    return v['cantidad_viviendas'][:, None] * absorcion(v['curva_absorcion'][:, None], avance)
+
+
+def entregas(v):
+    """Mes de entrega de cada fase (escenario x fase); la última fase se entrega al terminar la construcción.
+
+    Las columnas de fases que un escenario no tiene quedan en 0.
+    """
+    fases = v['fases_entrega'][:, None]
+    k = np.arange(int(v['fases_entrega'].max()))[None, :]
+    mes = v['mes_fin_construccion'][:, None] - (fases - 1 - k) * v['meses_entre_fases'][:, None]
+    return np.where(k < fases, mes, 0)
+
+
+def _fases(v, horizonte):
+    # Unidades vendidas cada mes en cada fase: las primeras N/F unidades son de la fase 1, y así sucesivamente
+    acumuladas = unidades_acumuladas(v, horizonte)
+    anteriores = np.concatenate([np.zeros_like(acumuladas[:, :1]), acumuladas[:, :-1]], axis=1)
+    por_fase = v['cantidad_viviendas'] / v['fases_entrega']
+    for k, entrega in enumerate(entregas(v).T):
+        desde, hasta = (k * por_fase)[:, None], ((k + 1) * por_fase)[:, None]
+        vendidas = np.clip(acumuladas, desde, hasta) - np.clip(anteriores, desde, hasta)
+        yield np.where((k < v['fases_entrega'])[:, None], vendidas, 0.0), entrega
+
+
+def cobros(v, horizonte):
+    """Cobros por ventas de cada mes 1..horizonte (escenario x mes) por concepto de `CONCEPTOS_COBRO`."""
+    mes = np.arange(1, horizonte + 1)[None, :]
+    precio = v['precio_venta_unitario'][:, None]
+    enganche = v['enganche_pct'][:, None] / 100
+    mensualidades = np.minimum(v['mensualidades_pct'][:, None] / 100, 1 - enganche)
+
+    resultado = dict.fromkeys(CONCEPTOS_COBRO, 0.0)
+    for vendidas, entrega in _fases(v, horizonte):
+        importe = vendidas * precio
+        entrega = entrega[:, None]
+        resultado["Enganche"] = resultado["Enganche"] + importe * enganche
+
+        # Una cohorte vendida en el mes t paga una mensualidad en cada mes t+1..entrega-1;
+        # como todas terminan en la entrega, el pago de cada mes es la suma acumulada de las cuotas
+        plazo = entrega - 1 - mes
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cuota = np.where(plazo > 0, importe * mensualidades / plazo, 0.0)
+        cuotas_vigentes = np.concatenate([np.zeros_like(cuota[:, :1]), np.cumsum(cuota, axis=1)[:, :-1]], axis=1)
+        resultado["Mensualidades"] = resultado["Mensualidades"] + np.where(mes < entrega, cuotas_vigentes, 0.0)
+
+        # El saldo (y las mensualidades sin plazo) se cobra en la entrega, o al vender si ya se entregó
+        diferido = importe * (1 - enganche - mensualidades) + np.where(plazo > 0, 0.0, importe * mensualidades)
+        en_entrega = np.where(mes <= entrega, diferido, 0.0).sum(axis=1, keepdims=True)
+        resultado["Saldo contra Entrega"] = (resultado["Saldo contra Entrega"]
+                                             + np.where(mes > entrega, diferido, 0.0) + np.where(mes == entrega, en_entrega, 0.0))
+    return {concepto: np.broadcast_to(valor, np.shape(resultado["Enganche"])) for concepto, valor in resultado.items()}
+
+
+def ingresos_ventas(v, horizonte):
+    """Total cobrado por ventas en cada mes 1..horizonte (escenario x mes)."""
+    return sum(cobros(v, horizonte).values())
+
+
+def tramos_construccion(v):
+    """(inicio, fin, fracción del costo) de la construcción de cada fase.
+
+    Todas las fases empiezan con la construcción y cada una termina en su
+    entrega, con la misma parte del costo; con una sola fase es el tramo de
+    la página de Flujo de Caja. Un tramo vacío (entrega antes del inicio de
+    la construcción) no tiene costo, como los demás intervalos del flujo.
+    """
+    inicio = v['mes_inicio_construccion']
+    for k, entrega in enumerate(entregas(v).T):
+        yield inicio, entrega, np.where(k < v['fases_entrega'], 1 / v['fases_entrega'], 0.0)
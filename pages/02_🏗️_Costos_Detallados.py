@@ -1,63 +1,159 @@
 import streamlit as st
-import pandas as pd
+
+from calculos.costos import COLUMNAS_POR_DEFECTO
+from calculos.grafo import GRAFO_PROYECTO
+from calculos.memoria import como_dataframe, controlar_memoria, guardar_tabla, tabla_por_defecto
+from calculos.perfil import Perfilador, perfilado_activo, resumen_registro
+from calculos.presentacion import FILAS_POR_PAGINA, formato_bytes, numero_paginas
+from calculos.presupuesto import ETIQUETAS, importar_presupuesto
+
+# Tablas que pueden reemplazarse por el resumen de un presupuesto importado
+DESTINOS_PRESUPUESTO = {
+    'costos_urbanizacion_df': "Costos de Urbanización (total del proyecto)",
+    'costos_construccion_df': "Costos de Construcción (por vivienda)",
+}
+COLUMNAS_EDITABLES = {etiqueta: columna for columna, etiqueta in ETIQUETAS.items()}
+
+
+def seccion_presupuesto(clave):
+    """Resumen por categoría y editor paginado de las partidas del presupuesto importado en `clave`.
+
+    Devuelve la tabla resumida, que reemplaza a la tabla editable de la sección.
+    """
+    presupuesto = st.session_state[f'presupuesto_{clave}']
+    # Las ediciones se aplican una sola vez, antes de dibujar, sobre las partidas que mostraba el
+    # editor que las recibió; después el editor cambia de clave y empieza sin ediciones. Así un
+    # cambio de categoría que saca la fila del filtro no corre las ediciones a otras partidas.
+    # Los totales se corrigen con la diferencia de cada fila en lugar de volver a sumar todo.
+    version = st.session_state.get(f'version_editor_{clave}', 0)
+    if f'editor_dibujado_{clave}' in st.session_state:
+        clave_anterior, filas_anteriores = st.session_state[f'editor_dibujado_{clave}']
+        ediciones = st.session_state.get(clave_anterior, {}).get('edited_rows', {})
+        for posicion, cambios in ediciones.items():
+            presupuesto.editar(int(filas_anteriores[int(posicion)]), **{
+                COLUMNAS_EDITABLES[columna]: valor for columna, valor in cambios.items() if columna in COLUMNAS_EDITABLES
+            })
+        if ediciones:
+            version += 1
+            st.session_state[f'version_editor_{clave}'] = version
+
+    filtro1, filtro2, filtro3 = st.columns(3)
+    categoria = filtro1.selectbox("Categoría", [None] + presupuesto.categorias, format_func=lambda c: "Todas" if c is None else c, key=f"categoria_{clave}")
+    fase = filtro2.selectbox("Fase", [None] + presupuesto.fases, format_func=lambda f: "Todas" if f is None else f, key=f"fase_{clave}")
+    filas = presupuesto.filas(categoria, fase)
+    paginas = numero_paginas(len(filas))
+    numero = filtro3.number_input(f"Página (de {paginas})", 1, paginas, 1, key=f"pagina_{clave}_{categoria}_{fase}")
+    visibles = filas[(numero - 1) * FILAS_POR_PAGINA:numero * FILAS_POR_PAGINA]
+
+    clave_editor = f"editor_partidas_{clave}_{version}_{categoria}_{fase}_{numero}"
+    st.data_editor(
+        presupuesto.tabla(visibles), key=clave_editor, disabled=["Importe"], use_container_width=True,
+        column_config={
+            ETIQUETAS['precio_unitario']: st.column_config.NumberColumn(format="dollar"),
+            "Importe": st.column_config.NumberColumn(format="dollar"),
+        },
+    )
+    st.session_state[f'editor_dibujado_{clave}'] = (clave_editor, visibles)
+    st.caption(f"{len(filas):,} de {len(presupuesto):,} partidas; {formato_bytes(presupuesto.bytes_en_memoria())} en memoria.")
+    with st.expander("Totales por categoría y fase"):
+        st.dataframe(presupuesto.tabla_matriz().style.format("${:,.2f}"), use_container_width=True)
+    if st.button("Quitar presupuesto importado", key=f"quitar_{clave}"):
+        # El resumen por categoría queda como tabla editable
+        del st.session_state[f'presupuesto_{clave}']
+        del st.session_state[f'editor_dibujado_{clave}']
+        st.rerun()
+    return presupuesto.tabla_resumen(*COLUMNAS_POR_DEFECTO[clave])
+
 
 st.set_page_config(page_title="Costos Detallados", page_icon="🏗️", layout="wide")
+perfil = Perfilador("02_Costos_Detallados", perfilado_activo(st.session_state))
+perfil.marca("entradas")
 st.title("🏗️ Costos Detallados del Proyecto")
 st.markdown("Desglosa los costos de urbanización (pagos únicos) y los costos de construcción por cada vivienda.")
 
-# --- Inicializar DataFrames en st.session_state si no existen ---
-if 'costos_urbanizacion_df' not in st.session_state:
-    data_urbanizacion = {
-        'Concepto': ['Movimiento de tierras', 'Red de alcantarillado', 'Red eléctrica', 'Pavimentación', 'Estudios y diseños'],
-        'Valor Estimado': [15000.0, 25000.0, 18500.0, 22000.0, 4150.0]
-    }
-    st.session_state.costos_urbanizacion_df = pd.DataFrame(data_urbanizacion)
+# --- Inicializar las tablas en st.session_state si no existen ---
+# Todas las sesiones comparten la tabla por defecto (de solo lectura) hasta que la editan
+for clave in ('costos_urbanizacion_df', 'costos_construccion_df'):
+    if clave not in st.session_state:
+        st.session_state[clave] = tabla_por_defecto(clave)
+
 
-if 'costos_construccion_df' not in st.session_state:
-    data_construccion = {
-        'Componente': ['Cimentación', 'Estructura', 'Mampostería', 'Acabados', 'Instalaciones (agua, luz)'],
-        'Costo por Vivienda': [5500.0, 7000.0, 4200.0, 6500.0, 2650.0]
-    }
-    st.session_state.costos_construccion_df = pd.DataFrame(data_construccion)
+perfil.marca("importar_presupuesto")
+# --- Importar Presupuesto de Obra (CSV o Excel) ---
+with st.expander("📥 Importar presupuesto de obra (CSV o Excel)"):
+    st.markdown(
+        "Columnas reconocidas: **Categoría**, **Cantidad** y **Precio Unitario** (obligatorias), y **Descripción**, "
+        "**Unidad** y **Fase**. La tabla de costos elegida pasa a ser el total de cada categoría."
+    )
+    archivo = st.file_uploader("Archivo del presupuesto", type=["csv", "xlsx", "xls"])
+    destino = st.radio("Reemplazar la tabla de", list(DESTINOS_PRESUPUESTO), format_func=DESTINOS_PRESUPUESTO.get, horizontal=True)
+    if st.button("Importar", disabled=archivo is None):
+        try:
+            st.session_state[f'presupuesto_{destino}'] = importar_presupuesto(archivo, archivo.name)
+        except (ValueError, ImportError) as error:
+            st.error(f"No se pudo importar el presupuesto: {error}")
+        else:
+            for prefijo in ('categoria', 'fase', 'editor_dibujado'):
+                st.session_state.pop(f'{prefijo}_{destino}', None)
 
 
+perfil.marca("tabla_urbanizacion")
 # --- Sección de Costos de Urbanización (Pago Único) ---
 st.subheader("Costos de Urbanización (Total del Proyecto)")
-edited_urbanizacion_df = st.data_editor(
-    st.session_state.costos_urbanizacion_df,
-    num_rows="dynamic",
-    use_container_width=True,
-    key="editor_urbanizacion"
-)
-st.session_state.costos_urbanizacion_df = edited_urbanizacion_df
-total_urbanizacion = st.session_state.costos_urbanizacion_df['Valor Estimado'].sum()
+if 'presupuesto_costos_urbanizacion_df' in st.session_state:
+    edited_urbanizacion_df = seccion_presupuesto('costos_urbanizacion_df')
+else:
+    edited_urbanizacion_df = st.data_editor(
+        como_dataframe(st.session_state.costos_urbanizacion_df),
+        num_rows="dynamic",
+        use_container_width=True,
+        key="editor_urbanizacion"
+    )
+guardar_tabla(st.session_state, 'costos_urbanizacion_df', edited_urbanizacion_df)
 
 
+perfil.marca("tabla_construccion")
 # --- Sección de Costos de Construcción (Por Vivienda) ---
 st.subheader("Costos de Construcción (Por Vivienda)")
-edited_construccion_df = st.data_editor(
-    st.session_state.costos_construccion_df,
-    num_rows="dynamic",
-    use_container_width=True,
-    key="editor_construccion"
-)
-st.session_state.costos_construccion_df = edited_construccion_df
-total_construccion_unitaria = st.session_state.costos_construccion_df['Costo por Vivienda'].sum()
+if 'presupuesto_costos_construccion_df' in st.session_state:
+    edited_construccion_df = seccion_presupuesto('costos_construccion_df')
+else:
+    edited_construccion_df = st.data_editor(
+        como_dataframe(st.session_state.costos_construccion_df),
+        num_rows="dynamic",
+        use_container_width=True,
+        key="editor_construccion"
+    )
+guardar_tabla(st.session_state, 'costos_construccion_df', edited_construccion_df)
+
+perfil.marca("calculo")
+# Los totales se derivan en el grafo compartido y quedan en st.session_state para todas las páginas
+derivados = GRAFO_PROYECTO.actualizar(st.session_state).valores
+total_urbanizacion = derivados['total_urbanizacion']
+total_construccion_unitaria = derivados['total_construccion_unitaria']
 
 
+perfil.marca("resumen")
 # --- Resumen y Almacenamiento en st.session_state ---
 st.subheader("Resumen de Costos")
 
 col1, col2 = st.columns(2)
 col1.metric("Total Costos de Urbanización", f"${total_urbanizacion:,.2f}")
-col2.metric("Costo de Construcción por Vivienda", f",.2f")
-
-# Guardar los totales para que la página principal los use
-st.session_state.total_urbanizacion = total_urbanizacion
-st.session_state.total_construccion_unitaria = total_construccion_unitaria
+col2.metric("Costo de Construcción por Vivienda", f"${total_construccion_unitaria:,.2f}")
 
 st.success("¡Costos actualizados! Los totales se han enviado a la página de 'Resumen del Proyecto'.")
 
 if 'cantidad_viviendas' in st.session_state and st.session_state.cantidad_viviendas > 0:
     costo_total_construccion = total_construccion_unitaria * st.session_state.cantidad_viviendas
-    st.info(f"El costo total de construcción para **{st.session_state.cantidad_viviendas} viviendas** es de **,.2f**.")
+    st.info(f"El costo total de construcción para **{st.session_state.cantidad_viviendas} viviendas** es de **${costo_total_construccion:,.2f}**.")
+
+# --- Perfil de la Ejecución (solo con el perfilado activo) ---
+registro_perfil = perfil.finalizar()
+if registro_perfil:
+    with st.expander(f"⏱️ Perfil de la ejecución: {registro_perfil['total_ms']:,.1f} ms"):
+        st.dataframe(perfil.tabla().style.format("{:,.2f}"), use_container_width=True)
+        st.caption("Percentiles de las últimas ejecuciones de esta página:")
+        st.dataframe(resumen_registro(pagina=perfil.pagina), hide_index=True, use_container_width=True)
+
+# --- Memoria de la Sesión: se mide y, si pasa del límite, se liberan los resultados recalculables ---
+controlar_memoria(st.session_state, perfil.pagina)
@@ -1,44 +1,61 @@
+from dataclasses import replace
+
 import streamlit as st
-import pandas as pd
-import numpy_financial as npf
-import plotly.graph_objects as go
+import numpy as np
+
+from calculos.amortizacion import resumen_cronograma, tabla_cronograma
+from calculos.grafo import GRAFO_PROYECTO
+from calculos.modelo import cronograma_prestamo
+from calculos.memoria import controlar_memoria
+from calculos.perfil import Perfilador, perfilado_activo, resumen_registro
+from calculos.presentacion import (
+    FILAS_POR_PAGINA, anio_de_periodo, bytes_estilo_moneda, bytes_figura, bytes_tabla,
+    formato_bytes, numero_paginas, pagina, resumen_anual,
+)
+from calculos.riesgo import PERCENTILES
+from calculos.tasas import METRICAS, ModeloVasicek, simular_tasas
+
+FORMATO_MONEDA = {
+    "Cuota Mensual": "${:,.2f}",
+    "Prepago": "${:,.2f}",
+    "Capital Pagado": "${:,.2f}",
+    "Interés Pagado": "${:,.2f}",
+    "Interés Capitalizado": "${:,.2f}",
+    "Saldo Restante": "${:,.2f}"
+}
+FORMATO_TABLA = {**FORMATO_MONEDA, "Tasa Anual (%)": "{:.2f}%"}
+# El formato de column_config se aplica en el navegador: no viaja un texto formateado por celda
+COLUMNAS_MONEDA = {columna: st.column_config.NumberColumn(columna, format="dollar") for columna in FORMATO_MONEDA}
+COLUMNAS_MONEDA["Tasa Anual (%)"] = st.column_config.NumberColumn("Tasa Anual (%)", format="%.2f%%")
+# Columnas que solo se muestran si el préstamo tiene prepagos o gracia capitalizada
+COLUMNAS_OPCIONALES = ("Prepago", "Interés Capitalizado")
+
+TASA_FIJA = "Fija"
+TASA_MIXTA = "Mixta"
+TASA_ESTOCASTICA = "Estocástica"
+
+
+def figura_composicion(x, capital, interes, titulo, eje_x, prepago=None):
+    import plotly.graph_objects as go  # solo se importa si se dibuja el gráfico
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=x, y=capital, name='Capital', marker_color='blue'))
+    fig.add_trace(go.Bar(x=x, y=interes, name='Interés', marker_color='red'))
+    if prepago is not None:
+        fig.add_trace(go.Bar(x=x, y=prepago, name='Prepago', marker_color='green'))
+    fig.update_layout(barmode='stack', title_text=titulo, xaxis_title=eje_x, yaxis_title='Monto Pagado ($)')
+    return fig
 
+
+@st.cache_data(max_entries=8, show_spinner="Simulando trayectorias de la tasa...")
+def simular(datos, modelo, n_trayectorias, semilla):
+    return simular_tasas(datos, modelo, n_trayectorias=n_trayectorias, semilla=semilla)
+
+
+perfil = Perfilador("04_Simulador_de_Prestamo", perfilado_activo(st.session_state))
+perfil.marca("entradas")
 st.title("🏦 Simulador de Préstamo Bancario")
 st.markdown("Calcula la cuota mensual y visualiza la tabla de amortización completa de tu financiamiento.")
 
-# --- Función para calcular la tabla de amortización ---
-def calcular_amortizacion(monto, tasa_anual, anios):
-    if tasa_anual > 0:
-        tasa_mensual = (tasa_anual / 100) / 12
-        n_pagos = anios * 12
-        pago_mensual = -npf.pmt(tasa_mensual, n_pagos, monto)
-    else: # Si la tasa es 0, el cálculo es más simple
-        tasa_mensual = 0
-        n_pagos = anios * 12
-        pago_mensual = monto / n_pagos if n_pagos > 0 else 0
-
-    saldo_restante = monto
-    data = []
-    for i in range(1, n_pagos + 1):
-        interes_pagado = saldo_restante * tasa_mensual
-        capital_pagado = pago_mensual - interes_pagado
-        saldo_restante -= capital_pagado
-        
-        # Asegurarse de que el saldo final sea exactamente 0
-        if i == n_pagos:
-            capital_pagado += saldo_restante
-            saldo_restante = 0
-
-        data.append({
-            "Mes": i,
-            "Cuota Mensual": pago_mensual,
-            "Capital Pagado": capital_pagado,
-            "Interés Pagado": interes_pagado,
-            "Saldo Restante": saldo_restante
-        })
-    
-    return pd.DataFrame(data), pago_mensual
-
 # --- Entradas del Simulador ---
 st.header("Parámetros del Préstamo")
 
@@ -55,52 +72,177 @@ with col2:
 with col3:
     plazo_prestamo_anios = st.number_input("Plazo del Préstamo (años)", min_value=1, value=default_anios, step=1)
 
+# Las condiciones del préstamo del proyecto (página de Flujo de Caja) son los valores iniciales
+col4, col5, col6 = st.columns(3)
+with col4:
+    meses_gracia = st.number_input("Meses de Gracia", min_value=0, max_value=120, value=int(st.session_state.get('meses_gracia_prestamo', 0)), step=1)
+with col5:
+    prepago_ventas_pct = st.number_input("Prepago con las Ventas (%)", min_value=0.0, max_value=100.0, value=float(st.session_state.get('prepago_ventas_pct', 0.0)), step=5.0, help="Porcentaje de lo cobrado por ventas cada mes que se abona al capital, según el calendario de ventas de la página de Flujo de Caja.")
+with col6:
+    st.write("")
+    capitalizar = st.checkbox("Capitalizar intereses durante la gracia", value=st.session_state.get('capitalizar_intereses_gracia', False))
+
+tipo_tasa = st.radio("Tipo de Tasa", [TASA_FIJA, TASA_MIXTA, TASA_ESTOCASTICA], horizontal=True,
+                     help="Mixta: la tasa cambia una vez, después de un periodo inicial. Estocástica: miles de trayectorias de una tasa variable con reversión a la media.")
+total_meses = int(meses_gracia + plazo_prestamo_anios * 12)
+if tipo_tasa == TASA_MIXTA:
+    mix1, mix2 = st.columns(2)
+    meses_tasa_inicial = mix1.number_input("Meses con la Tasa Inicial", min_value=1, max_value=total_meses, value=min(60, total_meses), step=1)
+    tasa_posterior = mix2.number_input("Tasa Posterior (%)", min_value=0.0, value=tasa_interes_anual + 2.0, step=0.1)
+elif tipo_tasa == TASA_ESTOCASTICA:
+    est1, est2, est3 = st.columns(3)
+    tasa_largo_plazo = est1.number_input("Tasa de Largo Plazo (%)", min_value=0.0, value=tasa_interes_anual + 1.0, step=0.1, help="Nivel al que tiende la tasa; la tasa de interés de arriba es la tasa actual.")
+    velocidad = est2.number_input("Velocidad de Reversión (por año)", min_value=0.0, value=0.3, step=0.05, help="Fracción anual de la distancia a la tasa de largo plazo que se corrige.")
+    volatilidad = est3.number_input("Volatilidad Anual (puntos %)", min_value=0.0, value=1.0, step=0.1)
+    est4, est5 = st.columns(2)
+    n_trayectorias = est4.select_slider("Número de Trayectorias", [1_000, 10_000, 50_000], 10_000)
+    semilla = est5.number_input("Semilla", min_value=0, value=42, step=1, help="La misma semilla reproduce exactamente los mismos resultados.")
+
+perfil.marca("calculo")
 # --- Cálculos y Visualización ---
 if monto_prestamo > 0 and plazo_prestamo_anios > 0:
-    tabla_amortizacion_df, pago_mensual = calcular_amortizacion(monto_prestamo, tasa_interes_anual, plazo_prestamo_anios)
-    
-    total_pagado = tabla_amortizacion_df['Cuota Mensual'].sum()
-    total_intereses = tabla_amortizacion_df['Interés Pagado'].sum()
+    # El préstamo del simulador sobre el calendario del proyecto (para alinear los prepagos con las ventas)
+    datos = GRAFO_PROYECTO.actualizar(st.session_state).valores['datos']
+    datos_prestamo = replace(
+        datos, monto_prestamo=float(monto_prestamo), tasa_interes_anual=float(tasa_interes_anual),
+        plazo_prestamo_anios=int(plazo_prestamo_anios), meses_gracia_prestamo=int(meses_gracia),
+        capitalizar_intereses_gracia=bool(capitalizar), prepago_ventas_pct=float(prepago_ventas_pct),
+    )
+    tasas = None
+    if tipo_tasa == TASA_MIXTA:
+        tasas = np.where(np.arange(total_meses) < meses_tasa_inicial, tasa_interes_anual, tasa_posterior)[None, :]
+    elif tipo_tasa == TASA_ESTOCASTICA:
+        perfil.marca("simulacion_tasas")
+        modelo_tasa = ModeloVasicek(tasa_interes_anual, tasa_largo_plazo, velocidad, volatilidad)
+        simulacion = simular(datos_prestamo, modelo_tasa, n_trayectorias, int(semilla))
+        # El cronograma detallado usa la trayectoria mediana de la tasa
+        tasas = simulacion.bandas_tasa[50][None, :]
+        perfil.marca("calculo")
+
+    cronograma = cronograma_prestamo(datos_prestamo, tasas_anuales=tasas)
+    totales = resumen_cronograma(cronograma)
+    pago_mensual = float(cronograma['cuota'][0, meses_gracia]) if meses_gracia < total_meses else 0.0
+    total_pagado = float(totales['total_pagado'][0])
+    total_intereses = float(totales['total_intereses'][0])
 
     st.header("Resumen del Financiamiento")
     res1, res2, res3 = st.columns(3)
-    res1.metric("Cuota Mensual", f"${pago_mensual:,.2f}")
+    res1.metric("Cuota Mensual", f"${pago_mensual:,.2f}", help="Primera cuota después de la gracia; cambia si cambia la tasa o hay prepagos.")
     res2.metric("Total Pagado", f"${total_pagado:,.2f}")
-    res3.metric("Total Intereses Pagados", f"${total_intereses:,.2f}", help="Este es el costo total del financiamiento.")
+    res3.metric("Total Intereses Pagados", f"${total_intereses:,.2f}", help="Este es el costo total del financiamiento, con los intereses capitalizados.")
+    if prepago_ventas_pct > 0:
+        st.caption(f"Prepagos con las ventas del proyecto: ${float(totales['total_prepagos'][0]):,.2f}.")
 
-    # --- Gráfico de Amortización ---
-    st.subheader("Composición de Pagos a lo Largo del Tiempo")
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=tabla_amortizacion_df['Mes'],
-        y=tabla_amortizacion_df['Capital Pagado'],
-        name='Capital',
-        marker_color='blue'
-    ))
-    fig.add_trace(go.Bar(
-        x=tabla_amortizacion_df['Mes'],
-        y=tabla_amortizacion_df['Interés Pagado'],
-        name='Interés',
-        marker_color='red'
-    ))
-
-    fig.update_layout(
-        barmode='stack',
-        title_text='Distribución de Capital e Interés por Mes',
-        xaxis_title='Mes',
-        yaxis_title='Monto Pagado ($)'
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    solo_indicadores = st.session_state.get('solo_indicadores', False)
+    if tipo_tasa == TASA_ESTOCASTICA:
+        perfil.marca("resultados_tasas")
+        st.header("Simulación de la Tasa Variable")
+        st.write(f"**{simulacion.n_trayectorias:,}** trayectorias de la tasa (semilla {simulacion.semilla}); "
+                 "la máxima necesidad de capital es la del proyecto con cada trayectoria.")
+        p5, p95 = PERCENTILES.index(5), PERCENTILES.index(95)
+        sim1, sim2, sim3, sim4 = st.columns(4)
+        sim1.metric("Intereses Medios", f"${simulacion.media['total_intereses']:,.2f}", delta=f"${simulacion.media['total_intereses'] - total_intereses:,.2f} vs. mediana", delta_color="inverse")
+        sim2.metric("Intereses P95", f"${simulacion.percentiles['total_intereses'][p95]:,.2f}", help="Solo el 5% de las trayectorias paga más intereses.")
+        sim3.metric("Necesidad de Capital Media", f"${simulacion.media['maxima_necesidad_capital']:,.2f}")
+        sim4.metric("Necesidad de Capital P5", f"${simulacion.percentiles['maxima_necesidad_capital'][p5]:,.2f}", help="Solo el 5% de las trayectorias necesita más capital.")
+
+        if not solo_indicadores:
+            import plotly.graph_objects as go
+
+            meses = np.arange(1, total_meses + 1)
+            bandas = simulacion.bandas_tasa
+            fig_tasas = go.Figure()
+            for bajo, alto, opacidad in ((5, 95, 0.15), (25, 75, 0.3)):
+                fig_tasas.add_trace(go.Scatter(x=meses, y=bandas[alto], mode='lines', line_width=0, showlegend=False))
+                fig_tasas.add_trace(go.Scatter(x=meses, y=bandas[bajo], mode='lines', line_width=0, fill='tonexty',
+                                               fillcolor=f'rgba(0, 0, 255, {opacidad})', name=f'P{bajo}–P{alto}'))
+            fig_tasas.add_trace(go.Scatter(x=meses, y=bandas[50], mode='lines', line_color='blue', name='Mediana'))
+            fig_tasas.update_layout(title_text='Bandas de la Tasa Anual Simulada', xaxis_title='Mes del Préstamo', yaxis_title='Tasa Anual (%)')
+            st.plotly_chart(fig_tasas, use_container_width=True)
+
+            hist1, hist2 = st.columns(2)
+            for columna, (metrica, etiqueta) in zip((hist1, hist2), METRICAS.items()):
+                conteos, bordes = simulacion.histogramas[metrica]
+                fig_hist = go.Figure(go.Bar(x=(bordes[:-1] + bordes[1:]) / 2, y=conteos, width=bordes[1] - bordes[0]))
+                fig_hist.update_layout(title_text=f'Distribución de {etiqueta}', xaxis_title=f'{etiqueta} ($)', yaxis_title='Trayectorias')
+                columna.plotly_chart(fig_hist, use_container_width=True)
+
+    if solo_indicadores:
+        st.caption("Modo solo indicadores: los gráficos y tablas están ocultos. Se desactiva en la página de Resumen.")
+    else:
+        perfil.marca("graficos")
+        # La tabla (un DataFrame de pandas) solo se construye si se va a mostrar
+        tabla_amortizacion_df = tabla_cronograma(cronograma)
+        vacias = [c for c in COLUMNAS_OPCIONALES if not tabla_amortizacion_df[c].any()]
+        tabla_amortizacion_df = tabla_amortizacion_df.drop(columns=vacias)
+        if tipo_tasa == TASA_ESTOCASTICA:
+            st.caption("El cronograma y los gráficos siguientes usan la trayectoria mediana de la tasa.")
+        n_meses = len(tabla_amortizacion_df)
+        vista_escalable = st.toggle(
+            "Vista escalable (resumen anual y tabla paginada)", value=n_meses > FILAS_POR_PAGINA,
+            help="Para plazos largos: muestra totales por año con detalle mensual a pedido, en lugar de enviar todos los meses al navegador."
+        )
+        fig_mensual = figura_composicion(
+            tabla_amortizacion_df['Mes'], tabla_amortizacion_df['Capital Pagado'], tabla_amortizacion_df['Interés Pagado'],
+            'Distribución de Capital e Interés por Mes', 'Mes', tabla_amortizacion_df.get('Prepago')
+        )
 
-    # --- Tabla de Amortización Detallada ---
-    st.subheader("Tabla de Amortización Completa")
-    st.dataframe(tabla_amortizacion_df.style.format({
-        "Cuota Mensual": "${:,.2f}",
-        "Capital Pagado": "${:,.2f}",
-        "Interés Pagado": "${:,.2f}",
-        "Saldo Restante": "${:,.2f}"
-    }), use_container_width=True)
+        if not vista_escalable:
+            # --- Gráfico de Amortización ---
+            st.subheader("Composición de Pagos a lo Largo del Tiempo")
+            st.plotly_chart(fig_mensual, use_container_width=True)
+
+            perfil.marca("tabla")
+            # --- Tabla de Amortización Detallada ---
+            st.subheader("Tabla de Amortización Completa")
+            st.dataframe(tabla_amortizacion_df.style.format(FORMATO_TABLA), use_container_width=True)
+
+        else:
+            # La tasa y el saldo de cada año son los del último mes
+            resumen_df = resumen_anual(
+                tabla_amortizacion_df.drop(columns='Mes'), tabla_amortizacion_df['Mes'], saldos=('Saldo Restante', 'Tasa Anual (%)')
+            ).rename(columns={'Cuota Mensual': 'Cuotas del Año'})
+
+            st.subheader("Composición de Pagos por Año")
+            fig_anual = figura_composicion(
+                resumen_df.index, resumen_df['Capital Pagado'], resumen_df['Interés Pagado'],
+                'Distribución de Capital e Interés por Año', 'Año', resumen_df.get('Prepago')
+            )
+            st.plotly_chart(fig_anual, use_container_width=True)
+
+            perfil.marca("tabla")
+            st.subheader("Resumen Anual de la Amortización")
+            columnas_resumen = {**COLUMNAS_MONEDA, 'Cuotas del Año': st.column_config.NumberColumn('Cuotas del Año', format="dollar")}
+            st.dataframe(resumen_df, column_config=columnas_resumen, use_container_width=True)
+
+            st.subheader("Detalle Mensual")
+            det1, det2 = st.columns(2)
+            anio = det1.selectbox("Año", resumen_df.index)
+            detalle_df = tabla_amortizacion_df[anio_de_periodo(tabla_amortizacion_df['Mes']) == anio]
+            paginas = numero_paginas(len(detalle_df))
+            numero = det2.number_input(f"Página (de {paginas})", 1, paginas, 1) if paginas > 1 else 1
+            detalle_df = pagina(detalle_df, numero)
+            st.dataframe(detalle_df, column_config=COLUMNAS_MONEDA, hide_index=True, use_container_width=True)
+
+            perfil.marca("estimacion_carga")
+            carga_completa = (bytes_tabla(tabla_amortizacion_df) + bytes_estilo_moneda(tabla_amortizacion_df.drop(columns='Mes'))
+                              + bytes_figura(fig_mensual))
+            carga_enviada = bytes_tabla(resumen_df) + bytes_tabla(detalle_df) + bytes_figura(fig_anual)
+            st.caption(
+                f"Carga enviada: {formato_bytes(carga_enviada)} en lugar de {formato_bytes(carga_completa)} "
+                f"con la tabla completa ({n_meses} meses); se evitan {formato_bytes(max(carga_completa - carga_enviada, 0))}."
+            )
 
 else:
     st.info("Introduce los detalles del préstamo para ver el análisis.")
 
+# --- Perfil de la Ejecución (solo con el perfilado activo) ---
+registro_perfil = perfil.finalizar()
+if registro_perfil:
+    with st.expander(f"⏱️ Perfil de la ejecución: {registro_perfil['total_ms']:,.1f} ms"):
+        st.dataframe(perfil.tabla().style.format("{:,.2f}"), use_container_width=True)
+        st.caption("Percentiles de las últimas ejecuciones de esta página:")
+        st.dataframe(resumen_registro(pagina=perfil.pagina), hide_index=True, use_container_width=True)
+
+# --- Memoria de la Sesión: se mide y, si pasa del límite, se liberan los resultados recalculables ---
+controlar_memoria(st.session_state, perfil.pagina)
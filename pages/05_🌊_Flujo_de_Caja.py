@@ -1,115 +1,259 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import numpy_financial as npf
-import plotly.express as px
+
+from calculos.flujo import PERIODOS_POR_MES
+from calculos.metricas import tasa_periodica, van
+from calculos.grafo import GRAFO_PROYECTO
+from calculos.modelo import calendario_ventas, flujo_lote, tabla_flujo
+from calculos.memoria import controlar_memoria
+from calculos.optimizacion import HORIZONTE_MAXIMO, OBJETIVOS, VARIABLES_CRONOGRAMA, Restricciones, optimizar_cronograma
+from calculos.perfil import Perfilador, perfilado_activo, resumen_registro
+from calculos.presentacion import (
+    FILAS_POR_PAGINA, UMBRAL_PUNTOS, anio_de_periodo, bytes_estilo_moneda, bytes_figura, bytes_tabla,
+    formato_bytes, indices_reducidos, numero_paginas, pagina, resumen_anual,
+)
 
 st.set_page_config(layout="wide")
+perfil = Perfilador("05_Flujo_de_Caja", perfilado_activo(st.session_state))
+perfil.marca("entradas")
 st.title("🌊 Flujo de Caja Proyectado")
 st.markdown("Visualiza las entradas y salidas de dinero a lo largo del tiempo para entender la viabilidad y las necesidades de capital de tu proyecto.")
 
-# --- Obtener todos los datos de st.session_state ---
-cantidad_viviendas = st.session_state.get('cantidad_viviendas', 10)
-precio_venta_unitario = st.session_state.get('precio_venta_unitario', 85000.0)
-costo_terreno = st.session_state.get('costo_terreno', 100000.0)
-costo_urbanizacion = st.session_state.get('total_urbanizacion', 84650.0)
-costo_total_construccion = st.session_state.get('total_construccion_unitaria', 25850.0) * cantidad_viviendas
-gastos_admin_permisos = st.session_state.get('total_gastos_admin_permisos', 90100.0)
-monto_prestamo = st.session_state.get('monto_prestamo', 200000.0)
-tasa_interes_anual = st.session_state.get('tasa_interes_anual', 5.0)
-plazo_prestamo_anios = st.session_state.get('plazo_prestamo_anios', 15)
-
 
 # --- Parámetros del Cronograma (Inputs del Usuario) ---
 st.sidebar.header("Cronograma del Proyecto (en meses)")
-duracion_total_meses = st.sidebar.slider("Duración Total del Proyecto (Meses)", 12, 60, 36)
+st.session_state.duracion_total_meses = st.sidebar.slider("Duración Total del Proyecto (Meses)", 12, 360, st.session_state.get('duracion_total_meses', 36), help="Hasta 30 años.")
+duracion_total_meses = st.session_state.duracion_total_meses
+
+# Se guardan en st.session_state para que el Dashboard use el mismo cronograma
+def mes_input(etiqueta, clave, defecto, **kwargs):
+    valor = min(st.session_state.get(clave, defecto), duracion_total_meses)
+    st.session_state[clave] = st.sidebar.number_input(etiqueta, 1, duracion_total_meses, valor, **kwargs)
+    return st.session_state[clave]
+
 
 st.sidebar.subheader("Fase de Inversión y Construcción")
-mes_compra_terreno = st.sidebar.number_input("Mes de Compra del Terreno", 1, duracion_total_meses, 1)
-mes_inicio_urbanizacion = st.sidebar.number_input("Mes Inicio Urbanización", 1, duracion_total_meses, 2)
-mes_fin_urbanizacion = st.sidebar.number_input("Mes Fin Urbanización", 1, duracion_total_meses, 6)
-mes_inicio_construccion = st.sidebar.number_input("Mes Inicio Construcción", 1, duracion_total_meses, 7)
-mes_fin_construccion = st.sidebar.number_input("Mes Fin Construcción", 1, duracion_total_meses, 24)
-mes_gastos_admin = st.sidebar.number_input("Mes de Gastos Admin/Permisos", 1, duracion_total_meses, 3)
+mes_input("Mes de Compra del Terreno", 'mes_compra_terreno', 1)
+mes_input("Mes Inicio Urbanización", 'mes_inicio_urbanizacion', 2)
+mes_input("Mes Fin Urbanización", 'mes_fin_urbanizacion', 6)
+mes_input("Mes Inicio Construcción", 'mes_inicio_construccion', 7)
+mes_input("Mes Fin Construcción", 'mes_fin_construccion', 24)
+mes_input("Mes de Gastos Admin/Permisos", 'mes_gastos_admin', 3)
 
 st.sidebar.subheader("Fase de Ingresos y Financiamiento")
-mes_recibo_prestamo = st.sidebar.number_input("Mes de Recepción del Préstamo", 1, duracion_total_meses, 2)
-mes_inicio_ventas = st.sidebar.number_input("Mes Inicio de Ventas", 1, duracion_total_meses, 18)
-mes_fin_ventas = st.sidebar.number_input("Mes Fin de Ventas", 1, duracion_total_meses, 36)
-mes_inicio_pago_prestamo = st.sidebar.number_input("Mes Inicio Pago Préstamo", 1, duracion_total_meses, 3, help="Generalmente es un mes después de recibir el préstamo.")
-
-# --- Construcción del DataFrame del Flujo de Caja ---
-meses = np.arange(1, duracion_total_meses + 1)
-flujo_df = pd.DataFrame(index=meses)
-
-# Inicializar columnas en cero
-flujo_df['Ingresos por Ventas'] = 0.0
-flujo_df['Ingreso Préstamo'] = 0.0
-flujo_df['Costo Terreno'] = 0.0
-flujo_df['Costo Urbanización'] = 0.0
-flujo_df['Costo Construcción'] = 0.0
-flujo_df['Gastos Admin/Permisos'] = 0.0
-flujo_df['Pago Préstamo'] = 0.0
-
-# --- Distribuir los flujos en el tiempo ---
-
-# ENTRADAS
-flujo_df.loc[mes_recibo_prestamo, 'Ingreso Préstamo'] = monto_prestamo
-
-duracion_ventas = mes_fin_ventas - mes_inicio_ventas + 1
-if duracion_ventas > 0:
-    ingreso_mensual_ventas = (precio_venta_unitario * cantidad_viviendas) / duracion_ventas
-    flujo_df.loc[mes_inicio_ventas:mes_fin_ventas, 'Ingresos por Ventas'] = ingreso_mensual_ventas
-
-# SALIDAS
-flujo_df.loc[mes_compra_terreno, 'Costo Terreno'] = -costo_terreno
-flujo_df.loc[mes_gastos_admin, 'Gastos Admin/Permisos'] = -gastos_admin_permisos
-
-duracion_urbanizacion = mes_fin_urbanizacion - mes_inicio_urbanizacion + 1
-if duracion_urbanizacion > 0:
-    costo_mensual_urbanizacion = costo_urbanizacion / duracion_urbanizacion
-    flujo_df.loc[mes_inicio_urbanizacion:mes_fin_urbanizacion, 'Costo Urbanización'] = -costo_mensual_urbanizacion
-
-duracion_construccion = mes_fin_construccion - mes_inicio_construccion + 1
-if duracion_construccion > 0:
-    costo_mensual_construccion = costo_total_construccion / duracion_construccion
-    flujo_df.loc[mes_inicio_construccion:mes_fin_construccion, 'Costo Construcción'] = -costo_mensual_construccion
-
-# PAGO DEL PRÉSTAMO
-if monto_prestamo > 0 and tasa_interes_anual > 0:
-    tasa_mensual = (tasa_interes_anual / 100) / 12
-    n_pagos = plazo_prestamo_anios * 12
-    pago_mensual = -npf.pmt(tasa_mensual, n_pagos, monto_prestamo)
-    
-    # Aplicar el pago desde el mes de inicio hasta el final del proyecto o del préstamo
-    mes_fin_pago_prestamo = min(duracion_total_meses, mes_inicio_pago_prestamo + n_pagos -1)
-    flujo_df.loc[mes_inicio_pago_prestamo:mes_fin_pago_prestamo, 'Pago Préstamo'] = -pago_mensual
-
-
-# --- Calcular Flujo Neto y Acumulado ---
-flujo_df['Flujo Neto Mensual'] = flujo_df.sum(axis=1)
-flujo_df['Flujo Acumulado'] = flujo_df['Flujo Neto Mensual'].cumsum()
-
-
-# --- Visualización ---
-st.header("Flujo de Caja Acumulado")
-st.markdown("Este gráfico es crucial. Muestra cuánto dinero necesitas en total en cada punto del proyecto. El punto más bajo representa tu **máxima necesidad de financiamiento**.")
-
-fig = px.area(
-    flujo_df,
-    x=flujo_df.index,
-    y='Flujo Acumulado',
-    title='Flujo de Caja Acumulado a lo Largo del Proyecto'
+mes_input("Mes de Recepción del Préstamo", 'mes_recibo_prestamo', 2)
+mes_input("Mes Inicio de Ventas", 'mes_inicio_ventas', 18)
+mes_input("Mes Fin de Ventas", 'mes_fin_ventas', 36)
+mes_input("Mes Inicio Pago Préstamo", 'mes_inicio_pago_prestamo', 3, help="Generalmente es un mes después de recibir el préstamo.")
+
+st.sidebar.subheader("Condiciones del Préstamo")
+st.session_state.meses_gracia_prestamo = st.sidebar.number_input("Meses de Gracia", min_value=0, max_value=120, value=int(st.session_state.get('meses_gracia_prestamo', 0)), step=1, help="Meses desde el inicio de pago en los que no se amortiza capital, p. ej. durante la construcción.")
+st.session_state.capitalizar_intereses_gracia = st.sidebar.checkbox("Capitalizar intereses durante la gracia", value=st.session_state.get('capitalizar_intereses_gracia', False), help="Sin pagos durante la gracia: los intereses se suman al saldo. Si no, en la gracia se pagan solo los intereses.")
+st.session_state.prepago_ventas_pct = st.sidebar.number_input("Prepago con las Ventas (%)", min_value=0.0, max_value=100.0, value=float(st.session_state.get('prepago_ventas_pct', 0.0)), step=5.0, help="Porcentaje de lo cobrado por ventas cada mes que se abona al capital del préstamo; la cuota se recalcula sobre el saldo restante.")
+
+st.sidebar.subheader("Ventas y Entregas")
+st.session_state.curva_absorcion = st.sidebar.slider("Curva de Absorción", 0.0, 12.0, float(st.session_state.get('curva_absorcion', 0.0)), step=0.5, help="0 reparte las ventas por igual entre el inicio y el fin de ventas; valores mayores siguen una curva S: pocas ventas al principio y al final, más a mitad del periodo.")
+st.session_state.enganche_pct = st.sidebar.number_input("Enganche (%)", min_value=0.0, max_value=100.0, value=float(st.session_state.get('enganche_pct', 100.0)), step=5.0, help="Parte del precio que se cobra al vender. Con 100% cada venta se cobra completa en su mes.")
+st.session_state.mensualidades_pct = st.sidebar.number_input("Mensualidades (%)", min_value=0.0, max_value=100.0 - st.session_state.enganche_pct, value=min(float(st.session_state.get('mensualidades_pct', 0.0)), 100.0 - st.session_state.enganche_pct), step=5.0, help="Parte del precio que se paga en mensualidades iguales desde el mes siguiente a la venta hasta el anterior a la entrega. El resto se cobra contra entrega.")
+st.session_state.fases_entrega = st.sidebar.number_input("Fases de Entrega", min_value=1, max_value=24, value=int(st.session_state.get('fases_entrega', 1)), step=1, help="Las viviendas se reparten por igual entre las fases y se asignan en el orden en que se venden. La última fase se entrega al terminar la construcción.")
+st.session_state.meses_entre_fases = st.sidebar.number_input("Meses entre Fases", min_value=1, max_value=60, value=int(st.session_state.get('meses_entre_fases', 6)), step=1, disabled=st.session_state.fases_entrega == 1, help="Cada fase se construye desde el inicio de la construcción hasta su entrega.")
+
+st.sidebar.subheader("Indicadores de Rentabilidad")
+st.session_state.tasa_descuento_anual = st.sidebar.number_input("Tasa de Descuento Anual (%)", min_value=0.0, max_value=100.0, value=float(st.session_state.get('tasa_descuento_anual', 12.0)), step=0.5, help="Costo de oportunidad del capital para calcular el VAN.")
+
+granularidad = st.sidebar.radio("Granularidad", ["mensual", "diaria"], format_func=str.capitalize, horizontal=True, help="La vista diaria usa meses comerciales de 30 días.")
+periodos_por_anio = 12 if granularidad == "mensual" else 360
+
+perfil.marca("calculo")
+# --- Construcción del Flujo de Caja (modelo compartido) ---
+recalculo = GRAFO_PROYECTO.actualizar(st.session_state)
+datos = recalculo.valores['datos']
+resultados = recalculo.valores['resultados']
+unidad = 'Mes' if granularidad == "mensual" else 'Día'
+solo_indicadores = st.session_state.get('solo_indicadores', False)
+
+vista_escalable = st.sidebar.toggle(
+    "Vista escalable", value=datos.duracion_total_meses * PERIODOS_POR_MES[granularidad] > FILAS_POR_PAGINA,
+    disabled=solo_indicadores,
+    help="Para horizontes largos o detalle diario: gráfico WebGL con la serie reducida y tabla resumida por año y paginada."
 )
-fig.update_layout(xaxis_title='Mes del Proyecto', yaxis_title='Capital Acumulado ($)')
-st.plotly_chart(fig, use_container_width=True)
 
-punto_minimo = flujo_df['Flujo Acumulado'].min()
+if not solo_indicadores:
+    # pandas y Plotly solo se importan cuando se van a mostrar tablas y gráficos
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    if granularidad == "mensual":
+        flujo_df = resultados.flujo_df()
+    else:
+        periodos, flujo = flujo_lote(datos, granularidad)
+        flujo_df = tabla_flujo(periodos, flujo[0])
+    flujo_df.index.name = unidad
+
+
+def colorear_signo(v):
+    return 'color: red;' if v < 0 else ('color: green;' if v > 0 else 'color: black;')
+
+
+perfil.marca("grafico_flujo")
+if not solo_indicadores:
+    # --- Visualización ---
+    st.header("Flujo de Caja Acumulado")
+    st.markdown("Este gráfico es crucial. Muestra cuánto dinero necesitas en total en cada punto del proyecto. El punto más bajo representa tu **máxima necesidad de financiamiento**.")
+
+    if vista_escalable and len(flujo_df) > UMBRAL_PUNTOS:
+        # Se conservan el mínimo y el máximo de cada tramo, así el punto más bajo sigue visible
+        indices = indices_reducidos(flujo_df['Flujo Acumulado'].to_numpy())
+        fig = go.Figure(go.Scattergl(
+            x=flujo_df.index[indices], y=flujo_df['Flujo Acumulado'].iloc[indices], fill='tozeroy', mode='lines',
+            name='Flujo Acumulado'
+        ))
+        fig.update_layout(title='Flujo de Caja Acumulado a lo Largo del Proyecto')
+        st.caption(f"Gráfico reducido a {len(indices):,} de {len(flujo_df):,} puntos, conservando los extremos de cada tramo.")
+    else:
+        fig = px.area(
+            flujo_df,
+            x=flujo_df.index,
+            y='Flujo Acumulado',
+            title='Flujo de Caja Acumulado a lo Largo del Proyecto'
+        )
+    fig.update_layout(xaxis_title=f'{unidad} del Proyecto', yaxis_title='Capital Acumulado ($)')
+    st.plotly_chart(fig, use_container_width=True)
+
+punto_minimo = resultados.maxima_necesidad_capital
 st.metric("Máxima Necesidad de Capital (Punto más bajo del flujo)", f"${punto_minimo:,.2f}")
+if granularidad == "diaria" and not solo_indicadores:
+    st.caption(f"Con detalle diario, el punto más bajo del flujo es ${flujo_df['Flujo Acumulado'].min():,.2f}. Los KPIs del proyecto usan el flujo mensual.")
+
+
+perfil.marca("perfil_van")
+st.header("Indicadores de Rentabilidad del Flujo")
+ind1, ind2, ind3 = st.columns(3)
+ind1.metric("TIR Anual", "Sin TIR" if np.isnan(resultados.tir_anual) else f"{resultados.tir_anual:.2f}%", help="Tasa que hace cero el VAN del flujo neto mensual, expresada como tasa anual efectiva.")
+ind2.metric(f"VAN al {datos.tasa_descuento_anual:.1f}%", f"${resultados.van:,.2f}")
+ind3.metric("Mes de Recuperación", "No se recupera" if np.isnan(resultados.mes_recuperacion) else f"Mes {resultados.mes_recuperacion:.0f}", help="Primer mes a partir del cual el flujo acumulado ya no vuelve a ser negativo.")
+
+if not solo_indicadores:
+    # Perfil del VAN: todas las tasas se evalúan en una sola operación
+    tasas_anuales = np.linspace(0, 100, 201)
+    perfil_van = van(resultados.flujo_neto, tasa_periodica(tasas_anuales))
+    fig_van = px.line(x=tasas_anuales, y=perfil_van, title='VAN según la Tasa de Descuento Anual')
+    fig_van.add_hline(y=0, line_dash='dash', line_color='gray')
+    fig_van.update_layout(xaxis_title='Tasa de Descuento Anual (%)', yaxis_title='VAN ($)')
+    st.plotly_chart(fig_van, use_container_width=True)
+
+    perfil.marca("ventas")
+    st.header("Ventas y Entregas")
+    calendario = calendario_ventas(datos)
+    meses_ventas = calendario['meses']
+    fig_ventas = go.Figure([
+        go.Bar(x=meses_ventas, y=calendario['unidades'][0], name='Unidades Vendidas'),
+        go.Scatter(x=meses_ventas, y=calendario['unidades_acumuladas'][0], name='Acumuladas', yaxis='y2', mode='lines'),
+    ])
+    fig_ventas.update_layout(title='Absorción de Ventas', xaxis_title='Mes del Proyecto', yaxis_title='Unidades por Mes',
+                             yaxis2=dict(title='Unidades Acumuladas', overlaying='y', side='right'))
+    fig_cobros = go.Figure([go.Bar(x=meses_ventas, y=valores[0], name=concepto) for concepto, valores in calendario['cobros'].items()])
+    fig_cobros.update_layout(barmode='stack', title='Cobros por Ventas', xaxis_title='Mes del Proyecto', yaxis_title='Cobro ($)')
+    col_ventas, col_cobros = st.columns(2)
+    col_ventas.plotly_chart(fig_ventas, use_container_width=True)
+    col_cobros.plotly_chart(fig_cobros, use_container_width=True)
+    entregas_df = pd.DataFrame({
+        'Fase': np.arange(1, datos.fases_entrega + 1),
+        'Mes de Entrega': calendario['entregas'][0],
+        'Viviendas': datos.cantidad_viviendas / datos.fases_entrega,
+    })
+    st.dataframe(entregas_df.style.format({'Viviendas': '{:,.1f}'}), hide_index=True, use_container_width=True)
+
+    perfil.marca("tabla")
+    if not vista_escalable:
+        st.header("Tabla Detallada del Flujo de Caja Mensual")
+        st.dataframe(flujo_df.style.format("${:,.2f}").applymap(
+            colorear_signo,
+            subset=pd.IndexSlice[:, flujo_df.columns]
+        ), use_container_width=True)
+
+    else:
+        st.header("Resumen Anual del Flujo de Caja")
+        resumen_df = resumen_anual(flujo_df, flujo_df.index, periodos_por_anio, saldos=('Flujo Acumulado',))
+        st.dataframe(resumen_df.style.format("${:,.2f}").applymap(colorear_signo), use_container_width=True)
+
+        st.subheader("Detalle por Año")
+        det1, det2 = st.columns(2)
+        anio = det1.selectbox("Año", resumen_df.index)
+        detalle_df = flujo_df[anio_de_periodo(flujo_df.index, periodos_por_anio) == anio]
+        paginas = numero_paginas(len(detalle_df))
+        numero = det2.number_input(f"Página (de {paginas})", 1, paginas, 1) if paginas > 1 else 1
+        detalle_df = pagina(detalle_df, numero)
+        # Solo la página visible lleva formato y color por celda
+        st.dataframe(detalle_df.style.format("${:,.2f}").applymap(colorear_signo), use_container_width=True)
+
+        perfil.marca("estimacion_carga")
+        fig_completa = px.area(flujo_df, x=flujo_df.index, y='Flujo Acumulado') if len(flujo_df) > UMBRAL_PUNTOS else fig
+        carga_completa = (bytes_tabla(flujo_df) + bytes_estilo_moneda(flujo_df, color_por_celda=True)
+                          + bytes_figura(fig_completa))
+        carga_enviada = (bytes_tabla(resumen_df) + bytes_estilo_moneda(resumen_df, color_por_celda=True)
+                         + bytes_tabla(detalle_df) + bytes_estilo_moneda(detalle_df, color_por_celda=True)
+                         + bytes_figura(fig))
+        st.caption(
+            f"Carga enviada: {formato_bytes(carga_enviada)} en lugar de {formato_bytes(carga_completa)} "
+            f"con el gráfico y la tabla completos ({len(flujo_df):,} filas); se evitan {formato_bytes(max(carga_completa - carga_enviada, 0))}."
+        )
+else:
+    st.caption("Modo solo indicadores: los gráficos y tablas están ocultos. Se desactiva en la página de Resumen.")
+
+# --- Optimización del Cronograma ---
+perfil.marca("optimizar_cronograma")
+st.header("🗓️ Optimizar Cronograma")
+st.markdown(f"En lugar de mover los meses a prueba y error, busca entre todos los cronogramas factibles el de menor necesidad máxima de capital o el de mayor VAN. Admite proyectos de hasta {HORIZONTE_MAXIMO} meses.")
+minimos = Restricciones.desde_datos(datos)
+with st.form("optimizar_cronograma"):
+    opt1, opt2, opt3 = st.columns(3)
+    objetivo_cronograma = opt1.selectbox("Objetivo", list(OBJETIVOS), format_func=OBJETIVOS.get)
+    duracion_urbanizacion = opt2.number_input("Duración mínima de la urbanización (meses)", 1, duracion_total_meses, min(minimos.duracion_minima_urbanizacion, duracion_total_meses))
+    duracion_construccion = opt3.number_input("Duración mínima de la construcción (meses)", 1, duracion_total_meses, min(minimos.duracion_minima_construccion, duracion_total_meses))
+    opt4, opt5, _ = st.columns(3)
+    duracion_ventas = opt4.number_input("Duración mínima de las ventas (meses)", 1, duracion_total_meses, min(minimos.duracion_minima_ventas, duracion_total_meses), help="Lo más rápido que el mercado puede absorber las viviendas.")
+    meses_hasta_pago = opt5.number_input("Meses máximos hasta el primer pago", 1, duracion_total_meses, min(minimos.meses_maximos_hasta_pago, duracion_total_meses), help="Entre la recepción del préstamo y su primer pago.")
+    st.caption("Además, el terreno se compra antes de la urbanización o al iniciarla, la urbanización termina antes de la construcción, las ventas empiezan con la construcción o después y el préstamo se recibe antes del primer costo. Los valores iniciales son los del cronograma actual.")
+    optimizar = st.form_submit_button("Optimizar")
+
+if optimizar:
+    restricciones = Restricciones(duracion_urbanizacion, duracion_construccion, duracion_ventas, meses_hasta_pago)
+    try:
+        with st.spinner("Buscando el mejor cronograma..."):
+            st.session_state.cronograma_optimo = (objetivo_cronograma, datos, optimizar_cronograma(datos, objetivo_cronograma, restricciones))
+    except (ValueError, MemoryError) as error:
+        st.session_state.pop('cronograma_optimo', None)
+        st.error(str(error) if isinstance(error, ValueError) else
+                 "La búsqueda no cabe en la memoria del servidor: sube las duraciones mínimas o acorta el proyecto.")
+
+# El resultado vale mientras no cambien las entradas con las que se buscó
+if st.session_state.get('cronograma_optimo') and st.session_state.cronograma_optimo[1] == datos:
+    objetivo_usado, _, optimo = st.session_state.cronograma_optimo
+    nombre_objetivo = "Máxima Necesidad de Capital" if objetivo_usado == "maxima_necesidad_capital" else f"VAN al {datos.tasa_descuento_anual:.1f}%"
+    res1, res2, res3 = st.columns(3)
+    res1.metric(f"{nombre_objetivo} (cronograma óptimo)", f"${optimo.valor:,.2f}", delta=f"{optimo.valor - optimo.valor_actual:,.2f} vs. actual")
+    res2.metric(f"{nombre_objetivo} (cronograma actual)", f"${optimo.valor_actual:,.2f}")
+    res3.metric("Cronogramas Evaluados", f"{optimo.evaluados:,} de {optimo.candidatos:,}", help="El resto se descartó sin evaluarlo: su cota ya no podía superar al mejor encontrado.")
+    st.dataframe([{"Mes": etiqueta, "Actual": getattr(datos, campo), "Óptimo": optimo.cronograma[campo]}
+                  for campo, etiqueta in VARIABLES_CRONOGRAMA.items()], hide_index=True, use_container_width=True)
+    st.caption(f"Búsqueda en {optimo.segundos:.2f} s: se evaluaron {optimo.nodos_evaluados:,} de {optimo.nodos:,} combinaciones de inicio y fin de la construcción.")
+    if not optimo.completa:
+        st.warning("La búsqueda se detuvo al agotar su presupuesto de cronogramas: es el mejor encontrado, pero puede haber uno mejor. "
+                   "Subir las duraciones mínimas o acortar el plazo hasta el primer pago reduce la búsqueda.")
+    if st.button("Aplicar cronograma óptimo"):
+        st.session_state.update(optimo.cronograma)
+        del st.session_state['cronograma_optimo']
+        st.rerun()
 
+# --- Perfil de la Ejecución (solo con el perfilado activo) ---
+registro_perfil = perfil.finalizar()
+if registro_perfil:
+    with st.expander(f"⏱️ Perfil de la ejecución: {registro_perfil['total_ms']:,.1f} ms"):
+        st.dataframe(perfil.tabla().style.format("{:,.2f}"), use_container_width=True)
+        st.caption("Percentiles de las últimas ejecuciones de esta página:")
+        st.dataframe(resumen_registro(pagina=perfil.pagina), hide_index=True, use_container_width=True)
 
-st.header("Tabla Detallada del Flujo de Caja Mensual")
-st.dataframe(flujo_df.style.format("${:,.2f}").applymap(
-    lambda v: 'color: red;' if v < 0 else ('color: green;' if v > 0 else 'color: black;'),
-    subset=pd.IndexSlice[:, flujo_df.columns]
-), use_container_width=True)
+# --- Memoria de la Sesión: se mide y, si pasa del límite, se liberan los resultados recalculables ---
+controlar_memoria(st.session_state, perfil.pagina)
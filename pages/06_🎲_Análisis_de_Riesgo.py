@@ -1,95 +1,353 @@
+from dataclasses import replace
+
 import streamlit as st
-import pandas as pd
-import numpy as np
+
+from calculos.grafo import GRAFO_PROYECTO
+from calculos.modelo import evaluar_proyecto
+from calculos.memoria import controlar_memoria
+from calculos.perfil import Perfilador, perfilado_activo, resumen_registro
+from calculos.riesgo import VARIABLES, PERCENTILES, TIPOS_DISTRIBUCION, Distribucion, distribuciones_sugeridas, etapas_monte_carlo
+from calculos.trabajos import ERROR, TERMINADO, clave_trabajo, ejecutor
+from calculos import sensibilidad, sensibilidad_global
 
 st.set_page_config(layout="wide")
+perfil = Perfilador("06_Analisis_de_Riesgo", perfilado_activo(st.session_state))
+perfil.marca("entradas")
 st.title("🎲 Análisis de Riesgo y Sensibilidad")
 st.markdown("""
 Simula cómo cambiarían los resultados de tu proyecto ante escenarios adversos o favorables. 
 Ajusta los controles en la barra lateral para ver el impacto inmediato en la rentabilidad.
 """)
 
-# --- Obtener datos base de st.session_state ---
-# Ingresos
-cantidad_viviendas_base = st.session_state.get('cantidad_viviendas', 10)
-precio_venta_unitario_base = st.session_state.get('precio_venta_unitario', 85000.0)
-# Costos
-costo_terreno_base = st.session_state.get('costo_terreno', 100000.0)
-costo_urbanizacion_base = st.session_state.get('total_urbanizacion', 84650.0)
-costo_construccion_base = st.session_state.get('total_construccion_unitaria', 25850.0) * cantidad_viviendas_base
-gastos_admin_permisos_base = st.session_state.get('total_gastos_admin_permisos', 90100.0)
-# Financiamiento
-monto_prestamo_base = st.session_state.get('monto_prestamo', 200000.0)
-
+MODO_ESCENARIO = "Escenario puntual"
+MODO_MONTE_CARLO = "Monte Carlo"
+MODO_SENSIBILIDAD = "Sensibilidad (malla y tornado)"
+MODO_SOBOL = "Sensibilidad global (Sobol)"
 
 # --- Parámetros de Simulación de Riesgo (Inputs del Usuario) ---
-st.sidebar.header("Variables de Sensibilidad")
-sobrecosto_construccion_pct = st.sidebar.slider("Sobrecosto de Construcción (%)", -10, 50, 0, 5)
-variacion_precio_venta_pct = st.sidebar.slider("Variación en Precio de Venta (%)", -30, 30, 0, 5)
-impuesto_renta_pct = st.sidebar.slider("Impuesto Sobre la Renta (%)", 0, 50, 25, 1, help="Tasa de impuesto a aplicar sobre la utilidad bruta.")
+modo = st.sidebar.radio("Modo de Análisis", [MODO_ESCENARIO, MODO_MONTE_CARLO, MODO_SENSIBILIDAD, MODO_SOBOL])
+# Se guarda en st.session_state para que el Dashboard aplique la misma tasa
+st.session_state.impuesto_renta_pct = st.sidebar.slider("Impuesto Sobre la Renta (%)", 0, 50, int(st.session_state.get('impuesto_renta_pct', 25)), 1, help="Tasa de impuesto a aplicar sobre la utilidad bruta.")
 
+perfil.marca("calculo_base")
 # --- Cálculos del Escenario Base ---
-ingresos_totales_base = cantidad_viviendas_base * precio_venta_unitario_base
-costo_total_base = costo_terreno_base + costo_urbanizacion_base + costo_construccion_base + gastos_admin_permisos_base
-utilidad_bruta_base = ingresos_totales_base - costo_total_base
-impuesto_base = utilidad_bruta_base * (impuesto_renta_pct / 100) if utilidad_bruta_base > 0 else 0
-utilidad_neta_base = utilidad_bruta_base - impuesto_base
-capital_propio_base = costo_total_base - monto_prestamo_base
-roi_base = (utilidad_neta_base / capital_propio_base) * 100 if capital_propio_base > 0 else float('inf')
-
-# --- Cálculos del Escenario Simulado ---
-precio_venta_unitario_sc = precio_venta_unitario_base * (1 + variacion_precio_venta_pct / 100)
-costo_construccion_sc = costo_construccion_base * (1 + sobrecosto_construccion_pct / 100)
-
-ingresos_totales_sc = cantidad_viviendas_base * precio_venta_unitario_sc
-costo_total_sc = costo_terreno_base + costo_urbanizacion_base + costo_construccion_sc + gastos_admin_permisos_base
-utilidad_bruta_sc = ingresos_totales_sc - costo_total_sc
-impuesto_sc = utilidad_bruta_sc * (impuesto_renta_pct / 100) if utilidad_bruta_sc > 0 else 0
-utilidad_neta_sc = utilidad_bruta_sc - impuesto_sc
-capital_propio_sc = costo_total_sc - monto_prestamo_base
-roi_sc = (utilidad_neta_sc / capital_propio_sc) * 100 if capital_propio_sc > 0 else float('inf')
-
-# --- Visualización de Resultados ---
-st.header("Comparación de Escenarios")
-st.write("Compara los resultados del proyecto original (Caso Base) con el escenario que has simulado.")
-
-col1, col2 = st.columns(2)
-
-with col1:
-    st.subheader("📊 Caso Base")
-    st.metric("Utilidad Neta Estimada", f"${utilidad_neta_base:,.2f}")
-    st.metric("Retorno sobre Capital (ROI)", f"{roi_base:.2f}%")
-    st.metric("Costo Total", f"${costo_total_base:,.2f}")
-    st.metric("Ingresos Totales", f"${ingresos_totales_base:,.2f}")
-
-with col2:
-    st.subheader("🎲 Escenario Simulado")
-    st.metric(
-        "Utilidad Neta Estimada",
-        f"${utilidad_neta_sc:,.2f}",
-        delta=f"${utilidad_neta_sc - utilidad_neta_base:,.2f}"
-    )
-    st.metric(
-        "Retorno sobre Capital (ROI)",
-        f"{roi_sc:.2f}%",
-        delta=f"{roi_sc - roi_base:.2f}%"
-    )
-    st.metric(
-        "Costo Total",
-        f"${costo_total_sc:,.2f}",
-        delta=f"${costo_total_sc - costo_total_base:,.2f}"
-    )
-    st.metric(
-        "Ingresos Totales",
-        f"${ingresos_totales_sc:,.2f}",
-        delta=f"${ingresos_totales_sc - ingresos_totales_base:,.2f}"
-    )
-
-st.warning(f"""
+recalculo = GRAFO_PROYECTO.actualizar(st.session_state)
+datos_base = recalculo.valores['datos']
+base = recalculo.valores['resultados']
+utilidad_neta_base = base.utilidad_neta
+roi_base = base.roi
+costo_total_base = base.costo_total_inversion
+ingresos_totales_base = base.ingresos_totales
+solo_indicadores = st.session_state.get('solo_indicadores', False)
+AVISO_SOLO_INDICADORES = "Modo solo indicadores: {}. Se desactiva en la barra lateral del Resumen del Proyecto."
+
+
+# La simulación Monte Carlo corre en segundo plano: la página muestra el avance y los resultados parciales
+ESPACIO_MONTE_CARLO = "riesgo/monte_carlo"
+INTERVALO_REFRESCO = 0.5   # segundos entre actualizaciones del avance
+INTERVALO_PARCIAL = 1.0    # segundos entre resúmenes parciales
+
+
+# La malla guarda todas las métricas: cambiar la métrica del mapa de calor no recalcula
+@st.cache_data(max_entries=8, show_spinner="Evaluando la malla de sensibilidad...")
+def barrer(datos, variable_x, valores_x, variable_y, valores_y):
+    return sensibilidad.barrido_2d(datos, variable_x, valores_x, variable_y, valores_y)
+
+
+@st.cache_data(max_entries=8, show_spinner="Calculando los índices de Sobol...")
+def indices_sobol(datos, rangos, n, muestreo):
+    return sensibilidad_global.indices_sobol(datos, rangos, n, muestreo)
+
+
+ETIQUETAS_METRICAS = {
+    "utilidad_neta": "Utilidad Neta ($)",
+    "roi": "ROI (%)",
+    "maxima_necesidad_capital": "Máxima Necesidad de Capital ($)",
+}
+
+
+if modo == MODO_ESCENARIO:
+    st.sidebar.header("Variables de Sensibilidad")
+    sobrecosto_construccion_pct = st.sidebar.slider("Sobrecosto de Construcción (%)", -10, 50, 0, 5)
+    variacion_precio_venta_pct = st.sidebar.slider("Variación en Precio de Venta (%)", -30, 30, 0, 5)
+
+    perfil.marca("calculo_escenario")
+    # --- Cálculos del Escenario Simulado ---
+    escenario = evaluar_proyecto(replace(
+        datos_base,
+        precio_venta_unitario=datos_base.precio_venta_unitario * (1 + variacion_precio_venta_pct / 100),
+        total_construccion_unitaria=datos_base.total_construccion_unitaria * (1 + sobrecosto_construccion_pct / 100),
+    ))
+    utilidad_neta_sc = escenario.utilidad_neta
+    roi_sc = escenario.roi
+    costo_total_sc = escenario.costo_total_inversion
+    ingresos_totales_sc = escenario.ingresos_totales
+
+    perfil.marca("visualizacion")
+    # --- Visualización de Resultados ---
+    st.header("Comparación de Escenarios")
+    st.write("Compara los resultados del proyecto original (Caso Base) con el escenario que has simulado.")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("📊 Caso Base")
+        st.metric("Utilidad Neta Estimada", f"${utilidad_neta_base:,.2f}")
+        st.metric("Retorno sobre Capital (ROI)", f"{roi_base:.2f}%")
+        st.metric("Costo Total", f"${costo_total_base:,.2f}")
+        st.metric("Ingresos Totales", f"${ingresos_totales_base:,.2f}")
+
+    with col2:
+        st.subheader("🎲 Escenario Simulado")
+        st.metric(
+            "Utilidad Neta Estimada",
+            f"${utilidad_neta_sc:,.2f}",
+            delta=f"${utilidad_neta_sc - utilidad_neta_base:,.2f}"
+        )
+        st.metric(
+            "Retorno sobre Capital (ROI)",
+            f"{roi_sc:.2f}%",
+            delta=f"{roi_sc - roi_base:.2f}%"
+        )
+        st.metric(
+            "Costo Total",
+            f"${costo_total_sc:,.2f}",
+            delta=f"${costo_total_sc - costo_total_base:,.2f}"
+        )
+        st.metric(
+            "Ingresos Totales",
+            f"${ingresos_totales_sc:,.2f}",
+            delta=f"${ingresos_totales_sc - ingresos_totales_base:,.2f}"
+        )
+
+    st.warning(f"""
 **Análisis del Escenario:**
 - Un sobrecosto en construcción del **{sobrecosto_construccion_pct}%** y una variación en ventas del **{variacion_precio_venta_pct}%**...
 - ...resultan en una variación de la utilidad neta de **${utilidad_neta_sc - utilidad_neta_base:,.2f}**.
 - El ROI del proyecto cambia de **{roi_base:.2f}%** a **{roi_sc:.2f}%**.
 """)
 
-st.info("Nota: Este análisis introduce el cálculo de la Utilidad Neta (después de impuestos), un indicador clave solicitado en tu descripción inicial.")
+    st.info("Nota: Este análisis introduce el cálculo de la Utilidad Neta (después de impuestos), un indicador clave solicitado en tu descripción inicial.")
+
+elif modo == MODO_MONTE_CARLO:
+    # --- Distribuciones de las Variables Inciertas ---
+    defaults = {variable: (d.tipo, d.parametros) for variable, d in distribuciones_sugeridas(datos_base).items()}
+    nombres_parametros = {
+        "fija": ["Valor"],
+        "uniforme": ["Mínimo", "Máximo"],
+        "normal": ["Media", "Desviación"],
+        "triangular": ["Mínimo", "Moda", "Máximo"],
+    }
+
+    st.sidebar.header("Distribuciones de Riesgo")
+    distribuciones = {}
+    for variable, etiqueta in VARIABLES.items():
+        tipo_default, parametros_default = defaults[variable]
+        st.sidebar.subheader(etiqueta)
+        tipo = st.sidebar.selectbox("Distribución", TIPOS_DISTRIBUCION, TIPOS_DISTRIBUCION.index(tipo_default), key=f"mc_tipo_{variable}")
+        columnas = st.sidebar.columns(len(nombres_parametros[tipo]))
+        parametros = []
+        for i, (columna, nombre) in enumerate(zip(columnas, nombres_parametros[tipo])):
+            valor = parametros_default[i] if tipo == tipo_default else parametros_default[0]
+            parametros.append(columna.number_input(nombre, value=float(valor), key=f"mc_{variable}_{tipo}_{i}"))
+        try:
+            distribuciones[variable] = Distribucion(tipo, tuple(parametros))
+        except ValueError as error:
+            st.sidebar.error(str(error))
+
+    st.sidebar.header("Simulación")
+    n_escenarios = st.sidebar.select_slider("Número de Escenarios", [10_000, 100_000, 1_000_000, 2_000_000], 1_000_000)
+    semilla = st.sidebar.number_input("Semilla", min_value=0, value=42, step=1, help="La misma semilla reproduce exactamente los mismos resultados.")
+
+    def metricas_monte_carlo(resultado):
+        nivel = int(resultado.nivel_confianza * 100)
+        mc1, mc2, mc3, mc4 = st.columns(4)
+        mc1.metric("Probabilidad de Pérdida", f"{resultado.probabilidad_perdida:.2%}", help="Proporción de escenarios con utilidad neta negativa.")
+        mc2.metric("Utilidad Neta Media", f"${resultado.media['utilidad_neta']:,.2f}", delta=f"${resultado.media['utilidad_neta'] - utilidad_neta_base:,.2f}")
+        mc3.metric(f"VaR {nivel}% Utilidad Neta", f"${resultado.var['utilidad_neta']:,.2f}", help=f"Con {nivel}% de confianza, la utilidad neta no será menor a este valor.")
+        mc4.metric(f"VaR {nivel}% ROI", f"{resultado.var['roi']:.2f}%", help=f"Con {nivel}% de confianza, el ROI no será menor a este valor.")
+
+    @st.fragment(run_every=INTERVALO_REFRESCO)
+    def avance_monte_carlo(trabajo):
+        if trabajo.terminado:
+            st.rerun()  # la ejecución completa de la página muestra el resultado final
+        st.progress(trabajo.progreso, text=f"Simulando escenarios... {trabajo.progreso:.0%} ({trabajo.segundos:,.1f} s)")
+        if st.button("Cancelar simulación"):
+            ejecutor().soltar(st.session_state, ESPACIO_MONTE_CARLO)
+            st.session_state.mc_cancelado = trabajo.clave
+            st.rerun()
+        if trabajo.parcial is not None:
+            st.caption(f"Resultados parciales de {trabajo.parcial.n_escenarios:,} escenarios:")
+            metricas_monte_carlo(trabajo.parcial)
+
+    perfil.marca("simulacion")
+    st.header("Simulación Monte Carlo")
+    # Mismas entradas, mismo trabajo: al volver a la página o desde otra sesión no se simula de nuevo
+    clave = clave_trabajo(ESPACIO_MONTE_CARLO, datos_base, distribuciones, n_escenarios, int(semilla))
+    resultado = None
+    if st.session_state.get('mc_cancelado') == clave:
+        st.info("Simulación cancelada. Cambia las distribuciones o vuelve a lanzarla.")
+        if st.button("Simular de nuevo"):
+            del st.session_state['mc_cancelado']
+            st.rerun()
+    else:
+        trabajo = ejecutor().para_sesion(st.session_state, ESPACIO_MONTE_CARLO, clave, etapas_monte_carlo, datos_base,
+                                         distribuciones, n_escenarios, int(semilla), intervalo_parcial=INTERVALO_PARCIAL)
+        if trabajo.estado == TERMINADO:
+            resultado = trabajo.resultado
+        elif trabajo.estado == ERROR:
+            st.error(f"No se pudo completar la simulación: {trabajo.error}")
+        else:
+            avance_monte_carlo(trabajo)
+
+    if resultado is not None:
+        perfil.marca("metricas")
+        # --- Visualización de Resultados ---
+        st.write(f"Resultados de **{resultado.n_escenarios:,}** escenarios simulados (semilla {resultado.semilla}).")
+        metricas_monte_carlo(resultado)
+        nivel = int(resultado.nivel_confianza * 100)
+
+        if solo_indicadores:
+            st.caption(AVISO_SOLO_INDICADORES.format("las bandas de percentiles y el histograma están ocultos"))
+        else:
+            perfil.marca("tabla_percentiles")
+            # pandas y Plotly solo se importan cuando se van a mostrar tablas y gráficos
+            import pandas as pd
+            import plotly.graph_objects as go
+
+            st.subheader("Bandas de Percentiles")
+            percentiles_df = pd.DataFrame(
+                {ETIQUETAS_METRICAS[m]: valores for m, valores in resultado.percentiles.items()},
+                index=[f"P{p}" for p in PERCENTILES],
+            ).T
+            percentiles_df[f"CVaR {nivel}%"] = [resultado.cvar[m] for m in resultado.percentiles]
+            st.dataframe(percentiles_df.style.format("{:,.2f}"), use_container_width=True)
+
+            perfil.marca("histograma")
+            metrica = st.selectbox("Distribución a graficar", list(ETIQUETAS_METRICAS), format_func=ETIQUETAS_METRICAS.get)
+            conteos, bordes = resultado.histogramas[metrica]
+            fig = go.Figure(go.Bar(x=(bordes[:-1] + bordes[1:]) / 2, y=conteos, width=bordes[1] - bordes[0], name='Escenarios'))
+            fig.add_vline(x=resultado.var[metrica], line_dash='dash', line_color='red', annotation_text=f"VaR {nivel}%")
+            fig.update_layout(title_text=f'Distribución de {ETIQUETAS_METRICAS[metrica]}', xaxis_title=ETIQUETAS_METRICAS[metrica], yaxis_title='Escenarios')
+            st.plotly_chart(fig, use_container_width=True)
+
+elif modo == MODO_SOBOL:
+    # --- Factores y Muestreo ---
+    st.sidebar.header("Factores Inciertos")
+    amplitud = st.sidebar.slider("Amplitud de los Rangos", 0.25, 2.0, 1.0, 0.25, help="Escala los rangos sugeridos alrededor del caso base.")
+    rangos_sugeridos = sensibilidad_global.rangos_por_defecto(datos_base, amplitud)
+    factores = st.sidebar.multiselect("Factores", list(sensibilidad_global.FACTORES), list(sensibilidad_global.FACTORES),
+                                      format_func=sensibilidad_global.FACTORES.get)
+    st.sidebar.header("Muestreo")
+    muestreo = st.sidebar.selectbox("Secuencia", sensibilidad_global.MUESTREOS, format_func={"sobol": "Sobol", "halton": "Halton", "aleatorio": "Aleatoria (referencia)"}.get)
+    n_base = st.sidebar.select_slider("Filas por Matriz (N)", [256, 512, 1024, 2048, 4096, 8192, 16384], 4096,
+                                      help="Se evalúan N x (factores + 2) escenarios.")
+    metrica = st.selectbox("Métrica", sensibilidad_global.METRICAS, format_func=ETIQUETAS_METRICAS.get)
+
+    if not factores:
+        st.warning("Selecciona al menos un factor.")
+    elif solo_indicadores:
+        st.caption(AVISO_SOLO_INDICADORES.format("los índices de Sobol no se calculan"))
+    else:
+        import plotly.graph_objects as go  # solo se importa cuando se dibujan los gráficos
+
+        perfil.marca("sobol")
+        resultado = indices_sobol(datos_base, {f: rangos_sugeridos[f] for f in factores}, n_base, muestreo)
+
+        perfil.marca("grafico_sobol")
+        # --- Índices de Sobol ---
+        st.header("Sensibilidad Global (Índices de Sobol)")
+        st.write(f"**{resultado.evaluaciones:,}** evaluaciones del modelo (N = {resultado.n_base:,}) en {resultado.segundos:,.2f} s. "
+                 "S1 es la parte de la varianza que explica cada factor por sí solo; ST incluye sus interacciones con los demás.")
+        tabla = sensibilidad_global.tabla_indices(resultado, metrica)
+        nivel = int(resultado.nivel_confianza * 100)
+        fig_sobol = go.Figure()
+        for indice, color in (("S1", 'steelblue'), ("ST", 'darkorange')):
+            fig_sobol.add_trace(go.Bar(
+                y=tabla.index[::-1], x=tabla[indice][::-1], orientation='h', name=indice, marker_color=color,
+                error_x=dict(type='data', symmetric=False, array=(tabla[f"{indice} máx."] - tabla[indice])[::-1],
+                             arrayminus=(tabla[indice] - tabla[f"{indice} mín."])[::-1]),
+            ))
+        fig_sobol.update_layout(barmode='group', title_text=f'Índices de Sobol de {ETIQUETAS_METRICAS[metrica]} (intervalos al {nivel}%)', xaxis_title='Fracción de la varianza')
+        st.plotly_chart(fig_sobol, use_container_width=True)
+
+        perfil.marca("tabla_sobol")
+        decimales = {f: 0 if f in sensibilidad_global.FACTORES_ENTEROS else 2 for f in resultado.factores}
+        tabla["Rango"] = {sensibilidad_global.FACTORES[f]: f"{rangos_sugeridos[f][0]:,.{decimales[f]}f} a {rangos_sugeridos[f][1]:,.{decimales[f]}f}"
+                          for f in resultado.factores}
+        st.dataframe(tabla.style.format("{:.4f}", subset=[c for c in tabla.columns if c != "Rango"]), use_container_width=True)
+        st.caption(f"Intervalos de confianza al {nivel}% por bootstrap de las filas; con secuencias de baja discrepancia son conservadores. "
+                   f"Desviación estándar de {ETIQUETAS_METRICAS[metrica]}: {resultado.varianza[metrica] ** 0.5:,.2f}.")
+
+else:
+    # --- Variables y Rangos del Barrido ---
+    st.sidebar.header("Malla de Sensibilidad")
+    nombres_variables = list(sensibilidad.VARIABLES)
+
+    def rango_input(eje, indice_default):
+        variable = st.sidebar.selectbox(f"Variable del eje {eje}", nombres_variables, indice_default, format_func=sensibilidad.VARIABLES.get, key=f"sens_var_{eje}")
+        minimo_default, maximo_default = sensibilidad.rango_por_defecto(datos_base, variable)
+        paso = 1 if variable in sensibilidad.VARIABLES_ENTERAS else 0.5
+        col_min, col_max = st.sidebar.columns(2)
+        minimo = col_min.number_input("Mínimo", value=minimo_default, step=paso, key=f"sens_min_{eje}_{variable}")
+        maximo = col_max.number_input("Máximo", value=maximo_default, step=paso, key=f"sens_max_{eje}_{variable}")
+        n_puntos = st.sidebar.slider("Puntos", 5, 500, 101, key=f"sens_n_{eje}")
+        return variable, sensibilidad.valores_variable(variable, minimo, maximo, n_puntos)
+
+    variable_x, valores_x = rango_input("X", 0)
+    variable_y, valores_y = rango_input("Y", 1)
+    metrica = st.selectbox("Métrica", list(ETIQUETAS_METRICAS), format_func=ETIQUETAS_METRICAS.get)
+
+    if variable_x == variable_y:
+        st.warning("Selecciona dos variables distintas para los ejes X e Y.")
+    elif solo_indicadores:
+        st.caption(AVISO_SOLO_INDICADORES.format("el mapa de calor y el tornado no se calculan"))
+    else:
+        import plotly.graph_objects as go  # solo se importa cuando se dibujan los gráficos
+
+        perfil.marca("barrido")
+        barrido = barrer(datos_base, variable_x, valores_x, variable_y, valores_y)
+
+        perfil.marca("mapa_calor")
+        # --- Mapa de Calor ---
+        st.header("Mapa de Calor de Sensibilidad")
+        st.write(f"**{barrido.valores_x.size * barrido.valores_y.size:,}** combinaciones evaluadas en {barrido.procesos} proceso(s).")
+        fig = go.Figure(go.Heatmap(
+            x=barrido.valores_x,
+            y=barrido.valores_y,
+            z=barrido.metricas[metrica],
+            colorscale='RdYlGn',
+            colorbar=dict(title=ETIQUETAS_METRICAS[metrica]),
+        ))
+        fig.update_layout(
+            title_text=f'{ETIQUETAS_METRICAS[metrica]} según {sensibilidad.VARIABLES[variable_x]} y {sensibilidad.VARIABLES[variable_y]}',
+            xaxis_title=sensibilidad.VARIABLES[variable_x],
+            yaxis_title=sensibilidad.VARIABLES[variable_y],
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        perfil.marca("tornado")
+        # --- Gráfico de Tornado (una variable a la vez) ---
+        st.header("Gráfico de Tornado")
+        st.write("Impacto de mover cada variable, por separado, entre los extremos de su rango sugerido.")
+        rangos = {variable: sensibilidad.rango_por_defecto(datos_base, variable) for variable in nombres_variables}
+        valor_central, barras = sensibilidad.tornado(datos_base, rangos, metrica)
+        barras = barras[::-1]  # la barra de mayor impacto queda arriba
+        etiquetas = [f"{sensibilidad.VARIABLES[v]} ({rangos[v][0]} a {rangos[v][1]})" for v, _, _ in barras]
+        fig_tornado = go.Figure()
+        fig_tornado.add_trace(go.Bar(y=etiquetas, x=[bajo - valor_central for _, bajo, _ in barras], base=valor_central, orientation='h', name='Valor mínimo del rango', marker_color='indianred'))
+        fig_tornado.add_trace(go.Bar(y=etiquetas, x=[alto - valor_central for _, _, alto in barras], base=valor_central, orientation='h', name='Valor máximo del rango', marker_color='seagreen'))
+        fig_tornado.update_layout(barmode='overlay', title_text=f'Tornado de {ETIQUETAS_METRICAS[metrica]}', xaxis_title=ETIQUETAS_METRICAS[metrica])
+        fig_tornado.add_vline(x=valor_central, line_color='black', annotation_text='Caso Base')
+        st.plotly_chart(fig_tornado, use_container_width=True)
+
+# --- Perfil de la Ejecución (solo con el perfilado activo) ---
+registro_perfil = perfil.finalizar()
+if registro_perfil:
+    with st.expander(f"⏱️ Perfil de la ejecución: {registro_perfil['total_ms']:,.1f} ms"):
+        st.dataframe(perfil.tabla().style.format("{:,.2f}"), use_container_width=True)
+        st.caption("Percentiles de las últimas ejecuciones de esta página:")
+        st.dataframe(resumen_registro(pagina=perfil.pagina), hide_index=True, use_container_width=True)
+
+# --- Memoria de la Sesión: se mide y, si pasa del límite, se liberan los resultados recalculables ---
+controlar_memoria(st.session_state, perfil.pagina)
@@ -1,70 +1,46 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import numpy_financial as npf
-import plotly.express as px
+
+from calculos.grafo import GRAFO_PROYECTO
+from calculos.memoria import controlar_memoria
+from calculos.perfil import Perfilador, perfilado_activo, resumen_registro
+from calculos.riesgo import distribuciones_sugeridas, etapas_monte_carlo
+from calculos.trabajos import ERROR, TERMINADO, clave_trabajo, ejecutor
 
 st.set_page_config(layout="wide")
+perfil = Perfilador("07_Dashboard_Ejecutivo", perfilado_activo(st.session_state))
+perfil.marca("entradas")
 st.title("🚀 Dashboard Ejecutivo del Proyecto")
 st.markdown("Esta es la vista de 30,000 pies de altura. Resume los indicadores financieros y de viabilidad más importantes de todo el proyecto.")
 
-# --- Contenedor para verificar si los datos están cargados ---
-if 'total_urbanizacion' not in st.session_state:
-    st.warning("Por favor, navega primero por las páginas de 'Costos' y 'Gastos' para cargar todos los datos del proyecto.")
-    st.stop()
-
+perfil.marca("calculo")
 # --- 1. RECOPILAR Y CALCULAR TODOS LOS KPIs ---
 
-# --- Obtener datos base de st.session_state ---
-cantidad_viviendas = st.session_state.get('cantidad_viviendas', 10)
-precio_venta_unitario = st.session_state.get('precio_venta_unitario', 85000.0)
-costo_terreno = st.session_state.get('costo_terreno', 100000.0)
-costo_urbanizacion = st.session_state.get('total_urbanizacion', 84650.0)
-costo_construccion_unitario = st.session_state.get('total_construccion_unitaria', 25850.0)
-gastos_admin_permisos = st.session_state.get('total_gastos_admin_permisos', 90100.0)
-monto_prestamo = st.session_state.get('monto_prestamo', 200000.0)
-tasa_interes_anual = st.session_state.get('tasa_interes_anual', 5.0)
-plazo_prestamo_anios = st.session_state.get('plazo_prestamo_anios', 15)
-
-# --- Cálculos de Rentabilidad ---
-costo_total_construccion = costo_construccion_unitario * cantidad_viviendas
-ingresos_totales = precio_venta_unitario * cantidad_viviendas
-costo_total_inversion = costo_terreno + costo_urbanizacion + costo_total_construccion + gastos_admin_permisos
-capital_propio = costo_total_inversion - monto_prestamo
-utilidad_bruta = ingresos_totales - costo_total_inversion
-
-# Para Utilidad Neta, necesitamos el impuesto. Usaremos el de la página de riesgo o un default.
-impuesto_renta_pct = st.session_state.get('impuesto_renta_pct', 25.0)
-impuesto_calculado = utilidad_bruta * (impuesto_renta_pct / 100) if utilidad_bruta > 0 else 0
-utilidad_neta = utilidad_bruta - impuesto_calculado
-
-# ROI y ROC
-roi = (utilidad_neta / capital_propio) * 100 if capital_propio > 0 else float('inf')
-roc = (utilidad_bruta / costo_total_inversion) * 100 if costo_total_inversion > 0 else 0
-
-# --- Cálculo de la Máxima Necesidad de Capital (del Flujo de Caja) ---
-# Replicamos la lógica del flujo de caja para obtener el KPI
-duracion_total_meses = 36 # Usamos un default o lo traemos de session_state si lo guardamos allí
-meses = np.arange(1, duracion_total_meses + 1)
-flujo_df = pd.DataFrame(index=meses)
-flujo_df['Flujo Neto Mensual'] = 0.0
-# Simplificamos la distribución para el dashboard
-flujo_df.loc[1, 'Flujo Neto Mensual'] += -costo_terreno - gastos_admin_permisos
-flujo_df.loc[2, 'Flujo Neto Mensual'] += monto_prestamo
-flujo_df.loc[2:6, 'Flujo Neto Mensual'] += -costo_urbanizacion / 5
-flujo_df.loc[7:24, 'Flujo Neto Mensual'] += -costo_total_construccion / 18
-flujo_df.loc[18:36, 'Flujo Neto Mensual'] += ingresos_totales / 19
-# Pagos del préstamo
-if monto_prestamo > 0 and tasa_interes_anual > 0:
-    tasa_mensual = (tasa_interes_anual / 100) / 12
-    n_pagos = plazo_prestamo_anios * 12
-    pago_mensual = -npf.pmt(tasa_mensual, n_pagos, monto_prestamo)
-    flujo_df.loc[3:duracion_total_meses, 'Flujo Neto Mensual'] += -pago_mensual
-
-flujo_df['Flujo Acumulado'] = flujo_df['Flujo Neto Mensual'].cumsum()
-maxima_necesidad_capital = flujo_df['Flujo Acumulado'].min()
-
-
+# --- Modelo compartido: mismas cifras que Resumen, Flujo de Caja y Riesgo ---
+# Los totales de Costos y Gastos se derivan de sus tablas aunque no se hayan visitado esas páginas
+recalculo = GRAFO_PROYECTO.actualizar(st.session_state)
+datos = recalculo.valores['datos']
+resultados = recalculo.valores['resultados']
+st.sidebar.caption(f"Valores derivados recalculados en esta ejecución: {len(recalculo.recalculados)} de {recalculo.total_nodos}.")
+
+costo_terreno = datos.costo_terreno
+costo_urbanizacion = datos.total_urbanizacion
+gastos_admin_permisos = datos.total_gastos_admin_permisos
+otros_gastos = datos.otros_gastos
+costo_total_construccion = resultados.costo_total_construccion
+ingresos_totales = resultados.ingresos_totales
+costo_total_inversion = resultados.costo_total_inversion
+capital_propio = resultados.capital_propio
+utilidad_bruta = resultados.utilidad_bruta
+utilidad_neta = resultados.utilidad_neta
+roi = resultados.roi
+roc = resultados.roc
+
+# --- Máxima Necesidad de Capital (del mismo flujo de caja de la página 05) ---
+maxima_necesidad_capital = resultados.maxima_necesidad_capital
+
+
+perfil.marca("metricas")
 # --- 2. MOSTRAR EL DASHBOARD ---
 
 st.header("Indicadores Clave de Rentabilidad")
@@ -81,26 +57,90 @@ met2.metric("Costo Total de Inversión", f"${costo_total_inversion:,.2f}")
 met3.metric("Capital Propio Requerido", f"${capital_propio:,.2f}")
 met4.metric("Máxima Necesidad de Capital", f"${maxima_necesidad_capital:,.2f}", help="El punto más bajo del flujo de caja. Indica la máxima cantidad de dinero que el proyecto necesitará.")
 
-st.header("Visualizaciones Principales")
-v1, v2 = st.columns(2)
-
-with v1:
-    st.subheader("Desglose de Costos")
-    costos_data = {
-        'Categoría': ['Terreno', 'Urbanización', 'Construcción', 'Admin/Permisos'],
-        'Monto': [costo_terreno, costo_urbanizacion, costo_total_construccion, gastos_admin_permisos]
-    }
-    costos_df = pd.DataFrame(costos_data)
-    fig_pie = px.pie(costos_df, values='Monto', names='Categoría', hole=.3)
-    st.plotly_chart(fig_pie, use_container_width=True)
-
-with v2:
-    st.subheader("Flujo de Caja Acumulado")
-    fig_area = px.area(
-        flujo_df,
-        x=flujo_df.index,
-        y='Flujo Acumulado',
-    )
-    fig_area.update_layout(xaxis_title='Mes del Proyecto', yaxis_title='Capital Acumulado ($)')
-    st.plotly_chart(fig_area, use_container_width=True)
-
+st.header("Indicadores del Flujo Descontado")
+ind1, ind2, ind3 = st.columns(3)
+ind1.metric("TIR Anual", "Sin TIR" if np.isnan(resultados.tir_anual) else f"{resultados.tir_anual:.2f}%")
+ind2.metric(f"VAN al {datos.tasa_descuento_anual:.1f}%", f"${resultados.van:,.2f}", help="La tasa de descuento se ajusta en la página de Flujo de Caja.")
+ind3.metric("Mes de Recuperación", "No se recupera" if np.isnan(resultados.mes_recuperacion) else f"Mes {resultados.mes_recuperacion:.0f}")
+
+perfil.marca("riesgo")
+# --- Riesgo: Monte Carlo en segundo plano ---
+# Mismo trabajo que la página de Análisis de Riesgo con sus distribuciones sugeridas, 100,000 escenarios y semilla 42
+N_ESCENARIOS_RIESGO = 100_000
+SEMILLA_RIESGO = 42
+st.header("Riesgo del Proyecto")
+
+
+def metricas_riesgo(resultado):
+    nivel = int(resultado.nivel_confianza * 100)
+    r1, r2, r3 = st.columns(3)
+    r1.metric("Probabilidad de Pérdida", f"{resultado.probabilidad_perdida:.2%}")
+    r2.metric(f"VaR {nivel}% Utilidad Neta", f"${resultado.var['utilidad_neta']:,.2f}")
+    r3.metric(f"VaR {nivel}% ROI", f"{resultado.var['roi']:.2f}%")
+
+
+@st.fragment(run_every=0.5)
+def avance_riesgo(trabajo):
+    if trabajo.terminado:
+        st.rerun()
+    st.progress(trabajo.progreso, text=f"Simulando {N_ESCENARIOS_RIESGO:,} escenarios... {trabajo.progreso:.0%}")
+    if trabajo.parcial is not None:
+        metricas_riesgo(trabajo.parcial)
+
+
+distribuciones = distribuciones_sugeridas(datos)
+trabajo = ejecutor().para_sesion(
+    st.session_state, "dashboard/riesgo",
+    clave_trabajo("riesgo/monte_carlo", datos, distribuciones, N_ESCENARIOS_RIESGO, SEMILLA_RIESGO),
+    etapas_monte_carlo, datos, distribuciones, N_ESCENARIOS_RIESGO, SEMILLA_RIESGO, intervalo_parcial=1.0,
+)
+if trabajo.estado == TERMINADO:
+    metricas_riesgo(trabajo.resultado)
+    st.caption(f"Monte Carlo de {N_ESCENARIOS_RIESGO:,} escenarios con las distribuciones sugeridas de la página de Análisis de Riesgo.")
+elif trabajo.estado == ERROR:
+    st.error(f"No se pudo completar la simulación: {trabajo.error}")
+else:
+    avance_riesgo(trabajo)
+
+perfil.marca("graficos")
+if st.session_state.get('solo_indicadores', False):
+    st.caption("Modo solo indicadores: los gráficos y tablas están ocultos. Se desactiva en la página de Resumen.")
+else:
+    # pandas y Plotly solo se importan cuando se dibujan los gráficos
+    import pandas as pd
+    import plotly.express as px
+
+    flujo_df = resultados.flujo_df()
+    st.header("Visualizaciones Principales")
+    v1, v2 = st.columns(2)
+
+    with v1:
+        st.subheader("Desglose de Costos")
+        costos_data = {
+            'Categoría': ['Terreno', 'Urbanización', 'Construcción', 'Admin/Permisos', 'Otros/Imprevistos'],
+            'Monto': [costo_terreno, costo_urbanizacion, costo_total_construccion, gastos_admin_permisos, otros_gastos]
+        }
+        costos_df = pd.DataFrame(costos_data)
+        fig_pie = px.pie(costos_df, values='Monto', names='Categoría', hole=.3)
+        st.plotly_chart(fig_pie, use_container_width=True)
+
+    with v2:
+        st.subheader("Flujo de Caja Acumulado")
+        fig_area = px.area(
+            flujo_df,
+            x=flujo_df.index,
+            y='Flujo Acumulado',
+        )
+        fig_area.update_layout(xaxis_title='Mes del Proyecto', yaxis_title='Capital Acumulado ($)')
+        st.plotly_chart(fig_area, use_container_width=True)
+
+# --- Perfil de la Ejecución (solo con el perfilado activo) ---
+registro_perfil = perfil.finalizar()
+if registro_perfil:
+    with st.expander(f"⏱️ Perfil de la ejecución: {registro_perfil['total_ms']:,.1f} ms"):
+        st.dataframe(perfil.tabla().style.format("{:,.2f}"), use_container_width=True)
+        st.caption("Percentiles de las últimas ejecuciones de esta página:")
+        st.dataframe(resumen_registro(pagina=perfil.pagina), hide_index=True, use_container_width=True)
+
+# --- Memoria de la Sesión: se mide y, si pasa del límite, se liberan los resultados recalculables ---
+controlar_memoria(st.session_state, perfil.pagina)
@@ -0,0 +1,95 @@
+import hmac
+import os
+import time
+
+import streamlit as st
+
+from calculos.memoria import CLAVE_SESION, bytes_compartidos, configurar_limite, controlar_memoria, limite_sesion, sesiones
+from calculos.perfil import Perfilador, perfilado_activo, resumen_registro
+from calculos.presentacion import formato_bytes
+from calculos.trabajos import ejecutor
+
+st.set_page_config(page_title="Administración", page_icon="🛠️", layout="wide")
+perfil = Perfilador("08_Administracion", perfilado_activo(st.session_state))
+perfil.marca("entradas")
+st.title("🛠️ Administración del Servidor")
+st.markdown("Uso de memoria de las sesiones abiertas en este proceso, para dimensionar el servidor.")
+
+# Sin la variable de entorno la página queda cerrada para todos
+CLAVE_ADMIN = os.environ.get("SIMULADOR_ADMIN_CLAVE", "")
+
+# --- Acceso: la página cambia el límite de todo el proceso y muestra todas las sesiones ---
+if not st.session_state.get('admin_autorizado', False):
+    if not CLAVE_ADMIN:
+        st.warning("La administración está desactivada. Define SIMULADOR_ADMIN_CLAVE en el entorno del servidor para habilitarla.")
+    else:
+        with st.form("acceso_admin"):
+            clave = st.text_input("Clave de administración", type="password")
+            if st.form_submit_button("Entrar"):
+                if hmac.compare_digest(clave.encode(), CLAVE_ADMIN.encode()):
+                    st.session_state.admin_autorizado = True
+                    st.rerun()
+                st.error("Clave incorrecta.")
+else:
+    # --- Límite de Memoria por Sesión ---
+    # El límite es del proceso: solo cambia al aplicar el formulario, no porque otra pestaña muestre otro valor
+    st.sidebar.header("Memoria por Sesión")
+    with st.sidebar.form("limite_memoria"):
+        limite_mb = st.number_input("Límite por sesión (MiB)", min_value=1, value=max(1, limite_sesion() // 2**20), step=8,
+                                    help="Vale para todas las sesiones del proceso. Al pasarlo se liberan primero los resultados que se pueden recalcular. El valor inicial sale de SIMULADOR_MEMORIA_SESION_MB.")
+        if st.form_submit_button("Aplicar a todas las sesiones"):
+            configurar_limite(limite_mb * 2**20)
+    st.sidebar.caption(f"Límite vigente: {formato_bytes(limite_sesion())}.")
+
+    perfil.marca("sesiones")
+    # La sesión actual se mide antes de mostrar la tabla, así también aparece
+    controlar_memoria(st.session_state, perfil.pagina)
+    mediciones = sesiones()
+    total_sesiones = sum(m.bytes for m in mediciones)
+    compartidos = bytes_compartidos()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Sesiones Activas", f"{len(mediciones):,}")
+    col2.metric("Memoria de las Sesiones", formato_bytes(total_sesiones))
+    col3.metric("Tablas Compartidas", formato_bytes(compartidos), help="Tablas por defecto de las páginas 02 y 03: una sola copia para todas las sesiones.")
+    col4.metric("Sesiones sobre el Límite", f"{sum(m.excedido for m in mediciones):,}")
+
+    st.subheader("Sesiones")
+    ahora = time.time()
+    filas = [{
+        "Sesión": m.sesion[:8] + (" (actual)" if m.sesion == st.session_state.get(CLAVE_SESION) else ""),
+        "Última Página": m.pagina,
+        "Memoria": formato_bytes(m.bytes),
+        "% del Límite": 100 * m.bytes / m.limite,
+        "Mayor Clave": next(iter(m.por_clave), ""),
+        "Liberado en el Último Control": ", ".join(m.liberados),
+        "Inactiva (s)": ahora - m.momento,
+    } for m in mediciones]
+    st.dataframe(filas, hide_index=True, use_container_width=True,
+                 column_config={"% del Límite": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.1f%%"),
+                                "Inactiva (s)": st.column_config.NumberColumn(format="%.0f")})
+    if mediciones:
+        st.caption(f"Promedio por sesión: {formato_bytes(total_sesiones / len(mediciones))}. "
+                   f"Total estimado con las tablas compartidas: {formato_bytes(total_sesiones + compartidos)}.")
+
+    perfil.marca("detalle")
+    actual = next((m for m in mediciones if m.sesion == st.session_state.get(CLAVE_SESION)), None)
+    if actual is not None:
+        with st.expander("Memoria de esta sesión por clave"):
+            st.dataframe([{"Clave": clave, "Memoria": formato_bytes(bytes_clave)} for clave, bytes_clave in actual.por_clave.items()],
+                         hide_index=True, use_container_width=True)
+
+    st.subheader("Trabajos en Segundo Plano")
+    trabajos = ejecutor().resumen()
+    if trabajos:
+        st.dataframe(trabajos, hide_index=True, use_container_width=True)
+    else:
+        st.write("No hay trabajos recientes.")
+
+# --- Perfil de la Ejecución (solo con el perfilado activo) ---
+registro_perfil = perfil.finalizar()
+if registro_perfil:
+    with st.expander(f"⏱️ Perfil de la ejecución: {registro_perfil['total_ms']:,.1f} ms"):
+        st.dataframe(perfil.tabla().style.format("{:,.2f}"), use_container_width=True)
+        st.caption("Percentiles de las últimas ejecuciones de esta página:")
+        st.dataframe(resumen_registro(pagina=perfil.pagina), hide_index=True, use_container_width=True)
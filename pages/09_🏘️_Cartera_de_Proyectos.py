@@ -0,0 +1,118 @@
+import streamlit as st
+
+from calculos.escenarios import AlmacenEscenarios
+from calculos.grafo import GRAFO_PROYECTO
+from calculos.memoria import controlar_memoria, registrar_recalculable
+from calculos.modelo import COLUMNAS_FLUJO
+from calculos.perfil import Perfilador, perfilado_activo, resumen_registro
+from calculos.presentacion import resumen_anual
+from calculos.tesoreria import CarteraTesoreria
+
+st.set_page_config(page_title="Cartera de Proyectos", page_icon="🏘️", layout="wide")
+perfil = Perfilador("09_Cartera_de_Proyectos", perfilado_activo(st.session_state))
+perfil.marca("entradas")
+st.title("🏘️ Tesorería Consolidada de la Cartera")
+st.markdown("Suma los flujos de caja de varios proyectos guardados, cada uno desde su mes de inicio en un calendario común: posición de caja de la cartera, máxima necesidad de capital y servicio de deuda combinado.")
+
+PROYECTO_ACTUAL = "(proyecto actual)"
+# La cartera se rehace desde los escenarios guardados: es lo primero que se libera si falta memoria
+registrar_recalculable('cartera_tesoreria')
+
+
+@st.cache_resource
+def almacen_escenarios():
+    return AlmacenEscenarios()
+
+
+# --- Proyectos y Calendario ---
+almacen = almacen_escenarios()
+escenarios_guardados = almacen.nombres()
+st.sidebar.header("Proyectos de la Cartera")
+st.session_state.cartera_proyectos = st.sidebar.multiselect(
+    "Escenarios guardados", escenarios_guardados,
+    default=[nombre for nombre in st.session_state.get('cartera_proyectos', []) if nombre in escenarios_guardados],
+    help="Guarda los proyectos como escenarios en el Resumen del Proyecto para sumarlos aquí.")
+st.session_state.cartera_incluir_actual = st.sidebar.toggle(
+    "Incluir el proyecto actual", value=st.session_state.get('cartera_incluir_actual', not escenarios_guardados),
+    help="El proyecto que se edita en las demás páginas. Al cambiar sus entradas solo se recalcula su aporte.")
+nombres_cartera = st.session_state.cartera_proyectos + ([PROYECTO_ACTUAL] if st.session_state.cartera_incluir_actual else [])
+
+st.sidebar.subheader("Mes de Inicio en el Calendario")
+meses_inicio = st.session_state.setdefault('cartera_meses_inicio', {})
+for nombre in nombres_cartera:
+    meses_inicio[nombre] = st.sidebar.number_input(nombre, min_value=1, max_value=600, value=int(meses_inicio.get(nombre, 1)), step=1,
+                                                   help="Mes del calendario común en el que empieza el proyecto (su mes 1).")
+
+perfil.marca("calculo")
+# --- Consolidación: solo se recalcula el aporte de los proyectos que cambiaron ---
+proyectos = {nombre: (clave, meses_inicio[nombre], lambda clave=clave: almacen.resultados(clave).flujo)
+             for nombre, clave in ((nombre, almacen.hash_de(nombre)) for nombre in st.session_state.cartera_proyectos)}
+if st.session_state.cartera_incluir_actual:
+    recalculo = GRAFO_PROYECTO.actualizar(st.session_state)
+    resultados = recalculo.valores['resultados']
+    proyectos[PROYECTO_ACTUAL] = (recalculo.valores['datos'], meses_inicio[PROYECTO_ACTUAL], lambda: resultados.flujo)
+cartera = st.session_state.get('cartera_tesoreria') or CarteraTesoreria()
+actualizados = cartera.sincronizar(proyectos)
+st.session_state.cartera_tesoreria = cartera
+consolidado = cartera.consolidado()
+st.sidebar.caption(f"Proyectos actualizados en esta ejecución: {len(actualizados)} de {len(proyectos)}.")
+
+if not proyectos:
+    st.info("Elige escenarios guardados o incluye el proyecto actual para ver la tesorería consolidada.")
+else:
+    perfil.marca("indicadores")
+    filas_proyectos = cartera.resumen_proyectos()
+    suma_individual = sum(fila["Máxima Necesidad de Capital"] for fila in filas_proyectos)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Máxima Necesidad de Capital", f"${consolidado.maxima_necesidad_capital:,.2f}",
+                help="Punto más bajo de la posición de caja acumulada de toda la cartera.")
+    col2.metric("Mes de Máxima Necesidad", f"Mes {consolidado.mes_maxima_necesidad}")
+    col3.metric("Suma de Necesidades Individuales", f"${suma_individual:,.2f}",
+                delta=f"${consolidado.maxima_necesidad_capital - suma_individual:,.2f} por el desfase",
+                help="Lo que haría falta si todos los proyectos tocaran su punto más bajo a la vez.")
+    col4.metric("Servicio de Deuda Combinado", f"${consolidado.servicio_deuda.sum():,.2f}",
+                help=f"Mes de mayor pago: ${consolidado.servicio_deuda.max(initial=0):,.2f}.")
+
+    if not st.session_state.get('solo_indicadores', False):
+        # pandas y Plotly solo se importan cuando se van a mostrar tablas y gráficos
+        import pandas as pd
+        import plotly.graph_objects as go
+
+        perfil.marca("grafico")
+        st.header("Posición de Caja Consolidada")
+        fig = go.Figure([
+            go.Scatter(x=consolidado.meses, y=consolidado.posicion, fill='tozeroy', mode='lines', name='Posición Acumulada'),
+            go.Bar(x=consolidado.meses, y=-consolidado.servicio_deuda, name='Servicio de Deuda'),
+        ])
+        fig.update_layout(title='Posición de Caja y Servicio de Deuda de la Cartera', xaxis_title='Mes del Calendario',
+                          yaxis_title='Monto ($)')
+        st.plotly_chart(fig, use_container_width=True)
+
+        perfil.marca("proyectos")
+        st.header("Proyectos")
+        proyectos_df = pd.DataFrame(filas_proyectos)
+        fig_calendario = go.Figure(go.Bar(y=proyectos_df["Proyecto"], x=proyectos_df["Mes de Fin"] - proyectos_df["Mes de Inicio"] + 1,
+                                          base=proyectos_df["Mes de Inicio"], orientation='h'))
+        fig_calendario.update_layout(title='Calendario de la Cartera', xaxis_title='Mes del Calendario')
+        st.plotly_chart(fig_calendario, use_container_width=True)
+        st.dataframe(proyectos_df.style.format({"Máxima Necesidad de Capital": "${:,.2f}", "Servicio de Deuda": "${:,.2f}"}),
+                     hide_index=True, use_container_width=True)
+
+        perfil.marca("tabla")
+        st.header("Resumen Anual Consolidado")
+        flujo_df = pd.DataFrame(consolidado.flujo.T, index=consolidado.meses, columns=COLUMNAS_FLUJO)
+        flujo_df['Flujo Neto Mensual'] = consolidado.flujo_neto
+        flujo_df['Posición de Caja'] = consolidado.posicion
+        resumen_df = resumen_anual(flujo_df, flujo_df.index, saldos=('Posición de Caja',))
+        st.dataframe(resumen_df.style.format("${:,.2f}"), use_container_width=True)
+
+# --- Perfil de la Ejecución (solo con el perfilado activo) ---
+registro_perfil = perfil.finalizar()
+if registro_perfil:
+    with st.expander(f"⏱️ Perfil de la ejecución: {registro_perfil['total_ms']:,.1f} ms"):
+        st.dataframe(perfil.tabla().style.format("{:,.2f}"), use_container_width=True)
+        st.caption("Percentiles de las últimas ejecuciones de esta página:")
+        st.dataframe(resumen_registro(pagina=perfil.pagina), hide_index=True, use_container_width=True)
+
+# --- Memoria de la Sesión: se mide y, si pasa del límite, se liberan los resultados recalculables ---
+controlar_memoria(st.session_state, perfil.pagina)